@@ -1,21 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional
+from app.core.config import get_settings
+from app.core.http_cache import check_not_modified, data_version
+from app.core.responses import json_response
 from app.db.session import get_db
 from app.models.schemas import (
     City, CityCreate, Indicator, IndicatorCreate,
     AnnualData, AnnualDataCreate, TimeSeriesData,
     CityComparison, CorrelationRequest, CorrelationResult,
-    TrendAnalysisRequest, TrendAnalysisResult
+    TrendAnalysisRequest, TrendAnalysisResult, BulkTrendAnalysisRequest
 )
 from app.services.data_service import DataService
 from app.services.analysis_service import AnalysisService
+from app.services.export_service import EXPORT_FORMATS, ExportService
+
+settings = get_settings()
 
 router = APIRouter()
 
 
 @router.get("/cities", response_model=List[City])
-def get_cities(db: Session = Depends(get_db)):
+def get_cities(request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = check_not_modified(
+        request, response, data_version(db, "cities"), settings.REFERENCE_CACHE_MAX_AGE
+    )
+    if not_modified:
+        return not_modified
     return DataService.get_all_cities(db)
 
 
@@ -33,7 +46,12 @@ def create_city(city: CityCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/indicators", response_model=List[Indicator])
-def get_indicators(db: Session = Depends(get_db)):
+def get_indicators(request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = check_not_modified(
+        request, response, data_version(db, "indicators"), settings.REFERENCE_CACHE_MAX_AGE
+    )
+    if not_modified:
+        return not_modified
     return DataService.get_all_indicators(db)
 
 
@@ -52,15 +70,37 @@ def create_indicator(indicator: IndicatorCreate, db: Session = Depends(get_db)):
 
 @router.get("/timeseries")
 def get_timeseries_data(
+    request: Request,
+    response: Response,
     city_id: int,
     indicator_id: int,
     start_year: Optional[int] = None,
     end_year: Optional[int] = None,
+    format: Literal["rows", "columnar"] = "rows",
     db: Session = Depends(get_db)
 ):
+    not_modified = check_not_modified(request, response, data_version(db, "cities", "indicators", "annual_data"))
+    if not_modified:
+        return not_modified
+    if format == "columnar":
+        return json_response(
+            DataService.get_timeseries_data(db, city_id, indicator_id, start_year, end_year, columnar=True),
+            response
+        )
     return DataService.get_timeseries_data(db, city_id, indicator_id, start_year, end_year)
 
 
+@router.post("/series-matrix")
+def get_series_matrix(comparison: CityComparison, db: Session = Depends(get_db)):
+    return json_response(DataService.get_series_matrix(
+        db,
+        comparison.cities,
+        comparison.indicators,
+        comparison.start_year,
+        comparison.end_year
+    ))
+
+
 @router.get("/annual-data")
 def get_annual_data(
     city_id: Optional[int] = None,
@@ -68,8 +108,30 @@ def get_annual_data(
     year: Optional[int] = None,
     start_year: Optional[int] = None,
     end_year: Optional[int] = None,
+    format: Literal["rows", "columnar"] = "rows",
+    limit: Optional[int] = Query(None, ge=1, le=settings.ANNUAL_DATA_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="逗号分隔的列名，如 city_id,year,value"),
     db: Session = Depends(get_db)
 ):
+    # 指定分页或字段时返回 {"data": ..., "next_cursor": ...}，否则保持原有的列表响应
+    if limit is not None or cursor is not None or fields is not None:
+        page = DataService.get_annual_data_page(
+            db, city_id, indicator_id, year, start_year, end_year,
+            [f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+            limit or settings.ANNUAL_DATA_PAGE_SIZE,
+            cursor,
+            format == "columnar"
+        )
+        if "error" in page:
+            raise HTTPException(status_code=400, detail=page["error"])
+        return json_response(page)
+    
+    if format == "columnar":
+        return json_response(DataService.get_annual_data_columns(
+            db, city_id, indicator_id, year, start_year, end_year
+        ))
+    
     data = DataService.get_annual_data(
         db, city_id, indicator_id, year, start_year, end_year
     )
@@ -79,41 +141,89 @@ def get_annual_data(
             "city_id": d.city_id,
             "indicator_id": d.indicator_id,
             "year": d.year,
-            "value": float(d.value) if d.value else None,
+            "value": float(d.value) if d.value is not None else None,
             "data_quality": d.data_quality
         }
         for d in data
     ]
 
 
+@router.get("/export")
+def export_annual_data(
+    format: Literal["csv", "ndjson", "parquet"] = "csv",
+    layout: Literal["long", "wide"] = "long",
+    city_id: Optional[int] = None,
+    indicator_id: Optional[int] = None,
+    start_year: Optional[int] = None,
+    end_year: Optional[int] = None
+):
+    """流式导出年度数据；wide 为每个指标一列的宽表，CSV 可直接用于数据导入"""
+    error = ExportService.check_format(format)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        ExportService.stream(format, layout, city_id, indicator_id, start_year, end_year),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="annual_data_{layout}.{extension}"'}
+    )
+
+
 @router.post("/annual-data", response_model=AnnualData)
 def create_annual_data(data: AnnualDataCreate, db: Session = Depends(get_db)):
-    return DataService.create_annual_data(db, data)
+    try:
+        return DataService.create_annual_data(db, data)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="该城市、指标和年份的数据已存在")
+
+
+@router.get("/regional-summary")
+def get_regional_summaries(
+    request: Request,
+    response: Response,
+    start_year: Optional[int] = None,
+    end_year: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    not_modified = check_not_modified(request, response, data_version(db, "cities", "indicators", "annual_data"))
+    if not_modified:
+        return not_modified
+    return DataService.get_regional_summaries(db, start_year, end_year)
 
 
 @router.get("/regional-summary/{year}")
-def get_regional_summary(year: int, db: Session = Depends(get_db)):
+def get_regional_summary(year: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    not_modified = check_not_modified(request, response, data_version(db, "cities", "indicators", "annual_data"))
+    if not_modified:
+        return not_modified
     return DataService.get_regional_summary(db, year)
 
 
 @router.get("/ranking")
 def get_city_ranking(
+    request: Request,
+    response: Response,
     indicator_id: int,
     year: int,
     db: Session = Depends(get_db)
 ):
+    not_modified = check_not_modified(request, response, data_version(db, "cities", "annual_data"))
+    if not_modified:
+        return not_modified
     return DataService.get_city_ranking(db, indicator_id, year)
 
 
 @router.post("/compare")
 def compare_cities(comparison: CityComparison, db: Session = Depends(get_db)):
-    return AnalysisService.compare_cities(
+    return json_response(AnalysisService.compare_cities(
         db,
         comparison.cities,
         comparison.indicators,
         comparison.start_year,
         comparison.end_year
-    )
+    ))
 
 
 @router.post("/correlation")
@@ -123,7 +233,22 @@ def calculate_correlation(request: CorrelationRequest, db: Session = Depends(get
         request.city_ids,
         request.indicator_ids,
         request.start_year,
-        request.end_year
+        request.end_year,
+        request.method,
+        request.mode
+    )
+
+
+@router.post("/correlation/matrix")
+def calculate_correlation_matrix(request: CorrelationRequest, db: Session = Depends(get_db)):
+    return AnalysisService.calculate_correlation_matrix(
+        db,
+        request.city_ids,
+        request.indicator_ids,
+        request.start_year,
+        request.end_year,
+        request.method,
+        request.mode
     )
 
 
@@ -138,6 +263,17 @@ def analyze_trend(request: TrendAnalysisRequest, db: Session = Depends(get_db)):
     )
 
 
+@router.post("/trend-analysis/bulk")
+def analyze_trends_bulk(request: BulkTrendAnalysisRequest, db: Session = Depends(get_db)):
+    return AnalysisService.analyze_trends_bulk(
+        db,
+        request.city_ids,
+        request.indicator_ids,
+        request.start_year,
+        request.end_year
+    )
+
+
 @router.get("/growth-rate/{city_id}/{indicator_id}/{year}")
 def get_growth_rate(city_id: int, indicator_id: int, year: int, db: Session = Depends(get_db)):
     return AnalysisService.calculate_growth_rate(db, city_id, indicator_id, year)
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.db.session import get_db
+from app.models.schemas import JobCreate, JobStatus
+from app.services.job_service import JobService, JOB_HANDLERS
+
+router = APIRouter()
+
+
+@router.get("/types")
+def get_job_types():
+    return sorted(JOB_HANDLERS)
+
+
+@router.post("", response_model=JobStatus, status_code=202)
+def submit_job(request: JobCreate, db: Session = Depends(get_db)):
+    result = JobService.submit_job(db, request.job_type, request.params)
+    
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    
+    return result["job"]
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+def get_job(job_id: str, db: Session = Depends(get_db)):
+    job = JobService.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: str, db: Session = Depends(get_db)):
+    result = JobService.get_result(db, job_id)
+    
+    if "error" in result:
+        raise HTTPException(status_code=result["status_code"], detail=result["error"])
+    
+    return result["result"]
@@ -1,77 +1,163 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Literal, Optional
+from app.core import compute
+from app.core.config import get_settings
+from app.core.http_cache import check_not_modified, data_version
 from app.db.session import get_db
-from app.models.schemas import PredictionRequest, PredictionResult
+from app.models.schemas import (
+    PredictionRequest, PredictionResult, BulkPredictionRequest, ArimaRefitRequest,
+    BacktestRequest
+)
 from app.services.prediction_service import PredictionService
+from app.services.forecast_cache import arima_states, forecast_cache
+
+settings = get_settings()
 
 router = APIRouter()
 
 
+async def run_model(fn: Callable[..., Dict[str, Any]], *args: Any) -> Dict[str, Any]:
+    """在独立的计算线程池中执行模型计算，队列已满时返回 503"""
+    try:
+        result = await compute.run(fn, *args)
+    except compute.ComputeQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="模型计算队列已满，请稍后重试",
+            headers={"Retry-After": str(settings.COMPUTE_RETRY_AFTER)}
+        )
+    
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    
+    return result
+
+
 @router.post("/predict/linear")
-def predict_linear_regression(request: PredictionRequest, db: Session = Depends(get_db)):
-    result = PredictionService.linear_regression_prediction(
+async def predict_linear_regression(request: PredictionRequest, db: Session = Depends(get_db)):
+    return await run_model(
+        PredictionService.linear_regression_prediction,
         db,
         request.city_id,
         request.indicator_id,
         request.prediction_years,
         request.confidence_level
     )
-    
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    
-    return result
 
 
 @router.post("/predict/arima")
-def predict_arima(request: PredictionRequest, db: Session = Depends(get_db)):
-    result = PredictionService.arima_prediction(
+async def predict_arima(request: PredictionRequest, db: Session = Depends(get_db)):
+    return await run_model(
+        PredictionService.arima_prediction,
         db,
         request.city_id,
         request.indicator_id,
-        request.prediction_years
+        request.prediction_years,
+        request.confidence_level,
+        request.order or (1, 1, 1),
+        request.auto_order and request.order is None
     )
-    
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    
-    return result
 
 
 @router.post("/predict/ensemble")
-def predict_ensemble(request: PredictionRequest, db: Session = Depends(get_db)):
-    result = PredictionService.ensemble_prediction(
+async def predict_ensemble(request: PredictionRequest, db: Session = Depends(get_db)):
+    return await run_model(
+        PredictionService.ensemble_prediction,
         db,
         request.city_id,
         request.indicator_id,
         request.prediction_years,
         request.confidence_level
     )
-    
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    
-    return result
 
 
 @router.post("/predict/simulation")
-def predict_simulation(
+async def predict_simulation(
     city_id: int,
     indicator_id: int,
     scenario_params: Dict[str, float],
     prediction_years: int = 3,
+    paths: int = Query(1000, ge=100, le=settings.SIMULATION_MAX_PATHS),
+    method: Literal["bootstrap", "parametric"] = "bootstrap",
+    seed: Optional[int] = None,
+    thresholds: Optional[List[float]] = Query(None),
     db: Session = Depends(get_db)
 ):
-    result = PredictionService.scenario_simulation(
+    if thresholds and len(thresholds) > settings.SIMULATION_MAX_THRESHOLDS:
+        raise HTTPException(status_code=400, detail=f"阈值最多 {settings.SIMULATION_MAX_THRESHOLDS} 个")
+    return await run_model(
+        PredictionService.scenario_simulation,
         db,
         city_id,
         indicator_id,
         scenario_params,
-        prediction_years
+        prediction_years,
+        paths,
+        method,
+        seed,
+        thresholds
     )
-    
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-    
-    return result
+
+
+@router.post("/predict/bulk")
+async def predict_bulk(request: BulkPredictionRequest, db: Session = Depends(get_db)):
+    return await run_model(
+        PredictionService.bulk_prediction,
+        db,
+        request.city_ids,
+        request.indicator_ids,
+        request.model_types,
+        request.prediction_years,
+        request.confidence_level,
+        request.order or (1, 1, 1),
+        request.auto_order and request.order is None
+    )
+
+
+@router.post("/arima/refit")
+async def refit_arima(request: ArimaRefitRequest, db: Session = Depends(get_db)):
+    return await run_model(
+        PredictionService.refit_arima,
+        db,
+        request.city_ids,
+        request.indicator_ids
+    )
+
+
+@router.post("/backtest")
+async def run_backtest(request: BacktestRequest, db: Session = Depends(get_db)):
+    return await run_model(
+        PredictionService.run_backtest,
+        db,
+        request.city_ids,
+        request.indicator_ids,
+        request.model_types,
+        request.horizon,
+        request.min_train_years,
+        request.order
+    )
+
+
+@router.get("/backtest")
+def get_backtest_leaderboard(
+    request: Request,
+    response: Response,
+    city_id: Optional[int] = None,
+    indicator_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    not_modified = check_not_modified(request, response, data_version(db, "backtest"))
+    if not_modified:
+        return not_modified
+    return PredictionService.backtest_leaderboard(db, city_id, indicator_id)
+
+
+@router.get("/compute/status")
+def get_compute_status():
+    return compute.queue_status()
+
+
+@router.get("/cache/stats")
+def get_forecast_cache_stats():
+    return {**forecast_cache.stats(), "arima_states": arima_states.stats()}
@@ -0,0 +1,357 @@
+import base64
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional, Tuple
+import numpy as np
+import orjson
+from app.core import data_versions
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# 各命名空间的 TTL（秒），对应需求文档 4.2 的缓存策略
+NAMESPACE_TTLS = {
+    "reference": settings.CACHE_TTL_REFERENCE,
+    "query": settings.CACHE_TTL_QUERY,
+    "prediction": settings.CACHE_TTL_PREDICTION,
+    "backtest": settings.CACHE_TTL_BACKTEST,
+}
+
+# 各命名空间的结果依赖的数据集，其持久化版本号是缓存键的一部分：
+# 面板尚未重建的 worker 写入的结果只会落在旧版本的键下，不会被已看到新数据的 worker 读取
+NAMESPACE_DATASETS = {
+    "reference": ("cities", "indicators"),
+    "query": ("cities", "indicators", "annual_data"),
+    "prediction": ("cities", "indicators", "annual_data", "backtest"),
+    "backtest": ("backtest",),
+}
+
+KEY_PREFIX = "gba:cache"
+# 序列化时标记 JSON 无法直接表示的类型
+TYPE_TAG = "__cache_type__"
+
+
+class MemoryBackend:
+    """进程内 LRU 缓存，值以序列化字节保存，读取时得到独立副本"""
+
+    name = "memory"
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at is not None and time.monotonic() > expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key: str, data: bytes, ttl: Optional[int]) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (data, time.monotonic() + ttl if ttl else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisBackend:
+    """Redis 缓存，多个 worker 进程共享结果与失效计数"""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        import redis
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._client.ping()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, data: bytes, ttl: Optional[int]) -> None:
+        self._client.set(key, data, ex=ttl or None)
+
+    def get_counter(self, key: str) -> int:
+        value = self._client.get(key)
+        return int(value) if value is not None else 0
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {
+    namespace: {"hits": 0, "misses": 0, "errors": 0} for namespace in NAMESPACE_TTLS
+}
+_stats_lock = threading.Lock()
+
+
+def get_backend():
+    """按 CACHE_BACKEND 创建缓存后端；auto 时 Redis 不可用则退回进程内 LRU"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend(settings.CACHE_BACKEND)
+    return _backend
+
+
+def _create_backend(kind: str):
+    if kind == "none":
+        return None
+    if kind in ("redis", "auto"):
+        try:
+            return RedisBackend(settings.REDIS_URL)
+        except Exception as e:
+            if kind == "redis":
+                raise
+            logger.warning("Redis 不可用，使用进程内缓存: %s", e)
+    return MemoryBackend(settings.CACHE_MEMORY_SIZE)
+
+
+def set_backend(backend) -> None:
+    """替换缓存后端，例如在测试中使用 MemoryBackend"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def _record(namespace: str, field: str) -> None:
+    with _stats_lock:
+        _stats[namespace][field] += 1
+
+
+def _generation(backend, namespace: str) -> int:
+    return backend.get_counter(f"{KEY_PREFIX}:{namespace}:generation")
+
+
+def invalidate(*namespaces: str) -> None:
+    """使命名空间下的所有缓存失效：递增代数，旧键不再被读取并随 TTL 过期"""
+    backend = get_backend()
+    if backend is None:
+        return
+    for namespace in namespaces:
+        try:
+            backend.incr(f"{KEY_PREFIX}:{namespace}:generation")
+        except Exception as e:
+            _record(namespace, "errors")
+            logger.warning("缓存失效失败: %s", e)
+
+
+def _encode(value: Any) -> Any:
+    """转换为 JSON 可表示的结构，元组、非字符串键、NumPy 数组、NaN、Decimal 与日期时间以标记保留类型"""
+    if isinstance(value, np.generic):
+        return _encode(value.item())
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else {TYPE_TAG: "float", "value": repr(value)}
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value) and TYPE_TAG not in value:
+            return {k: _encode(v) for k, v in value.items()}
+        return {TYPE_TAG: "dict", "items": [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, tuple):
+        return {TYPE_TAG: "tuple", "items": [_encode(v) for v in value]}
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind in "biuf":
+            return {
+                TYPE_TAG: "ndarray",
+                "dtype": value.dtype.str,
+                "shape": list(value.shape),
+                "data": base64.b64encode(np.ascontiguousarray(value).tobytes()).decode("ascii")
+            }
+        return {TYPE_TAG: "ndarray_list", "dtype": value.dtype.str, "items": _encode(value.tolist())}
+    if isinstance(value, Decimal):
+        return {TYPE_TAG: "decimal", "value": str(value)}
+    if isinstance(value, datetime):
+        return {TYPE_TAG: "datetime", "value": value.isoformat()}
+    if isinstance(value, date):
+        return {TYPE_TAG: "date", "value": value.isoformat()}
+    raise TypeError(f"无法缓存的类型: {type(value).__name__}")
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+
+    kind = value.get(TYPE_TAG)
+    if kind is None:
+        return {k: _decode(v) for k, v in value.items()}
+    if kind == "float":
+        return float(value["value"])
+    if kind == "dict":
+        return {_decode(k): _decode(v) for k, v in value["items"]}
+    if kind == "tuple":
+        return tuple(_decode(v) for v in value["items"])
+    if kind == "ndarray":
+        data = np.frombuffer(base64.b64decode(value["data"]), dtype=np.dtype(value["dtype"]))
+        return data.reshape(value["shape"]).copy()
+    if kind == "ndarray_list":
+        return np.array(_decode(value["items"]), dtype=np.dtype(value["dtype"]))
+    if kind == "decimal":
+        return Decimal(value["value"])
+    if kind == "datetime":
+        return datetime.fromisoformat(value["value"])
+    if kind == "date":
+        return date.fromisoformat(value["value"])
+    raise ValueError(f"未知的缓存类型标记: {kind}")
+
+
+def dumps(value: Any) -> bytes:
+    """
+    缓存值的序列化。
+
+    使用 JSON 而不是 pickle：缓存可能保存在共享的 Redis 中，反序列化不能执行任意代码。
+    """
+    return orjson.dumps(_encode(value))
+
+
+def loads(data: bytes) -> Any:
+    return _decode(orjson.loads(data))
+
+
+def _is_cacheable(result: Any) -> bool:
+    # 与路由约定一致，带 error 键的字典是失败结果，不缓存
+    return not (isinstance(result, dict) and "error" in result)
+
+
+def cached(
+    namespace: str,
+    codec: Optional[Tuple[Callable[[Any], Any], Callable[[Any], Any]]] = None
+) -> Callable:
+    """
+    缓存服务方法的返回值。
+
+    缓存键由方法名、除 db 以外的参数与命名空间所依赖数据集的版本号组成；codec 为 (编码, 解码) 函数对，
+    用于 ORM 对象等不能直接序列化共享的返回值。缓存后端出错时直接调用原方法。
+    """
+    ttl = NAMESPACE_TTLS[namespace]
+    datasets = NAMESPACE_DATASETS[namespace]
+
+    def decorator(fn: Callable) -> Callable:
+        signature = inspect.signature(fn)
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            backend = get_backend()
+            if backend is None:
+                return fn(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = {k: v for k, v in bound.arguments.items() if k != "db"}
+            digest = hashlib.sha1(
+                json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+            ).hexdigest()
+
+            try:
+                db = bound.arguments.get("db")
+                version = data_versions.token(data_versions.current(db), datasets) if db is not None else ""
+                key = f"{KEY_PREFIX}:{namespace}:{_generation(backend, namespace)}:{version}:{name}:{digest}"
+                data = backend.get(key)
+            except Exception as e:
+                _record(namespace, "errors")
+                logger.warning("读取缓存失败: %s", e)
+                return fn(*args, **kwargs)
+
+            if data is not None:
+                _record(namespace, "hits")
+                try:
+                    value = loads(data)
+                except Exception as e:
+                    _record(namespace, "errors")
+                    logger.warning("缓存数据无法解析: %s", e)
+                    return fn(*args, **kwargs)
+                return codec[1](value) if codec else value
+
+            _record(namespace, "misses")
+            result = fn(*args, **kwargs)
+            if _is_cacheable(result):
+                try:
+                    backend.set(key, dumps(codec[0](result) if codec else result), ttl)
+                except Exception as e:
+                    _record(namespace, "errors")
+                    logger.warning("写入缓存失败: %s", e)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def orm_codec(model) -> Tuple[Callable[[Any], Any], Callable[[Any], Any]]:
+    """把 ORM 对象（或其列表）编码为列值字典，解码为不属于任何会话的同类对象"""
+    columns = [column.key for column in model.__table__.columns]
+
+    def encode_one(obj):
+        return None if obj is None else {c: getattr(obj, c) for c in columns}
+
+    def decode_one(row):
+        return None if row is None else model(**row)
+
+    def encode(value):
+        return [encode_one(v) for v in value] if isinstance(value, list) else encode_one(value)
+
+    def decode(value):
+        return [decode_one(v) for v in value] if isinstance(value, list) else decode_one(value)
+
+    return encode, decode
+
+
+def stats() -> Dict[str, Any]:
+    backend = get_backend()
+    with _stats_lock:
+        namespaces = {}
+        for namespace, counts in _stats.items():
+            lookups = counts["hits"] + counts["misses"]
+            namespaces[namespace] = {
+                **counts,
+                "ttl": NAMESPACE_TTLS[namespace],
+                "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0
+            }
+    return {
+        "backend": backend.name if backend is not None else "none",
+        "size": backend.size() if backend is not None else 0,
+        "namespaces": namespaces
+    }
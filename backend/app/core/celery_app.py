@@ -0,0 +1,16 @@
+from celery import Celery
+from app.core.config import get_settings
+
+settings = get_settings()
+
+RUN_JOB_TASK = "jobs.run"
+
+# 启动 worker: celery -A app.core.celery_app worker
+celery_app = Celery("gba", broker=settings.REDIS_URL)
+
+
+@celery_app.task(name=RUN_JOB_TASK)
+def run_job(job_id: str) -> None:
+    # 任务状态与结果写入 jobs 表，不使用 Celery 的结果后端
+    from app.services.job_service import JobService
+    JobService.run_job(job_id)
@@ -0,0 +1,133 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from app.core.config import get_settings
+
+settings = get_settings()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# 模型计算请求使用独立的线程池，不占用 Starlette 处理普通请求的线程池
+_dispatcher: Optional[ThreadPoolExecutor] = None
+_admitted = 0
+_admission_lock = threading.Lock()
+
+
+class ComputeQueueFull(Exception):
+    """模型计算队列已满，请求未被接受"""
+
+
+def get_pool_size() -> int:
+    """计算进程池大小；COMPUTE_POOL_WORKERS 为 0 时在当前进程内直接计算"""
+    if settings.COMPUTE_POOL_WORKERS is not None:
+        return max(settings.COMPUTE_POOL_WORKERS, 0)
+    return os.cpu_count() or 1
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if get_pool_size() == 0:
+        return None
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # 使用 spawn 启动子进程，避免在多线程的服务进程中 fork
+                _pool = ProcessPoolExecutor(
+                    max_workers=get_pool_size(),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+def submit(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    """提交计算任务到进程池；未启用进程池时同步执行并返回已完成的 Future"""
+    pool = get_process_pool()
+    if pool is not None:
+        return pool.submit(fn, *args, **kwargs)
+
+    future: Future = Future()
+    try:
+        future.set_result(fn(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _get_dispatcher() -> ThreadPoolExecutor:
+    global _dispatcher
+    if _dispatcher is None:
+        with _pool_lock:
+            if _dispatcher is None:
+                _dispatcher = ThreadPoolExecutor(
+                    max_workers=max(settings.COMPUTE_MAX_CONCURRENT, 1),
+                    thread_name_prefix="compute"
+                )
+    return _dispatcher
+
+
+def _admit() -> None:
+    global _admitted
+    capacity = max(settings.COMPUTE_MAX_CONCURRENT, 1) + max(settings.COMPUTE_QUEUE_SIZE, 0)
+    with _admission_lock:
+        if _admitted >= capacity:
+            raise ComputeQueueFull()
+        _admitted += 1
+
+
+def _release() -> None:
+    global _admitted
+    with _admission_lock:
+        _admitted -= 1
+
+
+async def run(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    在计算线程池中执行一次模型计算请求。
+
+    正在执行与排队的请求总数超过 COMPUTE_MAX_CONCURRENT + COMPUTE_QUEUE_SIZE 时立即抛出 ComputeQueueFull，
+    而不是无限排队拖慢整个服务。名额在计算结束（或排队中被取消）时才释放：
+    客户端断开只会取消等待，已开始的计算仍占用名额，断开连接不能绕过准入限制。
+    """
+    _admit()
+    # 复制上下文，请求级指标等 contextvar 在计算线程中同样可见
+    context = contextvars.copy_context()
+    try:
+        future = _get_dispatcher().submit(functools.partial(context.run, fn, *args, **kwargs))
+    except BaseException:
+        _release()
+        raise
+    future.add_done_callback(lambda _: _release())
+    return await asyncio.wrap_future(future)
+
+
+def queue_status() -> Dict[str, Any]:
+    """计算队列的当前深度与容量"""
+    max_concurrent = max(settings.COMPUTE_MAX_CONCURRENT, 1)
+    with _admission_lock:
+        admitted = _admitted
+    return {
+        "pool_workers": get_pool_size(),
+        "max_concurrent": max_concurrent,
+        "max_queue": max(settings.COMPUTE_QUEUE_SIZE, 0),
+        "running": min(admitted, max_concurrent),
+        "queued": max(admitted - max_concurrent, 0),
+        "retry_after": settings.COMPUTE_RETRY_AFTER
+    }
+
+
+def shutdown_process_pool() -> None:
+    global _pool, _dispatcher
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _dispatcher is not None:
+            _dispatcher.shutdown(wait=False, cancel_futures=True)
+            _dispatcher = None
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -10,10 +11,71 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./gba_data.db"
     REDIS_URL: str = "redis://localhost:6379/0"
     
+    # 查询结果缓存：auto 优先使用 Redis，不可用时退回进程内 LRU；也可指定 redis / memory / none
+    CACHE_BACKEND: str = "auto"
+    CACHE_MEMORY_SIZE: int = 1024
+    CACHE_TTL_REFERENCE: int = 60 * 60 * 24
+    CACHE_TTL_QUERY: int = 60 * 60
+    CACHE_TTL_PREDICTION: int = 60 * 60 * 12
+    CACHE_TTL_BACKTEST: int = 60 * 60 * 24
+    
+    # 面板、查询缓存与 ETag 依据数据库中的数据版本号判断数据是否变化；
+    # 两次查询版本号的最短间隔（秒），即其他进程写入后最长多久可见，0 为每次访问都查询
+    DATA_VERSION_CHECK_INTERVAL: float = 1.0
+    
+    FORECAST_CACHE_SIZE: int = 512
+    FORECAST_CACHE_TTL: Optional[int] = None
+    # ARIMA 增量更新：保存参数的序列数上限；追加的观测累计超过 ARIMA_REFIT_AFTER_APPENDS 个，
+    # 或距上次完整拟合超过 ARIMA_REFIT_MAX_AGE 秒（None 为不限）时重新完整拟合
+    ARIMA_STATE_CACHE_SIZE: int = 4096
+    ARIMA_REFIT_AFTER_APPENDS: int = 3
+    ARIMA_REFIT_MAX_AGE: Optional[int] = 60 * 60 * 24 * 7
+    
+    # 模型拟合进程池大小，None 为CPU核数，0 表示在请求进程内计算
+    COMPUTE_POOL_WORKERS: Optional[int] = None
+    # 同时执行的模型计算请求数与排队上限，队列满时返回 503
+    COMPUTE_MAX_CONCURRENT: int = 4
+    COMPUTE_QUEUE_SIZE: int = 16
+    COMPUTE_RETRY_AFTER: int = 5
+    # ARIMA 自动定阶：d 由 KPSS 检验确定（不超过 ARIMA_MAX_D），(p, q) 在上限内按选择准则（aic / bic）全部比较
+    ARIMA_MAX_P: int = 2
+    ARIMA_MAX_D: int = 2
+    ARIMA_MAX_Q: int = 2
+    ARIMA_ORDER_CRITERION: str = "aic"
+    # 情景模拟：每个情景的最大路径数与阈值个数，情景数 × 路径数 × 预测年数 × 阈值数（至少按 1 计）的上限
+    SIMULATION_MAX_PATHS: int = 20000
+    SIMULATION_MAX_THRESHOLDS: int = 20
+    SIMULATION_MAX_CELLS: int = 5000000
+    # 滚动起点回测：默认预测步长与最短训练年数（不低于各模型自身的最少观测数）
+    BACKTEST_HORIZON: int = 3
+    BACKTEST_MIN_TRAIN_YEARS: int = 10
+    # 启动后在后台导入模型依赖并加载面板，首个预测请求无需等待
+    WARMUP_ON_STARTUP: bool = True
+    
+    # 后台任务：local 为进程内线程执行，celery 需要可用的 REDIS_URL 与独立的 worker
+    JOB_BACKEND: str = "local"
+    JOB_WORKERS: int = 2
+    JOB_RESULT_TTL: int = 60 * 60 * 24
+    # 长任务写回进度的最小间隔（秒）
+    JOB_PROGRESS_INTERVAL: float = 1.0
+    # 执行中任务的心跳间隔；超过 JOB_STALE_AFTER 秒没有心跳的任务在服务启动时标记为失败
+    JOB_HEARTBEAT_INTERVAL: float = 10.0
+    JOB_STALE_AFTER: int = 60
+    
+    # 请求级指标：/metrics 的 Prometheus 直方图与 Server-Timing 响应头
+    METRICS_ENABLED: bool = True
+    
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24
     
+    # 城市、指标列表的浏览器缓存时间（秒），其余只读接口每次通过 ETag 重新验证
+    REFERENCE_CACHE_MAX_AGE: int = 60
+    
+    # /data/annual-data 分页：只传游标时的默认页大小与允许的最大页大小
+    ANNUAL_DATA_PAGE_SIZE: int = 1000
+    ANNUAL_DATA_MAX_PAGE_SIZE: int = 10000
+    
     CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:5173"]
     
     class Config:
@@ -0,0 +1,62 @@
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from sqlalchemy import insert, select, update
+from app.core.config import get_settings
+from app.models.database import DataVersion
+
+settings = get_settings()
+
+# 持久化版本号覆盖的数据集
+DATASETS = ("cities", "indicators", "annual_data", "backtest")
+
+_snapshot: Dict[str, int] = {}
+_checked_at: Optional[float] = None
+_lock = threading.Lock()
+
+
+def bump(db, *datasets: str) -> Dict[str, int]:
+    """
+    在调用方的事务中递增数据集的版本号，随写入一起提交，返回新的版本号。
+
+    版本号保存在数据库中，其他 worker 与导入脚本等独立进程的写入同样可见。
+    """
+    versions = {}
+    for name in datasets:
+        result = db.execute(
+            update(DataVersion).where(DataVersion.name == name).values(version=DataVersion.version + 1)
+        )
+        if not result.rowcount:
+            db.execute(insert(DataVersion).values(name=name, version=1))
+        versions[name] = db.execute(
+            select(DataVersion.version).where(DataVersion.name == name)
+        ).scalar_one()
+    return versions
+
+
+def remember(versions: Dict[str, int]) -> None:
+    """写入提交后记下新的版本号，本进程随后的读取立即看到自己的写入"""
+    with _lock:
+        for name, version in versions.items():
+            _snapshot[name] = max(_snapshot.get(name, 0), version)
+
+
+def current(db) -> Dict[str, int]:
+    """各数据集的当前版本号；距上次查询不足 DATA_VERSION_CHECK_INTERVAL 秒时沿用上次的结果"""
+    global _checked_at
+    now = time.monotonic()
+    with _lock:
+        if _checked_at is not None and now - _checked_at < settings.DATA_VERSION_CHECK_INTERVAL:
+            return dict(_snapshot)
+
+    rows = db.execute(select(DataVersion.name, DataVersion.version)).all()
+    with _lock:
+        _snapshot.clear()
+        _snapshot.update({name: version for name, version in rows})
+        _checked_at = now
+        return dict(_snapshot)
+
+
+def token(versions: Dict[str, int], datasets: Iterable[str]) -> str:
+    return ".".join(f"{name}:{versions.get(name, 0)}" for name in datasets)
+
@@ -0,0 +1,48 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+from app.core import data_versions
+
+
+def data_version(db, *datasets: str) -> str:
+    """
+    ETag 依据的数据版本。
+
+    版本号保存在数据库中并随每次写入递增，所有 worker 与导入脚本共享，任一进程写入后其他进程的 ETag 随之变化。
+    """
+    return data_versions.token(data_versions.current(db), datasets)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # 按弱比较处理，经过压缩的代理可能把强 ETag 改写为 W/ 前缀
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+def check_not_modified(
+    request: Request,
+    response: Response,
+    version: str,
+    max_age: int = 0
+) -> Optional[Response]:
+    """
+    为 GET 响应设置基于数据版本的 ETag 与 Cache-Control。
+
+    客户端 If-None-Match 与当前 ETag 一致时返回 304 响应，路由应直接返回它而不再查询数据库；
+    否则返回 None，并在 response 上写好响应头。
+    """
+    key = f"{request.url.path}?{request.url.query}|{version}"
+    etag = '"' + hashlib.sha1(key.encode("utf-8")).hexdigest() + '"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
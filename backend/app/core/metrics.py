@@ -0,0 +1,215 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapper
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+ROW_BUCKETS = (0, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+class RequestStats:
+    """单个请求内累计的 SQL 与模型拟合耗时，由中间件创建并随 contextvar 传递到工作线程"""
+
+    __slots__ = ("sql_count", "sql_seconds", "orm_rows", "fit_count", "fit_seconds")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.orm_rows = 0
+        self.fit_count = 0
+        self.fit_seconds = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    """Prometheus 直方图，按标签值分组累计"""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            # 各桶计数、超出最大桶的计数、sum、count
+            series = self._series.setdefault(label_values, [0.0] * (len(self.buckets) + 3))
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+            items = [(labels, list(series)) for labels, series in items]
+
+        for label_values, series in items:
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            prefix = labels + "," if labels else ""
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound:g}"}} {cumulative:g}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-1]:g}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]:g}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_LABELS = ("method", "route")
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "请求处理耗时", ("method", "route", "status"), LATENCY_BUCKETS
+)
+request_sql_statements = Histogram(
+    "http_request_sql_statements", "单个请求执行的 SQL 语句数", REQUEST_LABELS, COUNT_BUCKETS
+)
+request_sql_duration = Histogram(
+    "http_request_sql_duration_seconds", "单个请求内 SQL 语句的总耗时", REQUEST_LABELS, LATENCY_BUCKETS
+)
+request_orm_rows = Histogram(
+    "http_request_orm_rows", "单个请求加载的 ORM 对象数", REQUEST_LABELS, ROW_BUCKETS
+)
+request_fit_duration = Histogram(
+    "http_request_model_fit_duration_seconds", "单个请求内模型拟合的总耗时", REQUEST_LABELS, LATENCY_BUCKETS
+)
+model_fit_duration = Histogram(
+    "model_fit_duration_seconds", "模型拟合耗时（含请求与后台任务）", ("model",), LATENCY_BUCKETS
+)
+
+HISTOGRAMS = [
+    request_duration, request_sql_statements, request_sql_duration,
+    request_orm_rows, request_fit_duration, model_fit_duration
+]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.get("query_started")
+    if stats is None or not started:
+        return
+    stats.sql_count += 1
+    stats.sql_seconds += time.perf_counter() - started.pop()
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def _on_load(target, context):
+    stats = _current.get()
+    if stats is not None:
+        stats.orm_rows += 1
+
+
+def instrument_engine(engine: Engine) -> None:
+    """在引擎上注册 SQL 计时钩子，并统计所有映射类的对象加载"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+    if not event.contains(Mapper, "load", _on_load):
+        event.listen(Mapper, "load", _on_load)
+
+
+def record_fit(model: str, seconds: float, fits: int = 1) -> None:
+    """记录一次模型拟合耗时；fits 为这段时间内拟合的序列数，计入当前请求的拟合次数"""
+    model_fit_duration.observe((model,), seconds)
+    stats = _current.get()
+    if stats is not None:
+        stats.fit_count += fits
+        stats.fit_seconds += seconds
+
+
+@contextmanager
+def fit_timer(model: str, fits: int = 1) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_fit(model, time.perf_counter() - started, fits)
+
+
+def _server_timing(total: float, stats: RequestStats) -> str:
+    parts = [
+        f"app;dur={total * 1000:.1f}",
+        f'db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.sql_count} queries"',
+        f'orm;desc="{stats.orm_rows} rows"'
+    ]
+    if stats.fit_count:
+        parts.append(f'fit;dur={stats.fit_seconds * 1000:.1f};desc="{stats.fit_count} fits"')
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    记录每个请求的耗时、SQL 语句数与耗时、ORM 加载行数和模型拟合耗时。
+
+    指标按路由模板（而非实际路径）分组，写入 /metrics 的直方图，并以 Server-Timing 响应头返回给客户端。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                timing = _server_timing(time.perf_counter() - started, stats)
+                headers.append((b"server-timing", timing.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "unmatched")
+
+            request_duration.observe(labels + (str(status["code"]),), elapsed)
+            request_sql_statements.observe(labels, stats.sql_count)
+            request_sql_duration.observe(labels, stats.sql_seconds)
+            request_orm_rows.observe(labels, stats.orm_rows)
+            request_fit_duration.observe(labels, stats.fit_seconds)
+
+
+def render() -> str:
+    """Prometheus 文本格式的全部指标"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
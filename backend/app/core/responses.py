@@ -0,0 +1,14 @@
+from typing import Any, Optional
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+# check_not_modified 写在路由注入的 Response 上、需要带到最终响应的头
+FORWARDED_HEADERS = ("etag", "cache-control")
+
+
+def json_response(content: Any, response: Optional[Response] = None) -> ORJSONResponse:
+    """直接用 orjson 序列化返回值，跳过 jsonable_encoder；NumPy 数组与标量按原生类型输出，NaN 输出为 null"""
+    headers = {}
+    if response is not None:
+        headers = {name: response.headers[name] for name in FORWARDED_HEADERS if name in response.headers}
+    return ORJSONResponse(content, headers=headers)
@@ -0,0 +1,49 @@
+import importlib
+import logging
+import threading
+import time
+from typing import Iterable
+from app.core import compute
+
+logger = logging.getLogger(__name__)
+
+# 按需加载的重型模块，预热时提前导入
+HEAVY_MODULES = ("scipy.stats", "statsmodels.tsa.arima.model")
+
+
+def import_modules(modules: Iterable[str]) -> None:
+    for module in modules:
+        importlib.import_module(module)
+
+
+def warm_up() -> None:
+    """导入模型依赖、启动计算进程并加载面板数据，使首个预测请求不再承担这些开销"""
+    from app.db.session import SessionLocal
+    from app.services.panel_service import PanelService
+
+    started = time.perf_counter()
+    try:
+        import_modules(HEAVY_MODULES)
+
+        # 每个进程池 worker 都需要各自导入 statsmodels
+        futures = [compute.submit(import_modules, HEAVY_MODULES) for _ in range(compute.get_pool_size())]
+        for future in futures:
+            future.result()
+
+        db = SessionLocal()
+        try:
+            PanelService.get_panel(db)
+        finally:
+            db.close()
+    except Exception as e:
+        logger.warning("预热失败: %s", e)
+        return
+
+    logger.info("预热完成，耗时 %.2f 秒", time.perf_counter() - started)
+
+
+def start_warm_up() -> threading.Thread:
+    """在后台线程中预热，不阻塞服务启动"""
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
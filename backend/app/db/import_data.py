@@ -1,10 +1,20 @@
+import argparse
 import pandas as pd
-from sqlalchemy.orm import Session
-from app.db.session import SessionLocal, engine, Base
+from sqlalchemy import Float, cast, insert, inspect, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.db.session import SessionLocal
 from app.models.database import City, Indicator, AnnualData
-from app.services.data_service import DataService
+from app.core import data_versions
+from app.core.cache import invalidate
+from app.services.panel_service import PanelService
+from app.services.summary_service import RegionalSummaryService
 import os
 
+# annual_data 的业务主键，批量写入按该键判重
+UPSERT_KEY = ['city_id', 'indicator_id', 'year']
+CHUNK_SIZE = 1000
+
 
 def load_csv_data(csv_path):
     """加载CSV数据"""
@@ -19,18 +29,6 @@ def load_csv_data(csv_path):
         return None
 
 
-def get_city_id(session, city_name):
-    """获取城市ID，不存在则创建"""
-    city = session.query(City).filter(City.city_name == city_name).first()
-    return city.city_id if city else None
-
-
-def get_indicator_id(session, indicator_name):
-    """获取指标ID，不存在则创建"""
-    indicator = session.query(Indicator).filter(Indicator.indicator_name == indicator_name).first()
-    return indicator.indicator_id if indicator else None
-
-
 def map_indicator_name(indicator_name):
     """映射CSV中的指标名称到数据库中的指标名称"""
     mapping = {
@@ -46,110 +44,169 @@ def map_indicator_name(indicator_name):
     return mapping.get(indicator_name, indicator_name)
 
 
-def import_data_to_db(csv_path):
-    """将CSV数据导入到数据库"""
+def has_unique_key(bind):
+    """annual_data 上是否存在 (city_id, indicator_id, year) 唯一索引，ON CONFLICT 依赖该索引"""
+    inspector = inspect(bind)
+    candidates = [
+        index["column_names"] for index in inspector.get_indexes(AnnualData.__tablename__)
+        if index.get("unique")
+    ] + [
+        constraint["column_names"]
+        for constraint in inspector.get_unique_constraints(AnnualData.__tablename__)
+    ]
+    return any(sorted(columns) == sorted(UPSERT_KEY) for columns in candidates)
+
+
+def melt_csv(df, cities, indicators):
+    """宽表CSV转为 (city_id, indicator_id, year, value) 长表，返回长表和无效值数量"""
+    long_df = df.melt(id_vars=['城市名称', '年份'], var_name='indicator_name', value_name='value')
+    long_df = long_df.dropna(subset=['value'])
+    total = len(long_df)
+
+    long_df['city_id'] = long_df['城市名称'].map(cities)
+    long_df['indicator_id'] = long_df['indicator_name'].map(map_indicator_name).map(indicators)
+
+    for column, label in [('city_id', '城市名称'), ('indicator_id', 'indicator_name')]:
+        unknown = long_df.loc[long_df[column].isna(), label].dropna().unique()
+        if len(unknown):
+            print(f"跳过无效{'城市' if column == 'city_id' else '指标'}: {', '.join(map(str, unknown))}")
+
+    long_df = long_df.dropna(subset=['city_id', 'indicator_id', '年份'])
+    long_df = long_df.astype({'city_id': 'int64', 'indicator_id': 'int64', '年份': 'int64', 'value': 'float64'})
+    long_df = long_df.rename(columns={'年份': 'year'})[UPSERT_KEY + ['value']]
+    long_df = long_df.drop_duplicates(subset=UPSERT_KEY, keep='last')
+
+    return long_df, total - len(long_df)
+
+
+def load_existing(db, long_df):
+    """一次查询取出本批次涉及的已有数据"""
+    rows = db.query(
+        AnnualData.data_id,
+        AnnualData.city_id,
+        AnnualData.indicator_id,
+        AnnualData.year,
+        cast(AnnualData.value, Float).label('existing_value')
+    ).filter(
+        AnnualData.indicator_id.in_(long_df['indicator_id'].unique().tolist()),
+        AnnualData.year >= int(long_df['year'].min()),
+        AnnualData.year <= int(long_df['year'].max())
+    ).all()
+
+    existing = pd.DataFrame(rows, columns=['data_id'] + UPSERT_KEY + ['existing_value']).astype({
+        'data_id': 'int64', 'city_id': 'int64', 'indicator_id': 'int64', 'year': 'int64',
+        'existing_value': 'float64'
+    })
+    return existing.drop_duplicates(subset=UPSERT_KEY, keep='last')
+
+
+def upsert_chunks(db, records, on_conflict):
+    """每个分块一条 INSERT ... ON CONFLICT 语句"""
+    dialect_insert = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}[db.bind.dialect.name]
+
+    for start in range(0, len(records), CHUNK_SIZE):
+        stmt = dialect_insert(AnnualData).values(records[start:start + CHUNK_SIZE])
+        if on_conflict == 'update':
+            stmt = stmt.on_conflict_do_update(
+                index_elements=UPSERT_KEY,
+                set_={
+                    'value': stmt.excluded.value,
+                    'data_quality': stmt.excluded.data_quality,
+                    'data_source': stmt.excluded.data_source
+                }
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=UPSERT_KEY)
+        db.execute(stmt)
+
+
+def bulk_import_data(csv_path, on_conflict='update'):
+    """
+    向量化导入CSV数据。
+
+    宽表经 pandas melt 转为长表，城市与指标名称各用一次内存查找解析，
+    写入时每个分块执行一条批量 INSERT ... ON CONFLICT DO UPDATE/NOTHING。
+    on_conflict 为 'update' 时覆盖数值有变化的已有数据，为 'ignore' 时保留已有数据。
+    返回 inserted / updated / skipped / invalid 计数。
+    """
+    counts = {'inserted': 0, 'updated': 0, 'skipped': 0, 'invalid': 0}
+
     df = load_csv_data(csv_path)
     if df is None:
-        return
+        return counts
 
-    # 创建数据库会话
     db = SessionLocal()
-    
+
     try:
-        # 确保城市和指标表已初始化
-        print("检查城市和指标数据...")
-        cities = db.query(City).all()
-        indicators = db.query(Indicator).all()
-        
-        if len(cities) == 0:
-            print("城市数据未初始化，请先运行 python -m app.db.init_db")
-            return
-        
-        if len(indicators) == 0:
-            print("指标数据未初始化，请先运行 python -m app.db.init_db")
-            return
-        
-        print(f"数据库中已有 {len(cities)} 个城市和 {len(indicators)} 个指标")
-        
-        # 遍历CSV数据，准备插入
-        print("准备导入数据...")
-        success_count = 0
-        skip_count = 0
-        
-        # 遍历CSV的每一行
-        for index, row in df.iterrows():
-            city_name = row['城市名称']
-            year = row['年份']
-            
-            # 跳过无效数据
-            if pd.isna(city_name) or pd.isna(year):
-                skip_count += 1
-                continue
-            
-            city_id = get_city_id(db, city_name)
-            if not city_id:
-                print(f"跳过无效城市: {city_name}")
-                skip_count += 1
-                continue
-            
-            # 遍历所有指标列
-            for col in df.columns:
-                if col in ['城市名称', '年份']:
-                    continue
-                
-                indicator_name = map_indicator_name(col)
-                indicator_id = get_indicator_id(db, indicator_name)
-                
-                if not indicator_id:
-                    print(f"跳过无效指标: {indicator_name}")
-                    continue
-                
-                value = row[col]
-                if pd.isna(value):
-                    continue
-                
-                # 检查数据是否已存在
-                existing_data = db.query(AnnualData).filter(
-                    AnnualData.city_id == city_id,
-                    AnnualData.indicator_id == indicator_id,
-                    AnnualData.year == year
-                ).first()
-                
-                if existing_data:
-                    skip_count += 1
-                    continue
-                
-                # 创建新数据记录
-                annual_data = AnnualData(
-                    city_id=city_id,
-                    indicator_id=indicator_id,
-                    year=year,
-                    value=float(value),
-                    data_quality='normal',
-                    data_source='CSV导入'
-                )
-                
-                db.add(annual_data)
-                success_count += 1
-                
-                # 每100条数据提交一次
-                if success_count % 100 == 0:
-                    db.commit()
-                    print(f"已导入 {success_count} 条数据")
-        
-        # 提交剩余数据
-        db.commit()
-        
+        cities = dict(db.query(City.city_name, City.city_id).all())
+        indicators = dict(db.query(Indicator.indicator_name, Indicator.indicator_id).all())
+
+        if not cities or not indicators:
+            print("城市或指标数据未初始化，请先运行 python -m app.db.init_db")
+            return counts
+
+        long_df, counts['invalid'] = melt_csv(df, cities, indicators)
+        if long_df.empty:
+            print("没有可导入的数据")
+            return counts
+
+        existing = load_existing(db, long_df)
+        merged = long_df.merge(existing, on=UPSERT_KEY, how='left')
+
+        is_new = merged['data_id'].isna()
+        # 按 DECIMAL(20,4) 的精度比较是否变化，写入的仍是解析出的原值
+        scale = AnnualData.value.type.scale
+        is_changed = ~is_new & (merged['value'].round(scale) != merged['existing_value'].round(scale))
+        if on_conflict != 'update':
+            is_changed[:] = False
+
+        counts['inserted'] = int(is_new.sum())
+        counts['updated'] = int(is_changed.sum())
+        counts['skipped'] = int(len(merged) - counts['inserted'] - counts['updated'])
+
+        to_write = merged.loc[is_new | is_changed].assign(data_quality='normal', data_source='CSV导入')
+        columns = UPSERT_KEY + ['value', 'data_quality', 'data_source']
+
+        if has_unique_key(db.bind) and db.bind.dialect.name in ('sqlite', 'postgresql'):
+            upsert_chunks(db, to_write[columns].to_dict('records'), on_conflict)
+        else:
+            # 没有唯一索引时无法使用 ON CONFLICT：新数据批量插入，变化的数据按主键批量更新
+            new_rows = to_write.loc[to_write['data_id'].isna(), columns]
+            changed_rows = to_write.loc[to_write['data_id'].notna()]
+            if len(new_rows):
+                db.execute(insert(AnnualData), new_rows.to_dict('records'))
+            if len(changed_rows):
+                db.execute(update(AnnualData), [
+                    {'data_id': int(row.data_id), 'value': row.value, 'data_source': row.data_source}
+                    for row in changed_rows.itertuples()
+                ])
+
+        # 没有新增或更新时数据未变，不重建汇总，也不使各进程的缓存与 ETag 失效
+        if counts['inserted'] + counts['updated']:
+            RegionalSummaryService.rebuild(db)
+            # 服务进程据此发现导入的数据，重建面板并使缓存与 ETag 失效
+            data_versions.bump(db, "annual_data")
+            db.commit()
+            PanelService.invalidate()
+            invalidate("query", "prediction")
+
         print(f"\n数据导入完成！")
-        print(f"成功导入: {success_count} 条数据")
-        print(f"跳过: {skip_count} 条数据")
-        
+        print(f"新增: {counts['inserted']} 条，更新: {counts['updated']} 条，"
+              f"跳过: {counts['skipped']} 条，无效: {counts['invalid']} 条")
+
     except Exception as e:
         print(f"数据导入失败: {e}")
         db.rollback()
     finally:
         db.close()
 
+    return counts
+
+
+def import_data_to_db(csv_path):
+    """将CSV数据导入到数据库"""
+    return bulk_import_data(csv_path)
+
 
 if __name__ == "__main__":
     csv_file_path = "../data/大湾区补充数据年.csv"
@@ -161,6 +218,11 @@ if __name__ == "__main__":
         print(f"CSV文件不存在: {csv_file_path}")
         exit(1)
     
+    parser = argparse.ArgumentParser(description="导入大湾区年度数据CSV")
+    parser.add_argument("--on-conflict", choices=["update", "ignore"], default="update",
+                        help="已存在数据的处理方式：update 覆盖变化的数值，ignore 保留已有数据")
+    args = parser.parse_args()
+
     print(f"开始导入数据: {csv_file_path}")
-    import_data_to_db(csv_file_path)
+    bulk_import_data(csv_file_path, args.on_conflict)
     print("数据导入脚本执行完毕！")
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal, engine, Base
+from app.db.migrations import run_migrations
 from app.models.database import City, Indicator
 from app.models.schemas import CityCreate, IndicatorCreate
 
@@ -79,6 +80,7 @@ INDICATORS_DATA = [
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
     
     db = SessionLocal()
     
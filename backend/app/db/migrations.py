@@ -0,0 +1,211 @@
+from typing import Callable, List, Tuple
+from sqlalchemy import text, select, inspect, tuple_
+from sqlalchemy.engine import Connection, Engine
+from app.db.session import engine
+from app.core.data_versions import DATASETS
+from app.models.database import AnnualData, DataVersion, Job, RegionalSummary
+from app.services.summary_service import RegionalSummaryService
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+
+class DuplicateRowsError(Exception):
+    """唯一键存在重复行，需要通过命令行迁移（python -m app.db.migrations）去重后才能建立唯一索引"""
+
+    def __init__(self, table: str, count: int):
+        super().__init__(
+            f"{table}: 存在 {count} 条唯一键重复的数据，无法建立唯一索引；"
+            "请先执行 python -m app.db.migrations 去重后再启动服务"
+        )
+        self.table = table
+        self.count = count
+
+
+def _not_null(key_columns: List[str]) -> str:
+    # 键列为 NULL 的行不受唯一索引约束（如 predictions.model_id），不参与分组
+    return " AND ".join(f"{column} IS NOT NULL" for column in key_columns)
+
+
+def _count_duplicates(conn: Connection, table: str, key_columns: List[str]) -> int:
+    keys = ", ".join(key_columns)
+    return conn.execute(text(
+        f"SELECT COALESCE(SUM(n - 1), 0) FROM ("
+        f"SELECT COUNT(*) AS n FROM {table} WHERE {_not_null(key_columns)} "
+        f"GROUP BY {keys} HAVING COUNT(*) > 1) duplicates"
+    )).scalar() or 0
+
+
+def _dedupe(conn: Connection, table: str, key_columns: List[str], id_column: str) -> int:
+    """删除唯一键重复的行，每组保留主键最大（最近写入）的一行"""
+    keys = ", ".join(key_columns)
+    not_null = _not_null(key_columns)
+    result = conn.execute(text(
+        f"DELETE FROM {table} WHERE {not_null} AND {id_column} NOT IN ("
+        f"SELECT MAX({id_column}) FROM {table} WHERE {not_null} GROUP BY {keys})"
+    ))
+    return result.rowcount or 0
+
+
+def _create_unique_index(
+    conn: Connection,
+    table: str,
+    name: str,
+    key_columns: List[str],
+    id_column: str
+) -> None:
+    duplicates = _count_duplicates(conn, table, key_columns)
+    if duplicates:
+        # 只有命令行迁移会删除数据，服务启动时不做破坏性的去重
+        if not conn.get_execution_options().get("dedupe"):
+            raise DuplicateRowsError(table, duplicates)
+        removed = _dedupe(conn, table, key_columns, id_column)
+        print(f"{table}: 删除 {removed} 条重复数据")
+    conn.execute(text(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(key_columns)})"
+    ))
+
+
+def add_annual_data_unique_index(conn: Connection) -> None:
+    _create_unique_index(
+        conn, "annual_data", "uq_annual_data_city_indicator_year",
+        ["city_id", "indicator_id", "year"], "data_id"
+    )
+
+
+def add_predictions_unique_index(conn: Connection) -> None:
+    _create_unique_index(
+        conn, "predictions", "uq_predictions_model_city_indicator_year",
+        ["model_id", "city_id", "indicator_id", "year"], "prediction_id"
+    )
+
+
+def add_annual_data_keyset_index(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_annual_data_keyset ON annual_data (year, city_id, indicator_id, data_id)"
+    ))
+
+
+def add_prediction_models_lookup_index(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_prediction_models_type_name ON prediction_models (model_type, model_name)"
+    ))
+
+
+def build_regional_summary(conn: Connection) -> None:
+    # 命令行单独执行迁移时 create_all 没有运行过，表需要在这里创建
+    RegionalSummary.__table__.create(conn, checkfirst=True)
+    RegionalSummaryService.rebuild(conn)
+
+
+def add_data_versions(conn: Connection) -> None:
+    DataVersion.__table__.create(conn, checkfirst=True)
+    existing = {name for (name,) in conn.execute(select(DataVersion.name))}
+    for name in DATASETS:
+        if name not in existing:
+            conn.execute(DataVersion.__table__.insert().values(name=name, version=0))
+
+
+def add_job_owner(conn: Connection) -> None:
+    Job.__table__.create(conn, checkfirst=True)
+    existing = {column["name"] for column in inspect(conn).get_columns("jobs")}
+    for name, ddl in (("owner", "VARCHAR(100)"), ("heartbeat_at", "TIMESTAMP")):
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE jobs ADD COLUMN {name} {ddl}"))
+
+
+# 按顺序执行的迁移，版本号一经发布不可修改；新迁移追加在末尾
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("0001_annual_data_unique_index", add_annual_data_unique_index),
+    ("0002_predictions_unique_index", add_predictions_unique_index),
+    ("0003_regional_summary", build_regional_summary),
+    ("0004_annual_data_keyset_index", add_annual_data_keyset_index),
+    ("0005_prediction_models_lookup_index", add_prediction_models_lookup_index),
+    ("0006_data_versions", add_data_versions),
+    ("0007_job_owner", add_job_owner),
+]
+
+
+def run_migrations(bind: Engine = engine, dedupe: bool = False) -> List[str]:
+    """
+    对已有数据库执行尚未应用的迁移，返回本次应用的版本号。
+
+    create_all 只会创建缺失的表，不会修改已存在的表，因此索引等结构变更通过这里补齐。
+    每个迁移与其版本记录在同一事务中提交。
+
+    建立唯一索引时遇到重复数据：dedupe 为 True（命令行迁移）时删除重复行；
+    否则抛出 DuplicateRowsError 使服务启动失败，而不是带着未应用的迁移（如地区汇总）继续运行。
+    """
+    with bind.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+            "version VARCHAR(100) PRIMARY KEY, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        applied = {row[0] for row in conn.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE}"))}
+
+    newly_applied = []
+    for version, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with bind.begin() as conn:
+            conn.execution_options(dedupe=dedupe)
+            migrate(conn)
+            conn.execute(
+                text(f"INSERT INTO {MIGRATIONS_TABLE} (version) VALUES (:version)"),
+                {"version": version}
+            )
+        newly_applied.append(version)
+
+    return newly_applied
+
+
+def explain(bind: Engine, statement) -> List[str]:
+    """返回查询的执行计划文本，支持 SQLite 与 PostgreSQL"""
+    compiled = str(statement.compile(bind, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if bind.dialect.name == "sqlite" else "EXPLAIN "
+    with bind.connect() as conn:
+        rows = conn.execute(text(prefix + compiled)).fetchall()
+    return [str(row[-1]) for row in rows]
+
+
+def check_query_plans(bind: Engine = engine) -> List[Tuple[str, bool, List[str]]]:
+    """检查主要的 annual_data 查询是否通过预期的复合索引查找"""
+    from app.services.data_service import KEYSET_COLUMNS
+
+    keyset = [getattr(AnnualData, c) for c in KEYSET_COLUMNS]
+    queries = {
+        # DataService.get_annual_data 按城市、指标和年份范围过滤
+        "get_annual_data(city, indicator, years)": (select(AnnualData).where(
+            AnnualData.city_id == 1,
+            AnnualData.indicator_id == 1,
+            AnnualData.year >= 2010,
+            AnnualData.year <= 2020
+        ).order_by(AnnualData.year), "uq_annual_data_city_indicator_year"),
+        # 单个城市、指标、年份的取值
+        "get_annual_data(city, indicator, year)": (select(AnnualData).where(
+            AnnualData.city_id == 1,
+            AnnualData.indicator_id == 1,
+            AnnualData.year == 2020
+        ), "uq_annual_data_city_indicator_year"),
+        # DataService.get_annual_data_page 从游标位置继续读取下一页
+        "get_annual_data_page(cursor)": (select(*keyset).where(
+            tuple_(*keyset) > tuple_(2010, 1, 1, 1)
+        ).order_by(*keyset).limit(100), "ix_annual_data_keyset")
+    }
+
+    results = []
+    for name, (statement, index_name) in queries.items():
+        plan = explain(bind, statement)
+        results.append((name, any(index_name in line for line in plan), plan))
+    return results
+
+
+if __name__ == "__main__":
+    applied = run_migrations(dedupe=True)
+    print(f"已应用迁移: {', '.join(applied)}" if applied else "数据库结构已是最新")
+
+    if inspect(engine).has_table("annual_data"):
+        for name, uses_index, plan in check_query_plans():
+            print(f"[{'索引' if uses_index else '扫描'}] {name}")
+            for line in plan:
+                print(f"    {line}")
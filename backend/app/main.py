@@ -1,12 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from app.core import cache, metrics
 from app.core.config import get_settings
+from app.core.compute import shutdown_process_pool
+from app.core.warmup import start_warm_up
 from app.db.session import engine, Base
-from app.api import data, prediction
+from app.db.migrations import run_migrations
+from app.api import data, prediction, jobs
+from app.services.job_service import JobService, shutdown_job_executor
 
 settings = get_settings()
 
 Base.metadata.create_all(bind=engine)
+# 唯一键存在重复数据时抛出 DuplicateRowsError 并终止启动，去重只通过命令行迁移执行
+run_migrations(engine)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -22,8 +30,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    metrics.instrument_engine(engine)
+    app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(data.router, prefix=f"{settings.API_V1_STR}/data", tags=["数据服务"])
 app.include_router(prediction.router, prefix=f"{settings.API_V1_STR}/prediction", tags=["预测服务"])
+app.include_router(jobs.router, prefix=f"{settings.API_V1_STR}/jobs", tags=["后台任务"])
+
+
+@app.on_event("startup")
+def recover_jobs():
+    JobService.recover_local_jobs()
+
+
+@app.on_event("startup")
+def warm_up_models():
+    if settings.WARMUP_ON_STARTUP:
+        start_warm_up()
+
+
+@app.on_event("shutdown")
+def shutdown_compute_pool():
+    shutdown_job_executor()
+    shutdown_process_pool()
 
 
 @app.get("/")
@@ -40,6 +70,16 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get(f"{settings.API_V1_STR}/cache/stats")
+def get_cache_stats():
+    return cache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
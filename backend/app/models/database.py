@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DECIMAL, TIMESTAMP, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DECIMAL, TIMESTAMP, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
@@ -45,6 +45,12 @@ class AnnualData(Base):
     
     city = relationship("City", back_populates="annual_data")
     indicator = relationship("Indicator", back_populates="annual_data")
+    
+    __table_args__ = (
+        Index("uq_annual_data_city_indicator_year", "city_id", "indicator_id", "year", unique=True),
+        # 与 /data/annual-data 键集分页的排序一致
+        Index("ix_annual_data_keyset", "year", "city_id", "indicator_id", "data_id"),
+    )
 
 
 class PredictionModel(Base):
@@ -60,6 +66,11 @@ class PredictionModel(Base):
     created_at = Column(TIMESTAMP, server_default=func.now())
     
     predictions = relationship("Prediction", back_populates="model")
+    
+    __table_args__ = (
+        # 按类型和名称查找单个序列保存的模型参数，如 ARIMA 自动定阶结果
+        Index("ix_prediction_models_type_name", "model_type", "model_name"),
+    )
 
 
 class Prediction(Base):
@@ -76,3 +87,50 @@ class Prediction(Base):
     created_at = Column(TIMESTAMP, server_default=func.now())
     
     model = relationship("PredictionModel", back_populates="predictions")
+    
+    __table_args__ = (
+        Index("uq_predictions_model_city_indicator_year", "model_id", "city_id", "indicator_id", "year", unique=True),
+    )
+
+
+class RegionalSummary(Base):
+    __tablename__ = "regional_summary"
+    
+    summary_id = Column(Integer, primary_key=True, index=True)
+    year = Column(Integer, nullable=False)
+    indicator_id = Column(Integer, ForeignKey("indicators.indicator_id"), nullable=False)
+    region = Column(String(50), nullable=False)
+    total_value = Column(DECIMAL(24, 4))
+    city_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("uq_regional_summary_year_indicator_region", "year", "indicator_id", "region", unique=True),
+    )
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    job_id = Column(String(32), primary_key=True)
+    job_type = Column(String(50), nullable=False)
+    params = Column(JSON)
+    status = Column(String(20), nullable=False, default="pending", index=True)
+    progress = Column(DECIMAL(5, 4), default=0)
+    result = Column(JSON)
+    error = Column(String(500))
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    started_at = Column(TIMESTAMP)
+    finished_at = Column(TIMESTAMP)
+    expires_at = Column(TIMESTAMP)
+    # 执行任务的进程（主机名:pid）与其最近一次心跳，心跳超时的任务视为执行进程已退出
+    owner = Column(String(100))
+    heartbeat_at = Column(TIMESTAMP)
+
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+    
+    # 数据集名称（cities / indicators / annual_data / backtest），每次写入在同一事务中递增 version
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
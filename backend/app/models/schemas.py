@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal, Tuple
 from datetime import datetime
 
 
@@ -89,6 +89,8 @@ class CorrelationRequest(BaseModel):
     indicator_ids: List[int]
     start_year: Optional[int] = None
     end_year: Optional[int] = None
+    method: Literal["pearson", "spearman"] = "pearson"
+    mode: Literal["pooled", "per_city"] = "pooled"
 
 
 class CorrelationResult(BaseModel):
@@ -105,6 +107,13 @@ class TrendAnalysisRequest(BaseModel):
     end_year: Optional[int] = None
 
 
+class BulkTrendAnalysisRequest(BaseModel):
+    city_ids: Optional[List[int]] = None
+    indicator_ids: Optional[List[int]] = None
+    start_year: Optional[int] = None
+    end_year: Optional[int] = None
+
+
 class TrendAnalysisResult(BaseModel):
     city: str
     indicator: str
@@ -120,6 +129,34 @@ class PredictionRequest(BaseModel):
     model_type: str = "linear"
     prediction_years: int = 3
     confidence_level: float = 0.95
+    # 仅用于 ARIMA：指定 (p, d, q)，或由 auto_order 按信息准则自动选择
+    order: Optional[Tuple[int, int, int]] = None
+    auto_order: bool = False
+
+
+class BulkPredictionRequest(BaseModel):
+    city_ids: Optional[List[int]] = None
+    indicator_ids: Optional[List[int]] = None
+    model_types: List[str] = ["linear"]
+    prediction_years: int = 3
+    confidence_level: float = 0.95
+    # 用于 ARIMA 及集成模型中的 ARIMA：指定 (p, d, q)，或由 auto_order 为各序列分别选择
+    order: Optional[Tuple[int, int, int]] = None
+    auto_order: bool = False
+
+
+class ArimaRefitRequest(BaseModel):
+    city_ids: Optional[List[int]] = None
+    indicator_ids: Optional[List[int]] = None
+
+
+class BacktestRequest(BaseModel):
+    city_ids: Optional[List[int]] = None
+    indicator_ids: Optional[List[int]] = None
+    model_types: List[str] = ["linear", "arima", "ensemble"]
+    horizon: Optional[int] = None
+    min_train_years: Optional[int] = None
+    order: Tuple[int, int, int] = (1, 1, 1)
 
 
 class PredictionResult(BaseModel):
@@ -130,6 +167,26 @@ class PredictionResult(BaseModel):
     accuracy: Dict[str, float]
 
 
+class JobCreate(BaseModel):
+    job_type: str
+    params: Dict[str, Any] = {}
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    job_type: str
+    status: str
+    progress: float
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
 class ReportRequest(BaseModel):
     report_type: str
     city_ids: List[int]
@@ -1,16 +1,17 @@
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
-import pandas as pd
 import numpy as np
-from scipy import stats
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import r2_score
+from app.core.cache import cached
 from app.services.data_service import DataService
+from app.services.panel_service import PanelService
+from app.utils.correlation import correlation_matrix
+from app.utils.trend_engine import fit_trends, first_last_valid
 
 
 class AnalysisService:
     
     @staticmethod
+    @cached("query")
     def compare_cities(
         db: Session,
         city_ids: List[int],
@@ -18,13 +19,32 @@ class AnalysisService:
         start_year: Optional[int] = None,
         end_year: Optional[int] = None
     ) -> List[Dict[str, Any]]:
+        cities = {c.city_id: c for c in DataService.get_cities_by_ids(db, city_ids)}
+        indicators = {i.indicator_id: i for i in DataService.get_indicators_by_ids(db, indicator_ids)}
+        city_ids = [c for c in city_ids if c in cities]
+        indicator_ids = [i for i in indicator_ids if i in indicators]
+        
+        # 城市 × 指标 × 年份 数据块，统计量在整个块上向量化计算
+        years, block, present = PanelService.get_panel(db).block(
+            city_ids, indicator_ids, start_year, end_year
+        )
+        
+        valid = ~np.isnan(block)
+        valid_counts = valid.sum(axis=2)
+        first, latest = first_last_valid(block.reshape(valid_counts.size, len(years)))
+        first = first.reshape(valid_counts.shape)
+        latest = latest.reshape(valid_counts.shape)
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg_values = np.where(valid, block, 0.0).sum(axis=2) / valid_counts
+            min_values = np.where(valid, block, np.inf).min(axis=2, initial=np.inf)
+            max_values = np.where(valid, block, -np.inf).max(axis=2, initial=-np.inf)
+            growth_rates = (latest - first) / first * 100
+        
         results = []
         
-        for indicator_id in indicator_ids:
-            indicator = DataService.get_indicator_by_id(db, indicator_id)
-            if not indicator:
-                continue
-            
+        for i, indicator_id in enumerate(indicator_ids):
+            indicator = indicators[indicator_id]
             indicator_data = {
                 "indicator_id": indicator_id,
                 "indicator_name": indicator.indicator_name,
@@ -32,36 +52,25 @@ class AnalysisService:
                 "cities": []
             }
             
-            for city_id in city_ids:
-                city = DataService.get_city_by_id(db, city_id)
-                if not city:
-                    continue
-                
-                data = DataService.get_annual_data(
-                    db, city_id=city_id, indicator_id=indicator_id,
-                    start_year=start_year, end_year=end_year
-                )
-                
+            for c, city_id in enumerate(city_ids):
+                row_present = present[c, i]
                 city_data = {
                     "city_id": city_id,
-                    "city_name": city.city_name,
-                    "values": {d.year: float(d.value) if d.value else None for d in data}
+                    "city_name": cities[city_id].city_name,
+                    "values": {
+                        int(y): None if np.isnan(v) else float(v)
+                        for y, v in zip(years[row_present], block[c, i, row_present])
+                    }
                 }
                 
-                if city_data["values"]:
-                    valid_values = [v for v in city_data["values"].values() if v is not None]
-                    if valid_values:
-                        city_data["avg_value"] = np.mean(valid_values)
-                        city_data["min_value"] = np.min(valid_values)
-                        city_data["max_value"] = np.max(valid_values)
-                        city_data["latest_value"] = valid_values[-1]
-                    
-                    if len(valid_values) >= 2:
-                        years = list(city_data["values"].keys())
-                        values = [city_data["values"][y] for y in years if city_data["values"][y] is not None]
-                        if len(values) >= 2:
-                            growth_rate = ((values[-1] - values[0]) / values[0]) * 100
-                            city_data["growth_rate"] = growth_rate
+                if valid_counts[c, i] > 0:
+                    city_data["avg_value"] = float(avg_values[c, i])
+                    city_data["min_value"] = float(min_values[c, i])
+                    city_data["max_value"] = float(max_values[c, i])
+                    city_data["latest_value"] = float(latest[c, i])
+                
+                if valid_counts[c, i] >= 2 and np.isfinite(growth_rates[c, i]):
+                    city_data["growth_rate"] = float(growth_rates[c, i])
                 
                 indicator_data["cities"].append(city_data)
             
@@ -70,54 +79,147 @@ class AnalysisService:
         return results
     
     @staticmethod
-    def calculate_correlation(
+    def _correlation_inputs(
         db: Session,
         city_ids: List[int],
         indicator_ids: List[int],
-        start_year: Optional[int] = None,
-        end_year: Optional[int] = None
+        start_year: Optional[int],
+        end_year: Optional[int],
+        method: str,
+        mode: str
+    ) -> Dict[str, Any]:
+        """加载一次面板，按 (城市, 年份) 对齐后计算完整的指标 × 指标相关矩阵"""
+        indicators = {i.indicator_id: i for i in DataService.get_indicators_by_ids(db, indicator_ids)}
+        indicator_ids = [i for i in indicator_ids if i in indicators]
+        
+        years, block, _ = PanelService.get_panel(db).block(
+            city_ids, indicator_ids, start_year, end_year
+        )
+        
+        # (城市, 指标, 年份) -> (城市, 年份, 指标)，每行是一个观测
+        observations = block.transpose(0, 2, 1)
+        if mode == "pooled":
+            observations = observations.reshape(len(city_ids) * len(years), len(indicator_ids))
+        
+        corr, p_values, counts = correlation_matrix(observations, method)
+        
+        return {
+            "indicator_ids": indicator_ids,
+            "indicators": indicators,
+            "corr": corr,
+            "p_values": p_values,
+            "counts": counts
+        }
+    
+    @staticmethod
+    def _correlation_pairs(
+        inputs: Dict[str, Any],
+        corr: np.ndarray,
+        p_values: np.ndarray
     ) -> List[Dict[str, Any]]:
-        correlations = []
+        indicator_ids = inputs["indicator_ids"]
+        indicators = inputs["indicators"]
+        pairs = []
         
         for i in range(len(indicator_ids)):
             for j in range(i + 1, len(indicator_ids)):
-                ind1 = DataService.get_indicator_by_id(db, indicator_ids[i])
-                ind2 = DataService.get_indicator_by_id(db, indicator_ids[j])
-                
-                if not ind1 or not ind2:
+                if np.isnan(corr[i, j]):
                     continue
                 
-                values1 = []
-                values2 = []
-                
-                for city_id in city_ids:
-                    data1 = DataService.get_annual_data(
-                        db, city_id=city_id, indicator_id=indicator_ids[i],
-                        start_year=start_year, end_year=end_year
-                    )
-                    data2 = DataService.get_annual_data(
-                        db, city_id=city_id, indicator_id=indicator_ids[j],
-                        start_year=start_year, end_year=end_year
-                    )
-                    
-                    for d1 in data1:
-                        for d2 in data2:
-                            if d1.year == d2.year and d1.value and d2.value:
-                                values1.append(float(d1.value))
-                                values2.append(float(d2.value))
-                
-                if len(values1) >= 3:
-                    corr, p_value = stats.pearsonr(values1, values2)
-                    correlations.append({
-                        "indicator_1": ind1.indicator_name,
-                        "indicator_2": ind2.indicator_name,
-                        "correlation": round(corr, 4),
-                        "p_value": round(p_value, 4),
-                        "strength": AnalysisService._get_correlation_strength(abs(corr))
-                    })
+                pairs.append({
+                    "indicator_1": indicators[indicator_ids[i]].indicator_name,
+                    "indicator_2": indicators[indicator_ids[j]].indicator_name,
+                    "correlation": round(float(corr[i, j]), 4),
+                    "p_value": round(float(p_values[i, j]), 4),
+                    "strength": AnalysisService._get_correlation_strength(abs(corr[i, j]))
+                })
+        
+        return pairs
+    
+    @staticmethod
+    @cached("query")
+    def calculate_correlation(
+        db: Session,
+        city_ids: List[int],
+        indicator_ids: List[int],
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None,
+        method: str = "pearson",
+        mode: str = "pooled"
+    ) -> List[Dict[str, Any]]:
+        inputs = AnalysisService._correlation_inputs(
+            db, city_ids, indicator_ids, start_year, end_year, method, mode
+        )
+        
+        if mode == "pooled":
+            return AnalysisService._correlation_pairs(inputs, inputs["corr"], inputs["p_values"])
+        
+        cities = {c.city_id: c for c in DataService.get_cities_by_ids(db, city_ids)}
+        correlations = []
+        for c, city_id in enumerate(city_ids):
+            if city_id not in cities:
+                continue
+            for pair in AnalysisService._correlation_pairs(inputs, inputs["corr"][c], inputs["p_values"][c]):
+                correlations.append({
+                    "city_id": city_id,
+                    "city_name": cities[city_id].city_name,
+                    **pair
+                })
         
         return correlations
     
+    @staticmethod
+    @cached("query")
+    def calculate_correlation_matrix(
+        db: Session,
+        city_ids: List[int],
+        indicator_ids: List[int],
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None,
+        method: str = "pearson",
+        mode: str = "pooled"
+    ) -> Dict[str, Any]:
+        inputs = AnalysisService._correlation_inputs(
+            db, city_ids, indicator_ids, start_year, end_year, method, mode
+        )
+        
+        def to_list(matrix: np.ndarray, digits: int) -> List[List[Optional[float]]]:
+            return [[None if np.isnan(v) else round(float(v), digits) for v in row] for row in matrix]
+        
+        result = {
+            "method": method,
+            "mode": mode,
+            "indicators": [
+                {
+                    "indicator_id": indicator_id,
+                    "indicator_name": inputs["indicators"][indicator_id].indicator_name
+                }
+                for indicator_id in inputs["indicator_ids"]
+            ]
+        }
+        
+        if mode == "pooled":
+            result.update({
+                "matrix": to_list(inputs["corr"], 4),
+                "p_values": to_list(inputs["p_values"], 4),
+                "observations": inputs["counts"].tolist()
+            })
+            return result
+        
+        cities = {c.city_id: c for c in DataService.get_cities_by_ids(db, city_ids)}
+        result["cities"] = [
+            {
+                "city_id": city_id,
+                "city_name": cities[city_id].city_name,
+                "matrix": to_list(inputs["corr"][c], 4),
+                "p_values": to_list(inputs["p_values"][c], 4),
+                "observations": inputs["counts"][c].tolist()
+            }
+            for c, city_id in enumerate(city_ids)
+            if city_id in cities
+        ]
+        return result
+    
     @staticmethod
     def _get_correlation_strength(corr: float) -> str:
         if corr >= 0.8:
@@ -130,6 +232,7 @@ class AnalysisService:
             return "极弱相关"
     
     @staticmethod
+    @cached("query")
     def analyze_trend(
         db: Session,
         city_id: int,
@@ -140,35 +243,25 @@ class AnalysisService:
         city = DataService.get_city_by_id(db, city_id)
         indicator = DataService.get_indicator_by_id(db, indicator_id)
         
-        data = DataService.get_annual_data(
-            db, city_id=city_id, indicator_id=indicator_id,
-            start_year=start_year, end_year=end_year
+        years, values = DataService.get_series(
+            db, city_id, indicator_id, start_year, end_year
         )
         
-        valid_data = [(d.year, float(d.value)) for d in data if d.value is not None]
-        
-        if len(valid_data) < 2:
+        if len(values) < 2:
             return {
                 "city": city.city_name if city else "",
                 "indicator": indicator.indicator_name if indicator else "",
                 "error": "数据不足，无法进行趋势分析"
             }
         
-        years = np.array([d[0] for d in valid_data]).reshape(-1, 1)
-        values = np.array([d[1] for d in valid_data])
-        
-        model = LinearRegression()
-        model.fit(years, values)
-        
-        predictions = model.predict(years)
-        r_squared = r2_score(values, predictions)
-        
-        slope = model.coef_[0]
-        intercept = model.intercept_
+        fit = fit_trends(years, values)
+        slope = float(fit.slope[0])
+        intercept = float(fit.intercept[0])
+        r_squared = float(fit.r_squared[0])
         
         growth_rate = None
-        if len(valid_data) >= 2:
-            growth_rate = ((values[-1] - values[0]) / values[0]) * 100
+        if len(values) >= 2:
+            growth_rate = float((values[-1] - values[0]) / values[0]) * 100
         
         return {
             "city": city.city_name if city else "",
@@ -179,10 +272,76 @@ class AnalysisService:
             "r_squared": round(r_squared, 4),
             "growth_rate": round(growth_rate, 2) if growth_rate is not None else None,
             "trend": "上升" if slope > 0 else "下降" if slope < 0 else "平稳",
-            "data_points": len(valid_data)
+            "data_points": len(values)
         }
     
     @staticmethod
+    @cached("query")
+    def analyze_trends_bulk(
+        db: Session,
+        city_ids: Optional[List[int]] = None,
+        indicator_ids: Optional[List[int]] = None,
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """一次矩阵运算拟合所选（默认全部）城市 × 指标序列的线性趋势"""
+        panel = PanelService.get_panel(db)
+        
+        city_pos = [panel.city_index[c] for c in (city_ids or panel.city_ids.tolist()) if c in panel.city_index]
+        indicator_pos = [
+            panel.indicator_index[i] for i in (indicator_ids or panel.indicator_ids.tolist())
+            if i in panel.indicator_index
+        ]
+        if not city_pos or not indicator_pos:
+            return []
+        
+        ys = panel.year_slice(start_year, end_year)
+        years = panel.years[ys]
+        block = panel.values[np.ix_(city_pos, indicator_pos)][:, :, ys]
+        series = block.reshape(len(city_pos) * len(indicator_pos), len(years))
+        
+        fit = fit_trends(years, series)
+        first, last = first_last_valid(series)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            growth = (last - first) / first * 100
+        
+        cities = {c.city_id: c for c in DataService.get_all_cities(db)}
+        indicators = {i.indicator_id: i for i in DataService.get_all_indicators(db)}
+        
+        results = []
+        for k in range(len(series)):
+            city_id = int(panel.city_ids[city_pos[k // len(indicator_pos)]])
+            indicator_id = int(panel.indicator_ids[indicator_pos[k % len(indicator_pos)]])
+            city = cities.get(city_id)
+            indicator = indicators.get(indicator_id)
+            
+            item = {
+                "city_id": city_id,
+                "indicator_id": indicator_id,
+                "city": city.city_name if city else "",
+                "indicator": indicator.indicator_name if indicator else "",
+                "unit": indicator.unit if indicator else "",
+                "data_points": int(fit.n[k])
+            }
+            
+            if fit.n[k] < 2:
+                item["error"] = "数据不足，无法进行趋势分析"
+            else:
+                slope = float(fit.slope[k])
+                item.update({
+                    "slope": round(slope, 4),
+                    "intercept": round(float(fit.intercept[k]), 4),
+                    "r_squared": round(float(fit.r_squared[k]), 4),
+                    "growth_rate": round(float(growth[k]), 2) if np.isfinite(growth[k]) else None,
+                    "trend": "上升" if slope > 0 else "下降" if slope < 0 else "平稳"
+                })
+            
+            results.append(item)
+        
+        return results
+    
+    @staticmethod
+    @cached("query")
     def calculate_growth_rate(
         db: Session,
         city_id: int,
@@ -192,19 +351,11 @@ class AnalysisService:
         city = DataService.get_city_by_id(db, city_id)
         indicator = DataService.get_indicator_by_id(db, indicator_id)
         
-        current_data = db.query(AnnualData).filter(
-            AnnualData.city_id == city_id,
-            AnnualData.indicator_id == indicator_id,
-            AnnualData.year == year
-        ).first()
-        
-        previous_data = db.query(AnnualData).filter(
-            AnnualData.city_id == city_id,
-            AnnualData.indicator_id == indicator_id,
-            AnnualData.year == year - 1
-        ).first()
+        _, values, present = PanelService.get_panel(db).series(
+            city_id, indicator_id, year - 1, year
+        )
         
-        if not current_data or not previous_data:
+        if len(present) < 2 or not present.all():
             return {
                 "city": city.city_name if city else "",
                 "indicator": indicator.indicator_name if indicator else "",
@@ -212,7 +363,9 @@ class AnalysisService:
                 "error": "数据不完整"
             }
         
-        if not current_data.value or not previous_data.value:
+        previous_value, current_value = float(values[0]), float(values[1])
+        
+        if np.isnan(values).any() or not current_value or not previous_value:
             return {
                 "city": city.city_name if city else "",
                 "indicator": indicator.indicator_name if indicator else "",
@@ -220,9 +373,6 @@ class AnalysisService:
                 "error": "数据缺失"
             }
         
-        current_value = float(current_data.value)
-        previous_value = float(previous_data.value)
-        
         growth_rate = ((current_value - previous_value) / previous_value) * 100
         
         return {
@@ -243,13 +393,4 @@ class AnalysisService:
         start_year: int,
         end_year: int
     ) -> Dict[int, List[Dict[str, Any]]]:
-        ranking_history = {}
-        
-        for year in range(start_year, end_year + 1):
-            rankings = DataService.get_city_ranking(db, indicator_id, year)
-            ranking_history[year] = rankings
-        
-        return ranking_history
-
-
-from app.models.database import AnnualData
+        return DataService.get_ranking_history(db, indicator_id, start_year, end_year)
@@ -1,18 +1,34 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from typing import List, Optional, Dict, Any
+from sqlalchemy import and_, or_, func, tuple_
+from typing import List, Optional, Dict, Any, Tuple
 from app.models.database import City, Indicator, AnnualData
 from app.models.schemas import CityCreate, IndicatorCreate, AnnualDataCreate
-import pandas as pd
+from app.core import data_versions
+from app.core.cache import cached, invalidate, orm_codec
+from app.services.panel_service import PanelService
+from app.services.summary_service import RegionalSummaryService
+import numpy as np
+import base64
+import json
+
+# /data/annual-data 可选择的列；未指定 fields 时返回前六列
+ANNUAL_DATA_FIELDS = [
+    "data_id", "city_id", "indicator_id", "year", "value", "data_quality", "data_source", "created_at"
+]
+DEFAULT_ANNUAL_DATA_FIELDS = ANNUAL_DATA_FIELDS[:6]
+# 键集分页的排序键，data_id 保证顺序唯一
+KEYSET_COLUMNS = ("year", "city_id", "indicator_id", "data_id")
 
 
 class DataService:
     
     @staticmethod
+    @cached("reference", orm_codec(City))
     def get_all_cities(db: Session) -> List[City]:
         return db.query(City).all()
     
     @staticmethod
+    @cached("reference", orm_codec(City))
     def get_city_by_id(db: Session, city_id: int) -> Optional[City]:
         return db.query(City).filter(City.city_id == city_id).first()
     
@@ -20,22 +36,36 @@ class DataService:
     def get_city_by_name(db: Session, city_name: str) -> Optional[City]:
         return db.query(City).filter(City.city_name == city_name).first()
     
+    @staticmethod
+    def get_cities_by_ids(db: Session, city_ids: List[int]) -> List[City]:
+        return db.query(City).filter(City.city_id.in_(city_ids)).all()
+    
     @staticmethod
     def create_city(db: Session, city: CityCreate) -> City:
         db_city = City(**city.model_dump())
         db.add(db_city)
+        versions = data_versions.bump(db, "cities")
         db.commit()
         db.refresh(db_city)
+        data_versions.remember(versions)
+        PanelService.invalidate()
+        invalidate("reference", "query")
         return db_city
     
     @staticmethod
+    @cached("reference", orm_codec(Indicator))
     def get_all_indicators(db: Session) -> List[Indicator]:
         return db.query(Indicator).all()
     
     @staticmethod
+    @cached("reference", orm_codec(Indicator))
     def get_indicator_by_id(db: Session, indicator_id: int) -> Optional[Indicator]:
         return db.query(Indicator).filter(Indicator.indicator_id == indicator_id).first()
     
+    @staticmethod
+    def get_indicators_by_ids(db: Session, indicator_ids: List[int]) -> List[Indicator]:
+        return db.query(Indicator).filter(Indicator.indicator_id.in_(indicator_ids)).all()
+    
     @staticmethod
     def get_indicator_by_code(db: Session, indicator_code: str) -> Optional[Indicator]:
         return db.query(Indicator).filter(Indicator.indicator_code == indicator_code).first()
@@ -44,21 +74,23 @@ class DataService:
     def create_indicator(db: Session, indicator: IndicatorCreate) -> Indicator:
         db_indicator = Indicator(**indicator.model_dump())
         db.add(db_indicator)
+        versions = data_versions.bump(db, "indicators")
         db.commit()
         db.refresh(db_indicator)
+        data_versions.remember(versions)
+        PanelService.invalidate()
+        invalidate("reference", "query")
         return db_indicator
     
     @staticmethod
-    def get_annual_data(
-        db: Session,
+    def _filter_annual_data(
+        query,
         city_id: Optional[int] = None,
         indicator_id: Optional[int] = None,
         year: Optional[int] = None,
         start_year: Optional[int] = None,
         end_year: Optional[int] = None
-    ) -> List[AnnualData]:
-        query = db.query(AnnualData)
-        
+    ):
         if city_id is not None:
             query = query.filter(AnnualData.city_id == city_id)
         if indicator_id is not None:
@@ -69,108 +101,293 @@ class DataService:
             query = query.filter(AnnualData.year >= start_year)
         if end_year is not None:
             query = query.filter(AnnualData.year <= end_year)
-        
+        return query
+    
+    @staticmethod
+    @cached("query", orm_codec(AnnualData))
+    def get_annual_data(
+        db: Session,
+        city_id: Optional[int] = None,
+        indicator_id: Optional[int] = None,
+        year: Optional[int] = None,
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None
+    ) -> List[AnnualData]:
+        query = DataService._filter_annual_data(
+            db.query(AnnualData), city_id, indicator_id, year, start_year, end_year
+        )
         return query.order_by(AnnualData.year).all()
     
     @staticmethod
-    def get_timeseries_data(
+    @cached("query")
+    def get_annual_data_columns(
+        db: Session,
+        city_id: Optional[int] = None,
+        indicator_id: Optional[int] = None,
+        year: Optional[int] = None,
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None
+    ) -> Dict[str, list]:
+        """与 get_annual_data 相同的筛选，按列返回；只取所需列，不构造 ORM 对象"""
+        columns = ["data_id", "city_id", "indicator_id", "year", "value", "data_quality"]
+        query = DataService._filter_annual_data(
+            db.query(*[getattr(AnnualData, c) for c in columns]),
+            city_id, indicator_id, year, start_year, end_year
+        )
+        rows = query.order_by(AnnualData.year).all()
+        
+        result = {c: [row[k] for row in rows] for k, c in enumerate(columns)}
+        result["value"] = [float(v) if v is not None else None for v in result["value"]]
+        return result
+    
+    @staticmethod
+    def encode_cursor(row: Tuple) -> str:
+        return base64.urlsafe_b64encode(json.dumps(list(row)).encode("utf-8")).decode("ascii").rstrip("=")
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Optional[Tuple[int, ...]]:
+        """解析分页游标，格式不正确时返回 None"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        except (ValueError, UnicodeError):
+            return None
+        if not isinstance(values, list) or len(values) != len(KEYSET_COLUMNS):
+            return None
+        if not all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+            return None
+        return tuple(values)
+    
+    @staticmethod
+    @cached("query")
+    def get_annual_data_page(
+        db: Session,
+        city_id: Optional[int] = None,
+        indicator_id: Optional[int] = None,
+        year: Optional[int] = None,
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        columnar: bool = False
+    ) -> Dict[str, Any]:
+        """
+        按 (year, city_id, indicator_id, data_id) 键集分页读取年度数据，只查询 fields 指定的列。
+        
+        游标记录上一页最后一行的排序键，下一页从该位置之后继续，任何一页的代价都与第一页相同。
+        """
+        fields = list(dict.fromkeys(fields or DEFAULT_ANNUAL_DATA_FIELDS))
+        unknown = [f for f in fields if f not in ANNUAL_DATA_FIELDS]
+        if unknown:
+            return {"error": f"不支持的字段: {', '.join(unknown)}"}
+        
+        after = None
+        if cursor:
+            after = DataService.decode_cursor(cursor)
+            if after is None:
+                return {"error": "无效的分页游标"}
+        
+        keyset = [getattr(AnnualData, c) for c in KEYSET_COLUMNS]
+        selected = list(dict.fromkeys(fields + list(KEYSET_COLUMNS)))
+        query = DataService._filter_annual_data(
+            db.query(*[getattr(AnnualData, c) for c in selected]),
+            city_id, indicator_id, year, start_year, end_year
+        )
+        if after is not None:
+            query = query.filter(tuple_(*keyset) > tuple_(*after))
+        query = query.order_by(*keyset)
+        
+        # 多取一行判断是否还有下一页
+        rows = query.limit(limit + 1).all() if limit else query.all()
+        has_more = bool(limit) and len(rows) > limit
+        rows = rows[:limit] if limit else rows
+        
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = DataService.encode_cursor(
+                [last[selected.index(c)] for c in KEYSET_COLUMNS]
+            )
+        
+        columns = {f: [row[selected.index(f)] for row in rows] for f in fields}
+        if "value" in columns:
+            columns["value"] = [float(v) if v is not None else None for v in columns["value"]]
+        
+        data = columns if columnar else [dict(zip(fields, values)) for values in zip(*columns.values())]
+        return {"data": data, "next_cursor": next_cursor}
+    
+    @staticmethod
+    def get_series(
         db: Session,
         city_id: int,
         indicator_id: int,
         start_year: Optional[int] = None,
         end_year: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """从面板读取单个序列，仅返回数值非空的年份与数值"""
+        years, values, _ = PanelService.get_panel(db).series(
+            city_id, indicator_id, start_year, end_year
+        )
+        valid = ~np.isnan(values)
+        return years[valid], values[valid]
+    
+    @staticmethod
+    @cached("query")
+    def get_timeseries_data(
+        db: Session,
+        city_id: int,
+        indicator_id: int,
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None,
+        columnar: bool = False
     ) -> Dict[str, Any]:
         city = DataService.get_city_by_id(db, city_id)
         indicator = DataService.get_indicator_by_id(db, indicator_id)
         
-        data = DataService.get_annual_data(
-            db, city_id=city_id, indicator_id=indicator_id,
-            start_year=start_year, end_year=end_year
+        years, values, present = PanelService.get_panel(db).series(
+            city_id, indicator_id, start_year, end_year
         )
         
-        return {
+        result = {
             "city_id": city_id,
             "city_name": city.city_name if city else "",
             "indicator_id": indicator_id,
             "indicator_name": indicator.indicator_name if indicator else "",
-            "unit": indicator.unit if indicator else "",
-            "data": [{"year": d.year, "value": float(d.value) if d.value else None} for d in data]
+            "unit": indicator.unit if indicator else ""
+        }
+        
+        if columnar:
+            # 列式：年份与数值两个等长数组，缺失值为 NaN，由 orjson 输出为 null
+            result["years"] = years[present]
+            result["values"] = values[present]
+        else:
+            result["data"] = [
+                {"year": int(y), "value": None if np.isnan(v) else float(v)}
+                for y, v in zip(years[present], values[present])
+            ]
+        return result
+    
+    @staticmethod
+    @cached("query")
+    def get_series_matrix(
+        db: Session,
+        city_ids: List[int],
+        indicator_ids: List[int],
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """多序列矩阵：values[城市][指标][年份]，缺失值为 NaN"""
+        cities = {c.city_id: c for c in DataService.get_cities_by_ids(db, city_ids)}
+        indicators = {i.indicator_id: i for i in DataService.get_indicators_by_ids(db, indicator_ids)}
+        city_ids = [c for c in city_ids if c in cities]
+        indicator_ids = [i for i in indicator_ids if i in indicators]
+        
+        years, values, _ = PanelService.get_panel(db).block(city_ids, indicator_ids, start_year, end_year)
+        
+        return {
+            "city_ids": city_ids,
+            "city_names": [cities[c].city_name for c in city_ids],
+            "indicator_ids": indicator_ids,
+            "indicator_names": [indicators[i].indicator_name for i in indicator_ids],
+            "units": [indicators[i].unit for i in indicator_ids],
+            "years": years,
+            "values": values
         }
     
     @staticmethod
     def create_annual_data(db: Session, data: AnnualDataCreate) -> AnnualData:
         db_data = AnnualData(**data.model_dump())
         db.add(db_data)
+        db.flush()
+        RegionalSummaryService.refresh(db, [(db_data.year, db_data.indicator_id)])
+        versions = data_versions.bump(db, "annual_data")
         db.commit()
         db.refresh(db_data)
+        PanelService.apply_annual_data([db_data], versions["annual_data"])
+        data_versions.remember(versions)
+        invalidate("query", "prediction")
         return db_data
     
     @staticmethod
     def batch_create_annual_data(db: Session, data_list: List[AnnualDataCreate]) -> List[AnnualData]:
         db_data_list = [AnnualData(**data.model_dump()) for data in data_list]
         db.add_all(db_data_list)
+        db.flush()
+        RegionalSummaryService.refresh(db, [(d.year, d.indicator_id) for d in db_data_list])
+        versions = data_versions.bump(db, "annual_data")
         db.commit()
         for data in db_data_list:
             db.refresh(data)
+        PanelService.apply_annual_data(db_data_list, versions["annual_data"])
+        data_versions.remember(versions)
+        invalidate("query", "prediction")
         return db_data_list
     
     @staticmethod
+    @cached("query")
     def get_regional_summary(db: Session, year: int) -> Dict[str, Any]:
-        gdp_indicator = db.query(Indicator).filter(Indicator.indicator_code == "gdp").first()
-        population_indicator = db.query(Indicator).filter(Indicator.indicator_code == "population").first()
-        trade_indicator = db.query(Indicator).filter(Indicator.indicator_code == "total_trade").first()
-        
-        result = {}
-        
-        if gdp_indicator:
-            gdp_data = db.query(AnnualData).filter(
-                and_(
-                    AnnualData.indicator_id == gdp_indicator.indicator_id,
-                    AnnualData.year == year
-                )
-            ).all()
-            result["total_gdp"] = sum(float(d.value) for d in gdp_data if d.value)
-        
-        if population_indicator:
-            pop_data = db.query(AnnualData).filter(
-                and_(
-                    AnnualData.indicator_id == population_indicator.indicator_id,
-                    AnnualData.year == year
-                )
-            ).all()
-            result["total_population"] = sum(float(d.value) for d in pop_data if d.value)
-        
-        if trade_indicator:
-            trade_data = db.query(AnnualData).filter(
-                and_(
-                    AnnualData.indicator_id == trade_indicator.indicator_id,
-                    AnnualData.year == year
-                )
-            ).all()
-            result["total_trade"] = sum(float(d.value) for d in trade_data if d.value)
-        
-        return result
+        return RegionalSummaryService.get_summary(db, year)
+    
+    @staticmethod
+    @cached("query")
+    def get_regional_summaries(
+        db: Session,
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None
+    ) -> Dict[int, Dict[str, Any]]:
+        return RegionalSummaryService.get_summaries(db, start_year, end_year)
     
     @staticmethod
     def get_city_ranking(db: Session, indicator_id: int, year: int) -> List[Dict[str, Any]]:
-        indicator = DataService.get_indicator_by_id(db, indicator_id)
+        return DataService.get_ranking_history(db, indicator_id, year, year)[year]
+    
+    @staticmethod
+    @cached("query")
+    def get_ranking_history(
+        db: Session,
+        indicator_id: int,
+        start_year: int,
+        end_year: int
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """一次窗口函数查询得到各年份排名，并附带与上一年相比的名次变化"""
+        rank = func.rank().over(
+            partition_by=AnnualData.year,
+            order_by=AnnualData.value.desc()
+        ).label("rank")
         
-        data = db.query(AnnualData, City).join(
+        # 多取前一年的数据，用于计算起始年份的名次变化
+        rows = db.query(
+            AnnualData.year, City.city_id, City.city_name, AnnualData.value, rank
+        ).join(
             City, AnnualData.city_id == City.city_id
         ).filter(
             and_(
                 AnnualData.indicator_id == indicator_id,
-                AnnualData.year == year,
+                AnnualData.year >= start_year - 1,
+                AnnualData.year <= end_year,
                 AnnualData.value.isnot(None)
             )
-        ).order_by(AnnualData.value.desc()).all()
-        
-        return [
-            {
-                "rank": idx + 1,
-                "city_id": city.city_id,
-                "city_name": city.city_name,
-                "value": float(annual_data.value)
-            }
-            for idx, (annual_data, city) in enumerate(data)
-        ]
+        ).order_by(AnnualData.year, rank, City.city_id).all()
+        
+        ranks_by_year: Dict[int, Dict[int, int]] = {}
+        for row in rows:
+            ranks_by_year.setdefault(row.year, {})[row.city_id] = row.rank
+        
+        history: Dict[int, List[Dict[str, Any]]] = {year: [] for year in range(start_year, end_year + 1)}
+        for row in rows:
+            if row.year < start_year:
+                continue
+            
+            previous_rank = ranks_by_year.get(row.year - 1, {}).get(row.city_id)
+            history[row.year].append({
+                "rank": row.rank,
+                "city_id": row.city_id,
+                "city_name": row.city_name,
+                "value": float(row.value),
+                "previous_rank": previous_rank,
+                # 正数表示名次上升
+                "rank_change": previous_rank - row.rank if previous_rank is not None else None
+            })
+        
+        return history
@@ -0,0 +1,204 @@
+import csv
+import io
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import orjson
+from sqlalchemy import select
+from app.db.session import SessionLocal
+from app.models.database import AnnualData
+from app.services.data_service import DataService
+
+# 每批从数据库游标读取的行数，也是 CSV / NDJSON 每次输出与 Parquet 行组的大小
+BATCH_SIZE = 5000
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+LONG_COLUMNS = [
+    "city_id", "city_name", "indicator_id", "indicator_code", "indicator_name", "unit",
+    "year", "value", "data_quality", "data_source"
+]
+
+# 宽表的前两列，与 import_data 读取的 CSV 一致
+WIDE_KEY_COLUMNS = ["城市名称", "年份"]
+
+Batch = List[Tuple[Any, ...]]
+
+
+class ExportService:
+    
+    @staticmethod
+    def check_format(export_format: str) -> Optional[str]:
+        """导出格式不可用时返回错误信息"""
+        if export_format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                return "Parquet 导出需要安装 pyarrow"
+        return None
+    
+    @staticmethod
+    def _annual_data_batches(
+        db,
+        city_id: Optional[int],
+        indicator_id: Optional[int],
+        start_year: Optional[int],
+        end_year: Optional[int],
+        order_by: tuple
+    ) -> Iterator[Batch]:
+        """按批读取年度数据，yield_per 使用服务端游标，内存占用与总行数无关"""
+        statement = select(
+            AnnualData.city_id, AnnualData.indicator_id, AnnualData.year,
+            AnnualData.value, AnnualData.data_quality, AnnualData.data_source
+        )
+        statement = DataService._filter_annual_data(
+            statement, city_id, indicator_id, None, start_year, end_year
+        ).order_by(*order_by).execution_options(yield_per=BATCH_SIZE)
+        
+        for partition in db.execute(statement).partitions():
+            yield partition
+    
+    @staticmethod
+    def _long_batches(db, cities: Dict[int, Any], indicators: Dict[int, Any], **filters) -> Iterator[Batch]:
+        batches = ExportService._annual_data_batches(
+            db, **filters, order_by=(AnnualData.city_id, AnnualData.indicator_id, AnnualData.year)
+        )
+        for batch in batches:
+            rows = []
+            for city_id, indicator_id, year, value, quality, source in batch:
+                city = cities.get(city_id)
+                indicator = indicators.get(indicator_id)
+                rows.append((
+                    city_id,
+                    city.city_name if city else None,
+                    indicator_id,
+                    indicator.indicator_code if indicator else None,
+                    indicator.indicator_name if indicator else None,
+                    indicator.unit if indicator else None,
+                    year,
+                    float(value) if value is not None else None,
+                    quality,
+                    source
+                ))
+            yield rows
+    
+    @staticmethod
+    def _wide_batches(db, cities: Dict[int, Any], indicators: Dict[int, Any], **filters) -> Iterator[Batch]:
+        """按 (城市, 年份) 顺序读取，逐行透视为每个指标一列；内存中只保留当前一行"""
+        columns = {indicator_id: k for k, indicator_id in enumerate(indicators)}
+        batches = ExportService._annual_data_batches(
+            db, **filters, order_by=(AnnualData.city_id, AnnualData.year, AnnualData.indicator_id)
+        )
+        
+        rows: Batch = []
+        key, current = None, None
+        for batch in batches:
+            for city_id, indicator_id, year, value, _, _ in batch:
+                if indicator_id not in columns:
+                    continue
+                if (city_id, year) != key:
+                    if current is not None:
+                        rows.append(tuple(current))
+                    key = (city_id, year)
+                    city = cities.get(city_id)
+                    current = [city.city_name if city else str(city_id), year] + [None] * len(columns)
+                current[2 + columns[indicator_id]] = float(value) if value is not None else None
+            
+            if len(rows) >= BATCH_SIZE:
+                yield rows
+                rows = []
+        
+        if current is not None:
+            rows.append(tuple(current))
+        if rows:
+            yield rows
+    
+    @staticmethod
+    def _csv_chunks(header: List[str], batches: Iterator[Batch]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        for batch in batches:
+            writer.writerows(batch)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+    
+    @staticmethod
+    def _ndjson_chunks(header: List[str], batches: Iterator[Batch]) -> Iterator[bytes]:
+        for batch in batches:
+            yield b"".join(orjson.dumps(dict(zip(header, row))) + b"\n" for row in batch)
+    
+    @staticmethod
+    def _parquet_chunks(header: List[str], batches: Iterator[Batch]) -> Iterator[bytes]:
+        """每批写为一个行组，写入器输出的字节随即发送"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        types = {
+            "city_id": pa.int64(), "indicator_id": pa.int64(), "year": pa.int64(), "年份": pa.int64(),
+            "city_name": pa.string(), "城市名称": pa.string(), "indicator_code": pa.string(),
+            "indicator_name": pa.string(), "unit": pa.string(),
+            "data_quality": pa.string(), "data_source": pa.string()
+        }
+        schema = pa.schema([(name, types.get(name, pa.float64())) for name in header])
+        
+        sink = io.BytesIO()
+        writer = pq.ParquetWriter(sink, schema)
+        try:
+            for batch in batches:
+                columns = list(zip(*batch))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                    schema=schema
+                ))
+                yield sink.getvalue()
+                sink.seek(0)
+                sink.truncate()
+        finally:
+            writer.close()
+        yield sink.getvalue()
+    
+    @staticmethod
+    def stream(
+        export_format: str,
+        layout: str = "long",
+        city_id: Optional[int] = None,
+        indicator_id: Optional[int] = None,
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """
+        生成导出文件的字节流。
+        
+        使用独立的会话：StreamingResponse 在路由返回之后才迭代，请求依赖注入的会话此时已关闭。
+        """
+        db = SessionLocal()
+        try:
+            cities = {c.city_id: c for c in DataService.get_all_cities(db)}
+            indicators = {
+                i.indicator_id: i for i in DataService.get_all_indicators(db)
+                if indicator_id is None or i.indicator_id == indicator_id
+            }
+            filters = dict(city_id=city_id, indicator_id=indicator_id, start_year=start_year, end_year=end_year)
+            
+            if layout == "wide":
+                header = WIDE_KEY_COLUMNS + [i.indicator_name for i in indicators.values()]
+                batches = ExportService._wide_batches(db, cities, indicators, **filters)
+            else:
+                header = LONG_COLUMNS
+                batches = ExportService._long_batches(db, cities, indicators, **filters)
+            
+            encode = {
+                "csv": ExportService._csv_chunks,
+                "ndjson": ExportService._ndjson_chunks,
+                "parquet": ExportService._parquet_chunks
+            }[export_format]
+            yield from encode(header, batches)
+        finally:
+            db.close()
+
@@ -0,0 +1,193 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+from app.core.config import get_settings
+from app.utils.forecasting import series_hash
+
+
+class ForecastCache:
+    """已拟合预测结果的 LRU 缓存，可选 TTL；键中包含序列数据版本，数据写入后旧结果自然失效"""
+
+    def __init__(self, max_size: int = 512, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(
+        city_id: int,
+        indicator_id: int,
+        model_type: str,
+        order: Optional[tuple],
+        confidence_level: float,
+        prediction_years: int,
+        data_version: str
+    ) -> tuple:
+        return (
+            city_id,
+            indicator_id,
+            model_type,
+            tuple(order) if order is not None else None,
+            round(float(confidence_level), 6),
+            prediction_years,
+            data_version
+        )
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        # 返回副本，避免调用方修改缓存中的结果
+        return copy.deepcopy(value)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+class ArimaStateCache:
+    """
+    每条序列最近一次完整拟合的 ARIMA 参数。
+
+    记录拟合时的观测数与数据摘要：之后序列只在末尾追加了新年份时，可沿用参数增量更新而不必重新估计。
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.full_fits = 0
+        self.incremental_updates = 0
+
+    @staticmethod
+    def make_key(city_id: int, indicator_id: int, order: tuple) -> tuple:
+        return (city_id, indicator_id, tuple(order))
+
+    def lookup(
+        self,
+        key: Hashable,
+        years: np.ndarray,
+        values: np.ndarray,
+        max_age: Optional[float] = None
+    ) -> Optional[Tuple[List[float], int]]:
+        """
+        序列是已保存序列的延续时返回 (参数, 自上次完整拟合以来追加的观测数)。
+
+        历史数据被修改、序列变短或距上次完整拟合超过 max_age 秒时返回 None，需要完整拟合。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            return None
+
+        if max_age is not None and time.monotonic() - entry["fitted_at"] > max_age:
+            return None
+        observations = entry["observations"]
+        if len(values) < observations:
+            return None
+        if series_hash(years[:observations], values[:observations]) != entry["series_hash"]:
+            return None
+        return entry["params"], entry["appended"] + len(values) - observations
+
+    def store(
+        self,
+        key: Hashable,
+        years: np.ndarray,
+        values: np.ndarray,
+        params: List[float],
+        appended: Optional[int] = None
+    ) -> None:
+        """保存拟合参数；appended 为 None 表示完整拟合，否则为沿用参数以来累计追加的观测数"""
+        if self.max_size <= 0:
+            return
+
+        full_fit = appended is None
+        with self._lock:
+            previous = self._entries.get(key)
+            self._entries[key] = {
+                "params": list(params),
+                "observations": len(values),
+                "series_hash": series_hash(years, values),
+                "appended": appended or 0,
+                "fitted_at": time.monotonic() if full_fit or previous is None else previous["fitted_at"]
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+            if full_fit:
+                self.full_fits += 1
+            else:
+                self.incremental_updates += 1
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "full_fits": self.full_fits,
+                "incremental_updates": self.incremental_updates
+            }
+
+
+_settings = get_settings()
+
+forecast_cache = ForecastCache(_settings.FORECAST_CACHE_SIZE, _settings.FORECAST_CACHE_TTL)
+arima_states = ArimaStateCache(_settings.ARIMA_STATE_CACHE_SIZE)
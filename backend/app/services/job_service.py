@@ -0,0 +1,263 @@
+import inspect
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.db.session import SessionLocal
+from app.models.database import Job
+from app.services.analysis_service import AnalysisService
+from app.services.prediction_service import PredictionService
+
+settings = get_settings()
+
+# 可提交的任务类型，参数按关键字传给对应的服务方法（db 除外）；
+# 接受 progress 参数的方法在执行中回报已完成的比例
+JOB_HANDLERS: Dict[str, Callable[..., Any]] = {
+    "linear_prediction": PredictionService.linear_regression_prediction,
+    "arima_prediction": PredictionService.arima_prediction,
+    "ensemble_prediction": PredictionService.ensemble_prediction,
+    "scenario_simulation": PredictionService.scenario_simulation,
+    "bulk_prediction": PredictionService.bulk_prediction,
+    "arima_refit": PredictionService.refit_arima,
+    "backtest": PredictionService.run_backtest,
+    "bulk_trend_analysis": AnalysisService.analyze_trends_bulk,
+    "correlation_matrix": AnalysisService.calculate_correlation_matrix,
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(settings.JOB_WORKERS, 1),
+                    thread_name_prefix="job"
+                )
+    return _executor
+
+
+def _owner() -> str:
+    # 每次调用时读取 pid，fork 出的 worker 各自不同
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: Optional[str]) -> Optional[bool]:
+    """同一主机上的进程可以直接判断是否存活，其他主机返回 None，只能依据心跳"""
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return None
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def shutdown_job_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+class JobService:
+    """后台任务：任务状态与结果保存在 jobs 表，由本进程线程池或 Celery worker 执行"""
+
+    @staticmethod
+    def _dispatch(job_id: str) -> None:
+        if settings.JOB_BACKEND == "celery":
+            from app.core.celery_app import celery_app, RUN_JOB_TASK
+            celery_app.send_task(RUN_JOB_TASK, args=[job_id])
+        else:
+            _get_executor().submit(JobService.run_job, job_id)
+
+    @staticmethod
+    def submit_job(db: Session, job_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        handler = JOB_HANDLERS.get(job_type)
+        if handler is None:
+            return {"error": f"不支持的任务类型: {job_type}"}
+
+        if "progress" in params:
+            return {"error": "任务参数错误: progress 由任务执行器提供"}
+
+        try:
+            inspect.signature(handler).bind(db, **params)
+        except TypeError as e:
+            return {"error": f"任务参数错误: {str(e)}"}
+
+        JobService.purge_expired(db)
+
+        job = Job(job_id=uuid.uuid4().hex, job_type=job_type, params=params, status="pending", progress=0)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        JobService._dispatch(job.job_id)
+        return {"job": job}
+
+    @staticmethod
+    def _progress_reporter(job_id: str) -> Callable[[float], None]:
+        """
+        返回写回任务进度的回调，按 JOB_PROGRESS_INTERVAL 节流。
+
+        使用独立的会话提交，不会把任务方法尚未提交的写入一并提交。
+        """
+        last = [0.0]
+
+        def report(fraction: float) -> None:
+            now = time.monotonic()
+            if now - last[0] < settings.JOB_PROGRESS_INTERVAL:
+                return
+            last[0] = now
+            db = SessionLocal()
+            try:
+                db.query(Job).filter(Job.job_id == job_id, Job.status == "running").update(
+                    {"progress": round(min(max(fraction, 0.0), 1.0), 4)}, synchronize_session=False
+                )
+                db.commit()
+            finally:
+                db.close()
+
+        return report
+
+    @staticmethod
+    def _heartbeat(job_id: str, owner: str, stop: threading.Event) -> None:
+        while not stop.wait(settings.JOB_HEARTBEAT_INTERVAL):
+            db = SessionLocal()
+            try:
+                db.query(Job).filter(Job.job_id == job_id, Job.owner == owner, Job.status == "running").update(
+                    {"heartbeat_at": datetime.utcnow()}, synchronize_session=False
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+            finally:
+                db.close()
+
+    @staticmethod
+    def claim_job(db: Session, job_id: str, owner: str) -> bool:
+        """
+        以一条条件 UPDATE 把等待中的任务改为执行中，只有一个调用方能成功。
+
+        同一任务被重复分发（多个 worker 启动时的恢复、Celery 重试）时，其余调用方直接返回。
+        """
+        now = datetime.utcnow()
+        claimed = db.query(Job).filter(Job.job_id == job_id, Job.status == "pending").update({
+            "status": "running",
+            "started_at": now,
+            "owner": owner,
+            "heartbeat_at": now
+        }, synchronize_session=False)
+        db.commit()
+        return claimed == 1
+
+    @staticmethod
+    def run_job(job_id: str) -> None:
+        """执行一个任务并写回状态，任务自身的错误记录在 jobs 表中而不是向外抛出"""
+        db = SessionLocal()
+        stop = threading.Event()
+        try:
+            owner = _owner()
+            if not JobService.claim_job(db, job_id, owner):
+                return
+
+            job = db.query(Job).filter(Job.job_id == job_id).first()
+            threading.Thread(
+                target=JobService._heartbeat, args=(job_id, owner, stop), name="job-heartbeat", daemon=True
+            ).start()
+
+            handler = JOB_HANDLERS[job.job_type]
+            params = dict(job.params or {})
+            if "progress" in inspect.signature(handler).parameters:
+                params["progress"] = JobService._progress_reporter(job_id)
+
+            try:
+                result = handler(db, **params)
+                error = result.get("error") if isinstance(result, dict) else None
+            except Exception as e:
+                db.rollback()
+                result, error = None, str(e)
+
+            job.status = "failed" if error else "succeeded"
+            job.progress = 1
+            job.error = error[:500] if error else None
+            job.result = None if error else result
+            job.finished_at = datetime.utcnow()
+            job.expires_at = job.finished_at + timedelta(seconds=settings.JOB_RESULT_TTL)
+            db.commit()
+        finally:
+            stop.set()
+            db.close()
+
+    @staticmethod
+    def get_job(db: Session, job_id: str) -> Optional[Job]:
+        return db.query(Job).filter(Job.job_id == job_id).first()
+
+    @staticmethod
+    def get_result(db: Session, job_id: str) -> Dict[str, Any]:
+        job = JobService.get_job(db, job_id)
+        if job is None:
+            return {"error": "任务不存在", "status_code": 404}
+        if job.status in ("pending", "running"):
+            return {"error": "任务尚未完成", "status_code": 409}
+        if job.expires_at is not None and job.expires_at < datetime.utcnow():
+            return {"error": "任务结果已过期", "status_code": 410}
+        if job.status == "failed":
+            return {"error": job.error or "任务执行失败", "status_code": 400}
+        return {"result": job.result}
+
+    @staticmethod
+    def purge_expired(db: Session) -> int:
+        count = db.query(Job).filter(Job.expires_at < datetime.utcnow()).delete(synchronize_session=False)
+        db.commit()
+        return count
+
+    @staticmethod
+    def recover_local_jobs() -> None:
+        """
+        服务启动时处理已退出进程遗留的任务。
+
+        执行中的任务只有在执行进程已退出时才标记为失败：同一主机上的进程按 pid 判断，
+        此外心跳超过 JOB_STALE_AFTER 秒也视为已退出，其他存活 worker 正在执行的任务不受影响；
+        等待中的任务重新提交，重复提交由 claim_job 去重。
+        """
+        if settings.JOB_BACKEND == "celery":
+            return
+
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            stale_before = now - timedelta(seconds=settings.JOB_STALE_AFTER)
+            running = db.query(Job.job_id, Job.owner, Job.heartbeat_at).filter(Job.status == "running").all()
+            # 存活的执行进程按 JOB_HEARTBEAT_INTERVAL 持续写心跳，心跳超时说明进程已退出（pid 可能已被复用）
+            abandoned = [
+                job_id for job_id, owner, heartbeat_at in running
+                if _owner_alive(owner) is False or heartbeat_at is None or heartbeat_at < stale_before
+            ]
+            if abandoned:
+                db.query(Job).filter(Job.job_id.in_(abandoned), Job.status == "running").update({
+                    "status": "failed",
+                    "error": "执行任务的进程已退出，任务中断",
+                    "finished_at": now,
+                    "expires_at": now + timedelta(seconds=settings.JOB_RESULT_TTL)
+                }, synchronize_session=False)
+                db.commit()
+            pending = [job_id for (job_id,) in db.query(Job.job_id).filter(Job.status == "pending").all()]
+        finally:
+            db.close()
+
+        for job_id in pending:
+            JobService._dispatch(job_id)
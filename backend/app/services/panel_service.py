@@ -0,0 +1,216 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import Float, cast
+from sqlalchemy.orm import Session
+from app.core import data_versions
+from app.models.database import City, Indicator, AnnualData
+
+# 面板内容依赖的数据集，任一版本号变化（包括其他进程的写入）时重建面板
+PANEL_DATASETS = ("cities", "indicators", "annual_data")
+
+
+class Panel:
+    """annual_data 的稠密立方体：城市 × 指标 × 年份，缺失值为 NaN"""
+
+    def __init__(
+        self,
+        city_ids: np.ndarray,
+        indicator_ids: np.ndarray,
+        years: np.ndarray,
+        values: np.ndarray,
+        present: np.ndarray,
+        version: Tuple[int, ...] = ()
+    ):
+        self.city_ids = city_ids
+        self.indicator_ids = indicator_ids
+        self.years = years
+        # values 为 NaN 表示缺失；present 标记 annual_data 中是否存在该行（值可能为空）
+        self.values = values
+        self.present = present
+        # 构建（或最近一次增量更新）时 PANEL_DATASETS 的版本号
+        self.version = version
+        self.city_index: Dict[int, int] = {int(c): i for i, c in enumerate(city_ids)}
+        self.indicator_index: Dict[int, int] = {int(k): i for i, k in enumerate(indicator_ids)}
+        self.year_index: Dict[int, int] = {int(y): i for i, y in enumerate(years)}
+
+    def year_slice(self, start_year: Optional[int] = None, end_year: Optional[int] = None) -> slice:
+        if len(self.years) == 0:
+            return slice(0, 0)
+        first = int(self.years[0])
+        start = 0 if start_year is None else max(start_year - first, 0)
+        stop = len(self.years) if end_year is None else max(min(end_year - first + 1, len(self.years)), 0)
+        return slice(start, max(start, stop))
+
+    def series(
+        self,
+        city_id: int,
+        indicator_id: int,
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """返回时间窗口内的 (年份, 数值, 是否存在) 三个数组副本"""
+        ci = self.city_index.get(city_id)
+        ii = self.indicator_index.get(indicator_id)
+        if ci is None or ii is None:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=bool)
+
+        ys = self.year_slice(start_year, end_year)
+        return (
+            self.years[ys].copy(),
+            self.values[ci, ii, ys].copy(),
+            self.present[ci, ii, ys].copy()
+        )
+
+    def block(
+        self,
+        city_ids: List[int],
+        indicator_ids: List[int],
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """按给定顺序取出 城市 × 指标 × 年份 子块；面板中不存在的城市或指标对应整行缺失"""
+        ys = self.year_slice(start_year, end_year)
+        years = self.years[ys].copy()
+        values = np.full((len(city_ids), len(indicator_ids), len(years)), np.nan)
+        present = np.zeros(values.shape, dtype=bool)
+
+        rows = [(k, self.city_index[c]) for k, c in enumerate(city_ids) if c in self.city_index]
+        cols = [(k, self.indicator_index[i]) for k, i in enumerate(indicator_ids) if i in self.indicator_index]
+        if rows and cols:
+            out_rows, src_rows = zip(*rows)
+            out_cols, src_cols = zip(*cols)
+            target = np.ix_(out_rows, out_cols)
+            source = np.ix_(src_rows, src_cols)
+            values[target] = self.values[source][:, :, ys]
+            present[target] = self.present[source][:, :, ys]
+
+        return years, values, present
+
+    def locate(self, city_id: int, indicator_id: int, year: int) -> Optional[Tuple[int, int, int]]:
+        ci = self.city_index.get(city_id)
+        ii = self.indicator_index.get(indicator_id)
+        yi = self.year_index.get(year)
+        if ci is None or ii is None or yi is None:
+            return None
+        return ci, ii, yi
+
+
+class PanelService:
+    """
+    进程内的面板数据存储，首次读取时从数据库整体加载，本进程的写入增量更新。
+
+    每次读取都与数据库中的数据版本号比对，其他 worker 或导入脚本写入后整体重建。
+    """
+
+    _panel: Optional[Panel] = None
+    _lock = threading.RLock()
+    # 数据版本：整体失效时 generation 递增，单个序列写入时对应计数递增
+    _generation = 0
+    _series_versions: Dict[Tuple[int, int], int] = {}
+
+    @staticmethod
+    def build_panel(db: Session, version: Tuple[int, ...] = ()) -> Panel:
+        city_ids = np.array(
+            sorted(cid for (cid,) in db.query(City.city_id).all()), dtype=np.int64
+        )
+        indicator_ids = np.array(
+            sorted(iid for (iid,) in db.query(Indicator.indicator_id).all()), dtype=np.int64
+        )
+
+        # 直接取列并在SQL中转换为浮点数，避免ORM对象与Decimal的逐个转换
+        rows = db.query(
+            AnnualData.city_id,
+            AnnualData.indicator_id,
+            AnnualData.year,
+            cast(AnnualData.value, Float)
+        ).all()
+
+        if rows:
+            min_year = min(r[2] for r in rows)
+            max_year = max(r[2] for r in rows)
+            years = np.arange(min_year, max_year + 1, dtype=np.int64)
+        else:
+            years = np.empty(0, dtype=np.int64)
+
+        shape = (len(city_ids), len(indicator_ids), len(years))
+        values = np.full(shape, np.nan)
+        present = np.zeros(shape, dtype=bool)
+        panel = Panel(city_ids, indicator_ids, years, values, present, version)
+
+        if rows:
+            city_pos = np.array([panel.city_index.get(r[0], -1) for r in rows])
+            indicator_pos = np.array([panel.indicator_index.get(r[1], -1) for r in rows])
+            year_pos = np.array([r[2] for r in rows]) - years[0]
+            row_values = np.array([np.nan if r[3] is None else r[3] for r in rows], dtype=float)
+            # 与 DECIMAL 列的精度保持一致
+            row_values = np.round(row_values, AnnualData.value.type.scale)
+
+            valid = (city_pos >= 0) & (indicator_pos >= 0)
+            index = (city_pos[valid], indicator_pos[valid], year_pos[valid])
+            values[index] = row_values[valid]
+            present[index] = True
+
+        return panel
+
+    @staticmethod
+    def get_panel(db: Session) -> Panel:
+        versions = data_versions.current(db)
+        version = tuple(versions.get(name, 0) for name in PANEL_DATASETS)
+        panel = PanelService._panel
+        if panel is not None and panel.version == version:
+            return panel
+
+        with PanelService._lock:
+            if PanelService._panel is not None and PanelService._panel.version != version:
+                # 其他进程写入了数据，本进程记录的序列版本全部作废
+                PanelService._panel = None
+                PanelService._generation += 1
+            if PanelService._panel is None:
+                PanelService._panel = PanelService.build_panel(db, version)
+            return PanelService._panel
+
+    @staticmethod
+    def invalidate() -> None:
+        with PanelService._lock:
+            PanelService._panel = None
+            PanelService._generation += 1
+
+    @staticmethod
+    def series_version(city_id: int, indicator_id: int) -> str:
+        """序列的数据版本号，该序列的行被写入后即发生变化"""
+        counter = PanelService._series_versions.get((city_id, indicator_id), 0)
+        return f"{PanelService._generation}.{counter}"
+
+    @staticmethod
+    def apply_annual_data(records: Iterable[AnnualData], version: Optional[int] = None) -> None:
+        """
+        将本进程已提交的 annual_data 写入同步到面板，version 为这次写入后 annual_data 的版本号。
+
+        坐标超出现有轴，或面板与写入前的版本之间还有其他进程的写入时整体失效，下次读取时重建。
+        """
+        records = list(records)
+        with PanelService._lock:
+            for record in records:
+                key = (record.city_id, record.indicator_id)
+                PanelService._series_versions[key] = PanelService._series_versions.get(key, 0) + 1
+
+            panel = PanelService._panel
+            if panel is None:
+                return
+
+            if version is not None:
+                # annual_data 是 PANEL_DATASETS 的最后一项
+                if not panel.version or panel.version[-1] != version - 1:
+                    PanelService._panel = None
+                    PanelService._generation += 1
+                    return
+                panel.version = panel.version[:-1] + (version,)
+
+            for record in records:
+                position = panel.locate(record.city_id, record.indicator_id, record.year)
+                if position is None:
+                    PanelService._panel = None
+                    return
+                panel.values[position] = np.nan if record.value is None else float(record.value)
+                panel.present[position] = True
@@ -1,19 +1,126 @@
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional, Tuple
+from functools import partial
+import time
 import numpy as np
-import pandas as pd
-from scipy import stats
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
-from sklearn.model_selection import train_test_split
-from statsmodels.tsa.arima.model import ARIMA
+from app.core import compute, data_versions, metrics
+from app.core.cache import cached, invalidate
 from app.services.data_service import DataService
+from app.services.forecast_cache import ArimaStateCache, ForecastCache, arima_states, forecast_cache
+from app.services.panel_service import PanelService
+from app.core.config import get_settings
+from app.utils.forecasting import (
+    MIN_ARIMA_POINTS, MIN_LINEAR_POINTS, PREDICTION_VALUE_FIELDS, arima_fit_forecast, arima_order_grid,
+    differencing_order, fit_arima_order, linear_forecasts, round_predictions, series_hash
+)
+from app.utils.backtesting import backtest_series
+from app.utils.simulation import DEFAULT_PERCENTILES, SIMULATION_METHODS, scenario_fan, simulate_trend_paths
 from app.models.database import PredictionModel, Prediction
 
+settings = get_settings()
+
+# 批量预测支持的模型类型
+BULK_MODEL_TYPES = ("linear", "arima", "ensemble")
+# 批量预测结果中各模型类型对应的 model_type 字段
+BULK_RESULT_TYPES = {"linear": "linear_regression", "arima": "arima", "ensemble": "ensemble"}
+# 自动定阶结果在 prediction_models 中的模型类型，model_name 为 arima_order:<城市>:<指标>
+ARIMA_ORDER_MODEL_TYPE = "arima_order"
+# 自动定阶确定差分阶数所用的单位根检验，记录在选阶结果中
+DIFFERENCING_TEST = "kpss"
+# 回测结果的模型类型，model_name 为 backtest:<城市>:<指标>:<模型>
+BACKTEST_MODEL_TYPE = "backtest"
+# accuracy_score 列为 DECIMAL(10, 6)
+BACKTEST_MAX_SCORE = 10 ** 4
+
+
+class SeriesContext:
+    """
+    一次请求内单条序列的共享数据：城市、指标、有效观测与回测结果只读取一次，传给每个模型。
+    """
+    
+    def __init__(
+        self,
+        city_id: int,
+        indicator_id: int,
+        city: Any,
+        indicator: Any,
+        years: np.ndarray,
+        values: np.ndarray,
+        scores: Optional[Dict[str, Dict[str, Any]]] = None
+    ):
+        self.city_id = city_id
+        self.indicator_id = indicator_id
+        self.city = city
+        self.indicator = indicator
+        self.years = years
+        self.values = values
+        # 各模型的回测结果 {模型: model_params}，集成模型据此确定权重
+        self.scores = scores or {}
+        self.version = PanelService.series_version(city_id, indicator_id)
+    
+    @staticmethod
+    def load(db: Session, city_id: int, indicator_id: int, with_scores: bool = False) -> "SeriesContext":
+        city = DataService.get_city_by_id(db, city_id)
+        indicator = DataService.get_indicator_by_id(db, indicator_id)
+        years, values = DataService.get_series(db, city_id, indicator_id)
+        
+        scores = None
+        if with_scores:
+            scores = {s["model"]: s for s in PredictionService.backtest_scores(db, city_id, indicator_id)}
+        
+        return SeriesContext(city_id, indicator_id, city, indicator, years, values, scores)
+    
+    def describe(self, model_type: str, error: Optional[str] = None) -> Dict[str, Any]:
+        """结果的公共字段；出错的结果不含单位"""
+        result = {
+            "city": self.city.city_name if self.city else "",
+            "indicator": self.indicator.indicator_name if self.indicator else ""
+        }
+        if error is None:
+            result["unit"] = self.indicator.unit if self.indicator else ""
+        result["model_type"] = model_type
+        if error is not None:
+            result["error"] = error
+        return result
+
 
 class PredictionService:
     
     @staticmethod
+    def _start_cached(
+        context: "SeriesContext",
+        model_type: str,
+        order: Optional[tuple],
+        confidence_level: float,
+        prediction_years: int,
+        start: Callable[[], Callable[[], Dict[str, Any]]]
+    ) -> Callable[[], Dict[str, Any]]:
+        """
+        按序列数据版本缓存拟合结果，失败结果不缓存。
+        
+        start 提交计算并返回取结果的函数，命中缓存时不提交；调用方先启动所有模型再依次取结果，各模型的计算相互重叠。
+        """
+        key = ForecastCache.make_key(
+            context.city_id, context.indicator_id, model_type, order, confidence_level, prediction_years,
+            context.version
+        )
+        
+        cached_result = forecast_cache.get(key)
+        if cached_result is not None:
+            return lambda: cached_result
+        
+        collect = start()
+        
+        def finish() -> Dict[str, Any]:
+            result = collect()
+            if "error" not in result:
+                forecast_cache.put(key, result)
+            return result
+        
+        return finish
+    
+    @staticmethod
+    @cached("prediction")
     def linear_regression_prediction(
         db: Session,
         city_id: int,
@@ -21,146 +128,300 @@ class PredictionService:
         prediction_years: int = 3,
         confidence_level: float = 0.95
     ) -> Dict[str, Any]:
-        city = DataService.get_city_by_id(db, city_id)
-        indicator = DataService.get_indicator_by_id(db, indicator_id)
-        
-        data = DataService.get_annual_data(
-            db, city_id=city_id, indicator_id=indicator_id
+        context = SeriesContext.load(db, city_id, indicator_id)
+        return round_predictions(
+            PredictionService._start_linear(context, prediction_years, confidence_level)()
         )
+    
+    @staticmethod
+    def _start_linear(
+        context: "SeriesContext",
+        prediction_years: int,
+        confidence_level: float
+    ) -> Callable[[], Dict[str, Any]]:
+        """线性模型拟合很快，取结果时才在当前线程计算，此时其他模型已在进程池中运行"""
+        return PredictionService._start_cached(
+            context, "linear_regression", None, confidence_level, prediction_years,
+            lambda: partial(PredictionService._linear_regression_prediction, context, prediction_years, confidence_level)
+        )
+    
+    @staticmethod
+    def _linear_regression_prediction(
+        context: "SeriesContext",
+        prediction_years: int,
+        confidence_level: float
+    ) -> Dict[str, Any]:
+        if len(context.values) < MIN_LINEAR_POINTS:
+            return context.describe("linear_regression", "历史数据不足，至少需要5年数据")
         
-        valid_data = [(d.year, float(d.value)) for d in data if d.value is not None]
+        with metrics.fit_timer("linear"):
+            forecast = linear_forecasts(context.years, context.values, prediction_years, confidence_level)[0]
         
-        if len(valid_data) < 5:
-            return {
-                "city": city.city_name if city else "",
-                "indicator": indicator.indicator_name if indicator else "",
-                "model_type": "linear_regression",
-                "error": "历史数据不足，至少需要5年数据"
-            }
+        return {**context.describe("linear_regression"), **forecast}
+    
+    @staticmethod
+    @cached("prediction")
+    def arima_prediction(
+        db: Session,
+        city_id: int,
+        indicator_id: int,
+        prediction_years: int = 3,
+        confidence_level: float = 0.95,
+        order: tuple = (1, 1, 1),
+        auto_order: bool = False
+    ) -> Dict[str, Any]:
+        """auto_order 为 True 时使用按信息准则选出的阶数，选阶失败则退回 order"""
+        selection = None
+        if auto_order:
+            selection = PredictionService.select_arima_order(db, city_id, indicator_id)
+            if "error" not in selection:
+                order = tuple(selection["order"])
         
-        years = np.array([d[0] for d in valid_data]).reshape(-1, 1)
-        values = np.array([d[1] for d in valid_data])
+        context = SeriesContext.load(db, city_id, indicator_id)
+        result = round_predictions(
+            PredictionService._start_arima(context, prediction_years, confidence_level, order)()
+        )
         
-        model = LinearRegression()
-        model.fit(years, values)
+        if selection is not None and "error" not in result:
+            result = {**result, "order_selection": selection}
+        return result
+    
+    @staticmethod
+    def _search_arima_order(values: np.ndarray, criterion: str) -> Dict[str, Any]:
+        """
+        按信息准则选择 ARIMA 阶数。
         
-        predictions = []
-        last_year = int(years[-1][0])  # 转换为Python int
+        差分阶数 d 先由 KPSS 检验确定，再在 d 固定的 (p, q) 网格中比较信息准则；
+        网格很小，全部候选分发到进程池并行拟合，失败或未收敛的拟合直接淘汰。
+        """
+        d = differencing_order(values, settings.ARIMA_MAX_D)
+        candidates = arima_order_grid(d, settings.ARIMA_MAX_P, settings.ARIMA_MAX_Q)
+        futures = [(order, compute.submit(fit_arima_order, values, order)) for order in candidates]
         
-        for i in range(1, prediction_years + 1):
-            pred_year = last_year + i
-            pred_value = float(model.predict([[pred_year]])[0])  # 转换为Python float
-            
-            # 计算标准误差并转换为Python float
-            std_error = float(np.sqrt(mean_squared_error(values, model.predict(years))))
-            # 使用scipy计算z分数，支持任何置信度值
-            alpha = 1 - confidence_level
-            z_score = float(stats.norm.ppf(1 - alpha / 2))
+        best = None
+        fitted = failed = 0
+        for order, future in futures:
+            try:
+                candidate = future.result()
+            except Exception:
+                candidate = None
+            if candidate is None:
+                failed += 1
+                continue
             
-            predictions.append({
-                "year": pred_year,
-                "predicted_value": round(pred_value, 2),
-                "confidence_lower": round(pred_value - z_score * std_error, 2),
-                "confidence_upper": round(pred_value + z_score * std_error, 2)
-            })
-        
-        # 转换所有评估指标为Python float
-        r2 = float(r2_score(values, model.predict(years)))
-        mse = float(mean_squared_error(values, model.predict(years)))
-        mae = float(mean_absolute_error(values, model.predict(years)))
+            fitted += 1
+            if best is None or candidate[criterion] < best[criterion]:
+                best = candidate
+        
+        if best is None:
+            return {"error": "所有候选阶数均拟合失败"}
         
         return {
-            "city": city.city_name if city else "",
-            "indicator": indicator.indicator_name if indicator else "",
-            "unit": indicator.unit if indicator else "",
-            "model_type": "linear_regression",
-            "predictions": predictions,
-            "accuracy": {
-                "r_squared": round(r2, 4),
-                "mse": round(mse, 4),
-                "mae": round(mae, 4)
-            },
-            "training_years": [int(y) for y in years.flatten()],  # 确保是Python int
-            "training_values": [round(float(v), 2) for v in values]  # 确保是Python float
+            "order": best["order"],
+            "criterion": criterion,
+            "score": round(best[criterion], 4),
+            "differencing_test": DIFFERENCING_TEST,
+            "candidates_fitted": fitted,
+            "candidates_failed": failed
         }
     
     @staticmethod
-    def arima_prediction(
+    def select_arima_order(
         db: Session,
         city_id: int,
         indicator_id: int,
-        prediction_years: int = 3,
-        confidence_level: float = 0.95,
-        order: tuple = (1, 1, 1)
+        criterion: Optional[str] = None
     ) -> Dict[str, Any]:
-        city = DataService.get_city_by_id(db, city_id)
-        indicator = DataService.get_indicator_by_id(db, indicator_id)
+        """
+        返回序列的 ARIMA 阶数。
         
-        data = DataService.get_annual_data(
-            db, city_id=city_id, indicator_id=indicator_id
-        )
+        选阶结果保存在 prediction_models 中并记录序列摘要，序列数据不变时直接复用，不再重复网格搜索。
+        """
+        criterion = criterion or settings.ARIMA_ORDER_CRITERION
+        if criterion not in ("aic", "bic"):
+            return {"error": f"不支持的信息准则: {criterion}"}
+        
+        years, values = DataService.get_series(db, city_id, indicator_id)
+        if len(values) < MIN_ARIMA_POINTS:
+            return {"error": "历史数据不足，ARIMA模型至少需要10年数据"}
         
-        valid_data = [(d.year, float(d.value)) for d in data if d.value is not None]
+        digest = series_hash(years, values)
+        model_name = f"{ARIMA_ORDER_MODEL_TYPE}:{city_id}:{indicator_id}"
+        stored = db.query(PredictionModel).filter(
+            PredictionModel.model_type == ARIMA_ORDER_MODEL_TYPE,
+            PredictionModel.model_name == model_name
+        ).order_by(PredictionModel.model_id.desc()).first()
         
-        if len(valid_data) < 10:
+        params = (stored.model_params or {}) if stored else {}
+        # 早期按 (p, d, q) 整体比较信息准则选出的结果不可信，没有差分检验记录的结果重新选阶
+        if (
+            params.get("series_hash") == digest
+            and params.get("criterion") == criterion
+            and params.get("differencing_test") == DIFFERENCING_TEST
+        ):
             return {
-                "city": city.city_name if city else "",
-                "indicator": indicator.indicator_name if indicator else "",
-                "model_type": "arima",
-                "error": "历史数据不足，ARIMA模型至少需要10年数据"
+                **{k: params[k] for k in (
+                    "order", "criterion", "score", "differencing_test", "candidates_fitted", "candidates_failed"
+                )},
+                "reused": True
             }
         
-        years = [d[0] for d in valid_data]
-        values = [d[1] for d in valid_data]
+        with metrics.fit_timer("arima_order_search"):
+            selection = PredictionService._search_arima_order(values, criterion)
+        if "error" in selection:
+            return selection
         
-        try:
-            model = ARIMA(values, order=order)
-            model_fit = model.fit()
-            
-            forecast = model_fit.forecast(steps=prediction_years)
-            alpha = 1 - confidence_level  # 从置信度计算alpha值
-            forecast_confint = model_fit.get_forecast(steps=prediction_years).conf_int(alpha=alpha)
-            
-            predictions = []
-            last_year = int(years[-1])  # 转换为Python int
-            
-            for i, pred in enumerate(forecast):
-                pred_year = last_year + i + 1
-                predictions.append({
-                    "year": pred_year,
-                    "predicted_value": round(float(pred), 2),
-                    "confidence_lower": round(float(forecast_confint[i, 0]), 2),
-                    "confidence_upper": round(float(forecast_confint[i, 1]), 2)
-                })
-            
-            # 转换为Python float
-            aic = float(model_fit.aic)
-            bic = float(model_fit.bic)
-            
-            return {
-                "city": city.city_name if city else "",
-                "indicator": indicator.indicator_name if indicator else "",
-                "unit": indicator.unit if indicator else "",
-                "model_type": "arima",
-                "order": order,
-                "predictions": predictions,
-                "accuracy": {
-                    "aic": round(aic, 4),
-                    "bic": round(bic, 4)
-                },
-                "training_years": [int(y) for y in years],  # 确保是Python int列表
-                "training_values": [round(float(v), 2) for v in values]  # 确保是Python float列表
-            }
+        if stored is None:
+            stored = PredictionModel(model_name=model_name, model_type=ARIMA_ORDER_MODEL_TYPE)
+            db.add(stored)
+        stored.model_params = {
+            "city_id": city_id,
+            "indicator_id": indicator_id,
+            "series_hash": digest,
+            **selection
+        }
+        stored.training_start_year = int(years[0])
+        stored.training_end_year = int(years[-1])
+        db.commit()
         
+        return {**selection, "reused": False}
+    
+    @staticmethod
+    def _start_arima(
+        context: "SeriesContext",
+        prediction_years: int,
+        confidence_level: float,
+        order: tuple = (1, 1, 1)
+    ) -> Callable[[], Dict[str, Any]]:
+        order = tuple(order)
+        return PredictionService._start_cached(
+            context, "arima", order, confidence_level, prediction_years,
+            lambda: PredictionService._arima_prediction(context, prediction_years, confidence_level, order)
+        )
+    
+    @staticmethod
+    def _arima_prediction(
+        context: "SeriesContext",
+        prediction_years: int,
+        confidence_level: float,
+        order: tuple
+    ) -> Callable[[], Dict[str, Any]]:
+        """把拟合提交到进程池，返回取结果的函数"""
+        if len(context.values) < MIN_ARIMA_POINTS:
+            insufficient = context.describe("arima", "历史数据不足，ARIMA模型至少需要10年数据")
+            return lambda: insufficient
+        
+        def failed(e: Exception) -> Dict[str, Any]:
+            return context.describe("arima", f"ARIMA模型拟合失败: {str(e)}")
+        
+        try:
+            fit = PredictionService._submit_arima(
+                context.city_id, context.indicator_id, context.years, context.values,
+                prediction_years, confidence_level, order
+            )
         except Exception as e:
-            return {
-                "city": city.city_name if city else "",
-                "indicator": indicator.indicator_name if indicator else "",
-                "model_type": "arima",
-                "error": f"ARIMA模型拟合失败: {str(e)}"
-            }
+            error = failed(e)
+            return lambda: error
+        
+        def collect() -> Dict[str, Any]:
+            try:
+                with metrics.fit_timer("arima" if fit[2] is None else "arima_incremental"):
+                    forecast = PredictionService._collect_arima(fit, context.years, context.values)
+            except Exception as e:
+                return failed(e)
+            return {**context.describe("arima"), "order": order, **forecast}
+        
+        return collect
+    
+    @staticmethod
+    def _submit_arima(
+        city_id: int,
+        indicator_id: int,
+        years: np.ndarray,
+        values: np.ndarray,
+        prediction_years: int,
+        confidence_level: float,
+        order: tuple
+    ) -> tuple:
+        """
+        提交 ARIMA 拟合，返回 (future, 状态键, 追加观测数)。
+        
+        序列只在末尾追加了观测时沿用已保存的参数增量更新，追加数为 None 表示完整拟合；
+        累计追加过多或距上次完整拟合过久时重新完整拟合。
+        """
+        key = ArimaStateCache.make_key(city_id, indicator_id, order)
+        state = arima_states.lookup(key, years, values, settings.ARIMA_REFIT_MAX_AGE)
+        params, appended = None, None
+        if state is not None and state[1] <= settings.ARIMA_REFIT_AFTER_APPENDS:
+            params, appended = state
+        
+        future = compute.submit(
+            arima_fit_forecast, years, values, prediction_years, confidence_level, order, params
+        )
+        return future, key, appended
+    
+    @staticmethod
+    def _collect_arima(fit: tuple, years: np.ndarray, values: np.ndarray) -> Dict[str, Any]:
+        """取回拟合结果并保存参数，供之后的增量更新使用"""
+        future, key, appended = fit
+        forecast, params = future.result()
+        arima_states.store(key, years, values, params, appended)
+        return {**forecast, "fit_mode": "full" if appended is None else "incremental"}
     
     @staticmethod
+    def refit_arima(
+        db: Session,
+        city_ids: Optional[List[int]] = None,
+        indicator_ids: Optional[List[int]] = None,
+        progress: Optional[Callable[[float], None]] = None
+    ) -> Dict[str, Any]:
+        """对已保存参数的序列重新完整拟合，可按需调用或作为定时任务提交；progress 接收已完成序列的比例"""
+        panel = PanelService.get_panel(db)
+        keys = [
+            key for key in arima_states.keys()
+            if (not city_ids or key[0] in city_ids) and (not indicator_ids or key[1] in indicator_ids)
+        ]
+        
+        started = time.perf_counter()
+        futures = {}
+        for key in keys:
+            years, values, _ = panel.series(key[0], key[1])
+            valid = ~np.isnan(values)
+            if valid.sum() < MIN_ARIMA_POINTS:
+                continue
+            futures[key] = (years[valid], values[valid], compute.submit(
+                arima_fit_forecast, years[valid], values[valid], 1, 0.95, key[2]
+            ))
+        
+        refitted = failed = 0
+        for key, (years, values, future) in futures.items():
+            try:
+                _, params = future.result()
+            except Exception:
+                failed += 1
+                if progress:
+                    progress((refitted + failed) / len(futures))
+                continue
+            arima_states.store(key, years, values, params)
+            refitted += 1
+            if progress:
+                progress((refitted + failed) / len(futures))
+        
+        if futures:
+            metrics.record_fit("arima_refit", time.perf_counter() - started, len(futures))
+        
+        # 已缓存的预测基于旧参数，全部丢弃
+        forecast_cache.clear()
+        invalidate("prediction")
+        
+        return {
+            "refitted": refitted,
+            "failed": failed,
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
+        }
+    
+    @staticmethod
+    @cached("prediction")
     def ensemble_prediction(
         db: Session,
         city_id: int,
@@ -168,70 +429,254 @@ class PredictionService:
         prediction_years: int = 3,
         confidence_level: float = 0.95
     ) -> Dict[str, Any]:
-        lr_result = PredictionService.linear_regression_prediction(
-            db, city_id, indicator_id, prediction_years, confidence_level
-        )
+        """城市、指标、序列与回测误差只读取一次；所有组成模型先启动再取结果，ARIMA 在进程池中拟合时线性模型在当前线程完成"""
+        context = SeriesContext.load(db, city_id, indicator_id, with_scores=True)
         
-        arima_result = PredictionService.arima_prediction(
-            db, city_id, indicator_id, prediction_years, confidence_level
-        )
+        pending = {
+            name: start(context, prediction_years, confidence_level)
+            for name, (_, start) in ENSEMBLE_COMPONENTS.items()
+        }
+        components = {name: collect() for name, collect in pending.items()}
+        
+        return PredictionService._combine_ensemble(components, prediction_years, context.scores)
+    
+    @staticmethod
+    def _ensemble_weights(names: List[str], scores: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, float], str]:
+        """按回测 RMSE 平方的倒数加权（逆方差加权），任一组成模型缺少回测结果时等权"""
+        rmse = {name: (scores.get(name) or {}).get("rmse") for name in names}
+        if all(rmse.values()):
+            inverse = {name: 1 / value ** 2 for name, value in rmse.items()}
+            total = sum(inverse.values())
+            return {name: value / total for name, value in inverse.items()}, "backtest"
+        return {name: 1 / len(names) for name in names}, "equal"
+    
+    @staticmethod
+    def _combine_ensemble(
+        components: Dict[str, Dict[str, Any]],
+        prediction_years: int,
+        scores: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        按回测误差加权组合各组成模型未取整的预测，结果最后统一取整。
         
-        if "error" in lr_result and "error" in arima_result:
+        components 的键与 ENSEMBLE_COMPONENTS 一致；只有一个模型成功时直接返回该模型的结果。
+        """
+        succeeded = {name: result for name, result in components.items() if "error" not in result}
+        if not succeeded:
+            first = next(iter(components.values()))
             return {
-                "city": lr_result.get("city", ""),
-                "indicator": lr_result.get("indicator", ""),
+                "city": first.get("city", ""),
+                "indicator": first.get("indicator", ""),
                 "model_type": "ensemble",
                 "error": "所有模型预测失败"
             }
         
+        if len(succeeded) == 1:
+            return round_predictions(next(iter(succeeded.values())))
+        
+        weights, weighting = PredictionService._ensemble_weights(list(succeeded), scores or {})
+        
         predictions = []
+        for i in range(prediction_years):
+            rows = {name: result["predictions"][i] for name, result in succeeded.items()}
+            prediction = {"year": next(iter(rows.values()))["year"]}
+            for field in PREDICTION_VALUE_FIELDS:
+                prediction[field] = round(sum(weights[name] * row[field] for name, row in rows.items()), 2)
+            for name, row in rows.items():
+                prediction[ENSEMBLE_COMPONENTS[name][0]] = round(row["predicted_value"], 2)
+            predictions.append(prediction)
+        
+        # 以线性回归的准确性指标（含R²）作为集成模型的指标，各组成模型的指标放在 components 中
+        base = succeeded.get("linear", next(iter(succeeded.values())))
+        accuracy = {
+            **base.get("accuracy", {}),
+            "components": {result["model_type"]: result.get("accuracy", {}) for result in succeeded.values()}
+        }
+        
+        return {
+            "city": base["city"],
+            "indicator": base["indicator"],
+            "unit": base.get("unit", ""),
+            "model_type": "ensemble",
+            "predictions": predictions,
+            "accuracy": accuracy,
+            "weights": {name: round(weight, 4) for name, weight in weights.items()},
+            "weighting": weighting,
+            "training_years": base.get("training_years", []),
+            "training_values": base.get("training_values", [])
+        }
+    
+    @staticmethod
+    def bulk_prediction(
+        db: Session,
+        city_ids: Optional[List[int]] = None,
+        indicator_ids: Optional[List[int]] = None,
+        model_types: Optional[List[str]] = None,
+        prediction_years: int = 3,
+        confidence_level: float = 0.95,
+        order: tuple = (1, 1, 1),
+        auto_order: bool = False,
+        progress: Optional[Callable[[float], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        批量预测：序列一次性取自面板，线性模型矩阵化拟合，ARIMA拟合分发到进程池，单个序列失败不影响整体。
+        
+        ARIMA（含集成模型中的 ARIMA）使用 order；auto_order 为 True 时各序列使用按信息准则选出的阶数，
+        与单序列接口相同，选阶失败的序列退回 order。
+        progress 接收已完成序列的比例；线性模型一次完成，比例随 ARIMA 结果的取回增加。
+        """
+        model_types = ["linear"] if model_types is None else model_types
+        unsupported = [m for m in model_types if m not in BULK_MODEL_TYPES]
+        if unsupported or not model_types:
+            return {"error": f"不支持的模型类型: {', '.join(unsupported) or '空'}"}
+        
+        started = time.perf_counter()
+        panel = PanelService.get_panel(db)
+        cities = {c.city_id: c for c in DataService.get_all_cities(db)}
+        indicators = {i.indicator_id: i for i in DataService.get_all_indicators(db)}
+        
+        city_ids = city_ids or sorted(cities)
+        indicator_ids = indicator_ids or sorted(indicators)
+        pairs = [(c, i) for c in city_ids for i in indicator_ids]
+        # 不存在的城市或指标逐个报错，不参与拟合
+        known = [pair for pair in pairs if pair[0] in cities and pair[1] in indicators]
+        versions = {pair: PanelService.series_version(*pair) for pair in pairs}
+        cache_hits = 0
+        
+        def describe(pair: tuple, model_type: str, error: Optional[str] = None) -> Dict[str, Any]:
+            city = cities.get(pair[0])
+            indicator = indicators.get(pair[1])
+            result = {
+                "city": city.city_name if city else "",
+                "indicator": indicator.indicator_name if indicator else ""
+            }
+            if error is None:
+                result["unit"] = indicator.unit if indicator else ""
+            result["model_type"] = model_type
+            if error is not None:
+                result["error"] = error
+            return result
         
-        if "error" not in lr_result and "error" not in arima_result:
-            for i in range(prediction_years):
-                lr_pred = lr_result["predictions"][i]["predicted_value"]
-                arima_pred = arima_result["predictions"][i]["predicted_value"]
+        def cache_key(pair: tuple, model_type: str, model_order: Optional[tuple]) -> tuple:
+            return ForecastCache.make_key(
+                pair[0], pair[1], model_type, model_order, confidence_level, prediction_years, versions[pair]
+            )
+        
+        linear_results: Dict[tuple, Dict[str, Any]] = {}
+        arima_results: Dict[tuple, Dict[str, Any]] = {}
+        
+        if "linear" in model_types or "ensemble" in model_types:
+            pending = []
+            for pair in known:
+                cached = forecast_cache.get(cache_key(pair, "linear_regression", None))
+                if cached is not None:
+                    linear_results[pair] = cached
+                    cache_hits += 1
+                else:
+                    pending.append(pair)
+            
+            if pending:
+                # 面板中尚无数据的序列整行为 NaN，按数据不足处理
+                block = np.full((len(pending), len(panel.years)), np.nan)
+                for k, pair in enumerate(pending):
+                    values = panel.series(*pair)[1]
+                    if len(values):
+                        block[k] = values
+                counts = (~np.isnan(block)).sum(axis=1)
+                with metrics.fit_timer("linear_bulk", len(pending)):
+                    forecasts = (
+                        linear_forecasts(panel.years, block, prediction_years, confidence_level)
+                        if len(panel.years) else [None] * len(pending)
+                    )
                 
-                ensemble_pred = (lr_pred + arima_pred) / 2
+                for pair, forecast, count in zip(pending, forecasts, counts):
+                    if count < MIN_LINEAR_POINTS:
+                        result = describe(pair, "linear_regression", "历史数据不足，至少需要5年数据")
+                    else:
+                        result = {**describe(pair, "linear_regression"), **forecast}
+                        forecast_cache.put(cache_key(pair, "linear_regression", None), result)
+                    linear_results[pair] = result
+        
+        if "arima" in model_types or "ensemble" in model_types:
+            orders = {pair: tuple(order) for pair in known}
+            if auto_order:
+                for pair in known:
+                    selection = PredictionService.select_arima_order(db, *pair)
+                    if "error" not in selection:
+                        orders[pair] = tuple(selection["order"])
+            
+            futures = {}
+            fit_started = time.perf_counter()
+            for pair in known:
+                cached = forecast_cache.get(cache_key(pair, "arima", orders[pair]))
+                if cached is not None:
+                    arima_results[pair] = cached
+                    cache_hits += 1
+                    continue
                 
-                lr_lower = lr_result["predictions"][i]["confidence_lower"]
-                lr_upper = lr_result["predictions"][i]["confidence_upper"]
-                arima_lower = arima_result["predictions"][i]["confidence_lower"]
-                arima_upper = arima_result["predictions"][i]["confidence_upper"]
+                years, values, _ = panel.series(*pair)
+                valid = ~np.isnan(values)
+                if valid.sum() < MIN_ARIMA_POINTS:
+                    arima_results[pair] = describe(pair, "arima", "历史数据不足，ARIMA模型至少需要10年数据")
+                    continue
                 
-                predictions.append({
-                    "year": lr_result["predictions"][i]["year"],
-                    "predicted_value": round(ensemble_pred, 2),
-                    "confidence_lower": round((lr_lower + arima_lower) / 2, 2),
-                    "confidence_upper": round((lr_upper + arima_upper) / 2, 2),
-                    "lr_prediction": lr_pred,
-                    "arima_prediction": arima_pred
-                })
-            
-            # 计算集成模型的准确性指标
-            lr_accuracy = lr_result.get("accuracy", {})
-            arima_accuracy = arima_result.get("accuracy", {})
+                futures[pair] = (years[valid], values[valid], PredictionService._submit_arima(
+                    pair[0], pair[1], years[valid], values[valid], prediction_years, confidence_level, orders[pair]
+                ))
             
-            # 如果线性回归有R²，使用它作为集成模型的R²
-            accuracy = {
-                **lr_accuracy,  # 使用线性回归的准确性指标
-                "components": {
-                    "linear_regression": lr_accuracy,
-                    "arima": arima_accuracy
-                }
-            }
+            for pair, (years, values, fit) in futures.items():
+                try:
+                    forecast = PredictionService._collect_arima(fit, years, values)
+                except Exception as e:
+                    arima_results[pair] = describe(pair, "arima", f"ARIMA模型拟合失败: {str(e)}")
+                    if progress:
+                        progress(len(arima_results) / len(known))
+                    continue
+                
+                result = {**describe(pair, "arima"), "order": orders[pair], **forecast}
+                forecast_cache.put(cache_key(pair, "arima", orders[pair]), result)
+                arima_results[pair] = result
+                if progress:
+                    progress(len(arima_results) / len(known))
             
-            return {
-                "city": lr_result["city"],
-                "indicator": lr_result["indicator"],
-                "unit": lr_result.get("unit", ""),
-                "model_type": "ensemble",
-                "predictions": predictions,
-                "accuracy": accuracy,
-                "training_years": lr_result.get("training_years", []),
-                "training_values": lr_result.get("training_values", [])
-            }
+            # 从提交到取回全部结果的墙钟时间，进程池并行拟合时小于各序列耗时之和
+            if futures:
+                metrics.record_fit("arima_bulk", time.perf_counter() - fit_started, len(futures))
+        
+        scores = PredictionService._load_backtest_scores(db) if "ensemble" in model_types else {}
         
-        return lr_result if "error" not in lr_result else arima_result
+        results = []
+        for pair in pairs:
+            for model_type in model_types:
+                if pair not in linear_results and pair not in arima_results:
+                    result = describe(pair, BULK_RESULT_TYPES[model_type], "城市或指标不存在")
+                elif model_type == "linear":
+                    result = round_predictions(linear_results[pair])
+                elif model_type == "arima":
+                    result = round_predictions(arima_results[pair])
+                else:
+                    result = PredictionService._combine_ensemble(
+                        {"linear": linear_results[pair], "arima": arima_results[pair]},
+                        prediction_years,
+                        scores.get(pair)
+                    )
+                results.append({"city_id": pair[0], "indicator_id": pair[1], **result})
+        
+        failed = sum(1 for r in results if "error" in r)
+        
+        return {
+            "model_types": model_types,
+            "prediction_years": prediction_years,
+            "confidence_level": confidence_level,
+            "results": results,
+            "summary": {
+                "total": len(results),
+                "succeeded": len(results) - failed,
+                "failed": failed,
+                "cache_hits": cache_hits,
+                "elapsed_seconds": round(time.perf_counter() - started, 3)
+            }
+        }
     
     @staticmethod
     def scenario_simulation(
@@ -239,8 +684,44 @@ class PredictionService:
         city_id: int,
         indicator_id: int,
         scenario_params: Dict[str, float],
-        prediction_years: int = 3
+        prediction_years: int = 3,
+        paths: int = 1000,
+        method: str = "bootstrap",
+        seed: Optional[int] = None,
+        thresholds: Optional[List[float]] = None
     ) -> Dict[str, Any]:
+        """
+        情景模拟：scenarios 为基准线性预测按各情景调整幅度（百分比）缩放的结果；
+        simulation 为蒙特卡洛模拟的分位数扇形图与达到阈值的概率，所有情景在一次数组运算中完成。
+        
+        未指定 seed 时先生成随机种子再查缓存，每次请求得到独立的模拟，种子随结果返回以便复现。
+        """
+        if seed is None:
+            seed = int(np.random.default_rng().integers(2 ** 31))
+        return PredictionService._scenario_simulation(
+            db, city_id, indicator_id, scenario_params, prediction_years, paths, method, seed, thresholds
+        )
+    
+    @staticmethod
+    @cached("prediction")
+    def _scenario_simulation(
+        db: Session,
+        city_id: int,
+        indicator_id: int,
+        scenario_params: Dict[str, float],
+        prediction_years: int,
+        paths: int,
+        method: str,
+        seed: int,
+        thresholds: Optional[List[float]]
+    ) -> Dict[str, Any]:
+        if method not in SIMULATION_METHODS:
+            return {"error": f"不支持的模拟方法: {method}"}
+        # 阈值概率在 情景 × 阈值 × 路径 × 年份 的数组上计算，阈值数计入规模
+        cells = len(scenario_params) * paths * prediction_years * max(len(thresholds or ()), 1)
+        if cells > settings.SIMULATION_MAX_CELLS:
+            return {"error": "情景数 × 路径数 × 预测年数 × 阈值数超出上限，请减少路径数、情景数或阈值数"}
+        
         base_prediction = PredictionService.linear_regression_prediction(
             db, city_id, indicator_id, prediction_years
         )
@@ -248,21 +729,46 @@ class PredictionService:
         if "error" in base_prediction:
             return base_prediction
         
-        scenarios = {}
+        names = list(scenario_params)
+        factors = 1 + np.array([scenario_params[name] for name in names], dtype=float) / 100
+        pred_years = [pred["year"] for pred in base_prediction["predictions"]]
+        base = np.array([
+            [pred["predicted_value"], pred["confidence_lower"], pred["confidence_upper"]]
+            for pred in base_prediction["predictions"]
+        ])
+        adjusted = np.round(base[None, :, :] * factors[:, None, None], 2)
         
-        for scenario_name, growth_factor in scenario_params.items():
-            adjusted_predictions = []
-            
-            for pred in base_prediction["predictions"]:
-                adjusted_value = pred["predicted_value"] * (1 + growth_factor / 100)
-                adjusted_predictions.append({
-                    "year": pred["year"],
-                    "predicted_value": round(adjusted_value, 2),
-                    "confidence_lower": round(pred["confidence_lower"] * (1 + growth_factor / 100), 2),
-                    "confidence_upper": round(pred["confidence_upper"] * (1 + growth_factor / 100), 2)
-                })
-            
-            scenarios[scenario_name] = adjusted_predictions
+        scenarios = {
+            name: [
+                {
+                    "year": year,
+                    "predicted_value": float(adjusted[s, h, 0]),
+                    "confidence_lower": float(adjusted[s, h, 1]),
+                    "confidence_upper": float(adjusted[s, h, 2])
+                }
+                for h, year in enumerate(pred_years)
+            ]
+            for s, name in enumerate(names)
+        }
+        
+        rng = np.random.default_rng(seed)
+        years, values = DataService.get_series(db, city_id, indicator_id)
+        
+        with metrics.fit_timer("simulation"):
+            base_paths = simulate_trend_paths(years, values, np.array(pred_years), paths, method, rng)
+            fan = scenario_fan(base_paths, [scenario_params[name] for name in names], DEFAULT_PERCENTILES, thresholds)
+        
+        simulated = {}
+        for s, name in enumerate(names):
+            summary = {"mean": np.round(fan["mean"][s], 2).tolist()}
+            for k, q in enumerate(DEFAULT_PERCENTILES):
+                summary[f"p{q}"] = np.round(fan["percentiles"][s, k], 2).tolist()
+            if thresholds:
+                summary["threshold_probabilities"] = [
+                    {"threshold": threshold, "probabilities": np.round(fan["threshold_probabilities"][s, m], 4).tolist()}
+                    for m, threshold in enumerate(thresholds)
+                ]
+            simulated[name] = summary
         
         return {
             "city": base_prediction["city"],
@@ -270,5 +776,233 @@ class PredictionService:
             "unit": base_prediction.get("unit", ""),
             "model_type": "scenario_simulation",
             "base_prediction": base_prediction["predictions"],
-            "scenarios": scenarios
+            "scenarios": scenarios,
+            "simulation": {
+                "method": method,
+                "paths": paths,
+                "seed": seed,
+                "years": pred_years,
+                "percentiles": list(DEFAULT_PERCENTILES),
+                "scenarios": simulated
+            }
+        }
+    
+    @staticmethod
+    def _backtest_name(city_id: int, indicator_id: int, model_type: str) -> str:
+        return f"{BACKTEST_MODEL_TYPE}:{city_id}:{indicator_id}:{model_type}"
+    
+    @staticmethod
+    def run_backtest(
+        db: Session,
+        city_ids: Optional[List[int]] = None,
+        indicator_ids: Optional[List[int]] = None,
+        model_types: Optional[List[str]] = None,
+        horizon: Optional[int] = None,
+        min_train_years: Optional[int] = None,
+        order: tuple = (1, 1, 1),
+        progress: Optional[Callable[[float], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        滚动起点回测：每条序列按扩展窗口逐年做 1 至 horizon 步预测，各模型的 MAPE / RMSE 写入 prediction_models。
+        
+        序列分发到进程池并行回测；序列数据与回测设置均未变化的序列直接沿用已保存的结果。
+        progress 接收已完成（含沿用与跳过）序列的比例。
+        """
+        model_types = list(model_types or BULK_MODEL_TYPES)
+        unsupported = [m for m in model_types if m not in BULK_MODEL_TYPES]
+        if unsupported:
+            return {"error": f"不支持的模型类型: {', '.join(unsupported)}"}
+        
+        horizon = horizon or settings.BACKTEST_HORIZON
+        if horizon < 1:
+            return {"error": "预测步长至少为1"}
+        
+        # 所有模型使用相同的起点，最短训练年数取各模型所需观测数的最大值
+        needs_arima = "arima" in model_types or "ensemble" in model_types
+        min_train = max(
+            min_train_years or settings.BACKTEST_MIN_TRAIN_YEARS,
+            MIN_ARIMA_POINTS if needs_arima else MIN_LINEAR_POINTS
+        )
+        config = {
+            "horizon": horizon,
+            "min_train_years": min_train,
+            "order": list(order),
+            "refit_every": settings.ARIMA_REFIT_AFTER_APPENDS
+        }
+        
+        started = time.perf_counter()
+        panel = PanelService.get_panel(db)
+        city_ids = city_ids or sorted(c.city_id for c in DataService.get_all_cities(db))
+        indicator_ids = indicator_ids or sorted(i.indicator_id for i in DataService.get_all_indicators(db))
+        pairs = [(c, i) for c in city_ids for i in indicator_ids]
+        
+        stored = {
+            row.model_name: row
+            for row in db.query(PredictionModel).filter(PredictionModel.model_type == BACKTEST_MODEL_TYPE)
+        }
+        
+        def is_current(pair: tuple, model_type: str, digest: str) -> bool:
+            row = stored.get(PredictionService._backtest_name(pair[0], pair[1], model_type))
+            params = (row.model_params or {}) if row else {}
+            return params.get("series_hash") == digest and all(params.get(k) == v for k, v in config.items())
+        
+        futures = {}
+        reused = skipped = 0
+        for pair in pairs:
+            years, values, _ = panel.series(*pair)
+            valid = ~np.isnan(values)
+            if valid.sum() <= min_train:
+                skipped += 1
+                continue
+            
+            years, values = years[valid], values[valid]
+            digest = series_hash(years, values)
+            if all(is_current(pair, m, digest) for m in model_types):
+                reused += 1
+                continue
+            
+            futures[pair] = (years, digest, compute.submit(
+                backtest_series, years, values, model_types, horizon, min_train,
+                tuple(order), settings.ARIMA_REFIT_AFTER_APPENDS
+            ))
+        
+        evaluated = failed = 0
+        for pair, (years, digest, future) in futures.items():
+            try:
+                scores = future.result()
+            except Exception:
+                failed += 1
+                if progress:
+                    progress((reused + skipped + evaluated + failed) / len(pairs))
+                continue
+            
+            for model_type, score in scores.items():
+                name = PredictionService._backtest_name(pair[0], pair[1], model_type)
+                row = stored.get(name)
+                if row is None:
+                    row = PredictionModel(model_name=name, model_type=BACKTEST_MODEL_TYPE)
+                    db.add(row)
+                row.model_params = {
+                    "city_id": pair[0],
+                    "indicator_id": pair[1],
+                    "model": model_type,
+                    "series_hash": digest,
+                    **config,
+                    **score
+                }
+                row.training_start_year = int(years[0])
+                row.training_end_year = int(years[-1])
+                # accuracy_score 保存 MAPE（越小越好），超出列精度的极端值只保留在 model_params 中
+                mape = score["mape"]
+                row.accuracy_score = mape if mape is not None and mape < BACKTEST_MAX_SCORE else None
+            evaluated += 1
+            if progress:
+                progress((reused + skipped + evaluated + failed) / len(pairs))
+        
+        if futures:
+            versions = data_versions.bump(db, "backtest")
+            db.commit()
+            data_versions.remember(versions)
+            metrics.record_fit("backtest", time.perf_counter() - started, len(futures))
+            # 集成模型的权重来自回测误差，已缓存的集成预测一并失效
+            invalidate("backtest", "prediction")
+        
+        return {
+            "model_types": model_types,
+            **config,
+            "series": len(pairs),
+            "evaluated": evaluated,
+            "reused": reused,
+            "skipped": skipped,
+            "failed": failed,
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
         }
+    
+    @staticmethod
+    def backtest_scores(db: Session, city_id: int, indicator_id: int) -> List[Dict[str, Any]]:
+        """单条序列各模型的回测结果，按 MAPE 从小到大排列；一次索引查询"""
+        names = [PredictionService._backtest_name(city_id, indicator_id, m) for m in BULK_MODEL_TYPES]
+        rows = db.query(PredictionModel).filter(
+            PredictionModel.model_type == BACKTEST_MODEL_TYPE,
+            PredictionModel.model_name.in_(names)
+        ).all()
+        scores = [row.model_params for row in rows if row.model_params]
+        return sorted(scores, key=lambda s: (s.get("mape") is None, s.get("mape") or 0))
+    
+    @staticmethod
+    def _load_backtest_scores(db: Session) -> Dict[tuple, Dict[str, Dict[str, Any]]]:
+        """全部序列的回测结果 {(城市, 指标): {模型: model_params}}，一次查询"""
+        rows = db.query(PredictionModel.model_params).filter(PredictionModel.model_type == BACKTEST_MODEL_TYPE)
+        scores: Dict[tuple, Dict[str, Dict[str, Any]]] = {}
+        for (params,) in rows:
+            if params:
+                scores.setdefault((params["city_id"], params["indicator_id"]), {})[params["model"]] = params
+        return scores
+    
+    @staticmethod
+    @cached("backtest")
+    def backtest_leaderboard(
+        db: Session,
+        city_id: Optional[int] = None,
+        indicator_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        汇总已保存的回测结果：各模型的平均与中位 MAPE，以及在多少条序列上误差最小。
+        
+        同时指定城市与指标时另外返回该序列各模型的回测结果与最优模型。
+        """
+        if city_id is not None and indicator_id is not None:
+            entries = PredictionService.backtest_scores(db, city_id, indicator_id)
+        else:
+            rows = db.query(PredictionModel.model_params).filter(
+                PredictionModel.model_type == BACKTEST_MODEL_TYPE
+            )
+            entries = [
+                params for (params,) in rows
+                if params
+                and (city_id is None or params.get("city_id") == city_id)
+                and (indicator_id is None or params.get("indicator_id") == indicator_id)
+            ]
+        
+        by_model: Dict[str, List[float]] = {}
+        best: Dict[tuple, Dict[str, Any]] = {}
+        for entry in entries:
+            mape = entry.get("mape")
+            by_model.setdefault(entry["model"], [])
+            if mape is None:
+                continue
+            by_model[entry["model"]].append(mape)
+            key = (entry["city_id"], entry["indicator_id"])
+            if key not in best or mape < best[key]["mape"]:
+                best[key] = entry
+        
+        wins: Dict[str, int] = {}
+        for entry in best.values():
+            wins[entry["model"]] = wins.get(entry["model"], 0) + 1
+        
+        leaderboard = [
+            {
+                "model_type": model_type,
+                "series": len(mapes),
+                "mean_mape": round(float(np.mean(mapes)), 4) if mapes else None,
+                "median_mape": round(float(np.median(mapes)), 4) if mapes else None,
+                "wins": wins.get(model_type, 0)
+            }
+            for model_type, mapes in by_model.items()
+        ]
+        leaderboard.sort(key=lambda m: (m["mean_mape"] is None, m["mean_mape"] or 0))
+        
+        result = {"series": len(best), "leaderboard": leaderboard}
+        if city_id is not None and indicator_id is not None:
+            result["results"] = entries
+            result["best_model"] = entries[0]["model"] if entries and entries[0].get("mape") is not None else None
+        return result
+
+
+# 集成模型的组成模型，键与回测、批量预测的模型类型一致，值为 (预测行中的字段名, 启动函数)。
+# 启动函数接收 (SeriesContext, prediction_years, confidence_level) 并返回取结果的函数；
+# 新的组成模型在此登记即可，序列数据由 SeriesContext 提供，不需要额外查询。
+ENSEMBLE_COMPONENTS: Dict[str, Tuple[str, Callable[..., Callable[[], Dict[str, Any]]]]] = {
+    "linear": ("lr_prediction", PredictionService._start_linear),
+    "arima": ("arima_prediction", PredictionService._start_arima),
+}
@@ -0,0 +1,149 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import and_, or_, func, select, delete, insert
+from sqlalchemy.orm import Session
+from app.models.database import City, Indicator, AnnualData, RegionalSummary
+
+# 全区域合计行的 region 取值
+ALL_REGIONS = "全部"
+# 城市未设置区域时归入的分组
+UNKNOWN_REGION = "其他"
+
+# 单次增量刷新的分组数上限，超过时直接全量重建
+MAX_REFRESH_KEYS = 200
+
+# 汇总接口返回的字段与指标代码的对应关系
+SUMMARY_INDICATORS = {
+    "total_gdp": "gdp",
+    "total_population": "population",
+    "total_trade": "total_trade",
+}
+
+
+class RegionalSummaryService:
+    """regional_summary 物化表：按 (年份, 指标) 与 (年份, 指标, 区域) 预先汇总 annual_data"""
+
+    @staticmethod
+    def _aggregate(db, keys: Optional[Set[Tuple[int, int]]] = None) -> List[Dict[str, Any]]:
+        """一次 GROUP BY 计算区域小计，再在内存中合成全区域合计；keys 为 (年份, 指标) 时只计算这些分组"""
+        region = func.coalesce(City.region, UNKNOWN_REGION)
+        query = select(
+            AnnualData.year,
+            AnnualData.indicator_id,
+            region,
+            func.sum(AnnualData.value),
+            func.count(AnnualData.value)
+        ).join(City, City.city_id == AnnualData.city_id).group_by(
+            AnnualData.year, AnnualData.indicator_id, region
+        )
+        if keys is not None:
+            query = query.where(or_(*[
+                and_(AnnualData.year == year, AnnualData.indicator_id == indicator_id)
+                for year, indicator_id in keys
+            ]))
+
+        rows = []
+        totals: Dict[Tuple[int, int], List[float]] = {}
+        for year, indicator_id, region_name, total, count in db.execute(query):
+            total = float(total) if total is not None else None
+            rows.append({
+                "year": year,
+                "indicator_id": indicator_id,
+                "region": region_name,
+                "total_value": total,
+                "city_count": count
+            })
+            entry = totals.setdefault((year, indicator_id), [0.0, 0])
+            entry[0] += total or 0.0
+            entry[1] += count
+
+        for (year, indicator_id), (total, count) in totals.items():
+            rows.append({
+                "year": year,
+                "indicator_id": indicator_id,
+                "region": ALL_REGIONS,
+                "total_value": total,
+                "city_count": count
+            })
+        return rows
+
+    @staticmethod
+    def rebuild(db) -> int:
+        """全量重建汇总表，db 可以是 Session 或 Connection，由调用方提交事务"""
+        rows = RegionalSummaryService._aggregate(db)
+        db.execute(delete(RegionalSummary))
+        if rows:
+            db.execute(insert(RegionalSummary), rows)
+        return len(rows)
+
+    @staticmethod
+    def refresh(db, keys: Iterable[Tuple[int, int]]) -> None:
+        """只重新计算受写入影响的 (年份, 指标) 分组，由调用方提交事务"""
+        keys = {(int(year), int(indicator_id)) for year, indicator_id in keys}
+        if not keys:
+            return
+        if len(keys) > MAX_REFRESH_KEYS:
+            RegionalSummaryService.rebuild(db)
+            return
+
+        rows = RegionalSummaryService._aggregate(db, keys)
+        db.execute(delete(RegionalSummary).where(or_(*[
+            and_(RegionalSummary.year == year, RegionalSummary.indicator_id == indicator_id)
+            for year, indicator_id in keys
+        ])))
+        if rows:
+            db.execute(insert(RegionalSummary), rows)
+
+    @staticmethod
+    def _summary_fields(db: Session) -> Dict[int, str]:
+        """汇总指标的 indicator_id 到返回字段名的映射，只包含库中存在的指标"""
+        field_names = {code: field for field, code in SUMMARY_INDICATORS.items()}
+        rows = db.query(Indicator.indicator_id, Indicator.indicator_code).filter(
+            Indicator.indicator_code.in_(list(field_names))
+        ).all()
+        return {indicator_id: field_names[code] for indicator_id, code in rows}
+
+    @staticmethod
+    def get_summaries(
+        db: Session,
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None
+    ) -> Dict[int, Dict[str, Any]]:
+        """读取年份区间内的区域汇总，每年包含全区域合计与各区域小计"""
+        fields = RegionalSummaryService._summary_fields(db)
+        if not fields:
+            return {}
+
+        query = db.query(
+            RegionalSummary.year,
+            RegionalSummary.indicator_id,
+            RegionalSummary.region,
+            RegionalSummary.total_value
+        ).filter(RegionalSummary.indicator_id.in_(list(fields)))
+        if start_year is not None:
+            query = query.filter(RegionalSummary.year >= start_year)
+        if end_year is not None:
+            query = query.filter(RegionalSummary.year <= end_year)
+
+        # 存在的指标默认为0，与逐行求和时没有数据的情况一致
+        empty = {field: 0.0 for field in SUMMARY_INDICATORS if field in fields.values()}
+        summaries: Dict[int, Dict[str, Any]] = {}
+        for year, indicator_id, region, total in query.order_by(RegionalSummary.year).all():
+            summary = summaries.setdefault(year, {**empty, "regions": {}})
+            value = round(float(total), 4) if total is not None else 0.0
+            if region == ALL_REGIONS:
+                summary[fields[indicator_id]] = value
+            else:
+                summary["regions"].setdefault(region, dict(empty))[fields[indicator_id]] = value
+
+        return summaries
+
+    @staticmethod
+    def get_summary(db: Session, year: int) -> Dict[str, Any]:
+        summaries = RegionalSummaryService.get_summaries(db, year, year)
+        if year in summaries:
+            return summaries[year]
+
+        fields = RegionalSummaryService._summary_fields(db)
+        if not fields:
+            return {}
+        return {**{field: 0.0 for field in SUMMARY_INDICATORS if field in fields.values()}, "regions": {}}
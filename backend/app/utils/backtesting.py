@@ -0,0 +1,159 @@
+import warnings
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from app.utils.trend_engine import fit_trends
+
+
+def linear_backtest(years: np.ndarray, values: np.ndarray, origins: Sequence[int], horizon: int) -> np.ndarray:
+    """
+    线性趋势的滚动起点预测，形状 (起点数, horizon)，超出样本的位置为 NaN。
+
+    第 o 个起点只使用前 origins[o] 个观测；各起点的扩展窗口以屏蔽矩阵表示，一次批量拟合完成。
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    origins = np.asarray(origins)
+
+    block = np.where(np.arange(n)[None, :] < origins[:, None], values[None, :], np.nan)
+    fit = fit_trends(years, block)
+
+    targets = origins[:, None] + np.arange(horizon)[None, :]
+    in_sample = targets < n
+    forecasts = fit.predict(years[np.minimum(targets, n - 1)])
+    return np.where(in_sample, forecasts, np.nan)
+
+
+def arima_backtest(
+    values: np.ndarray,
+    origins: Sequence[int],
+    horizon: int,
+    order: tuple = (1, 1, 1),
+    refit_every: int = 3
+) -> np.ndarray:
+    """
+    ARIMA 的滚动起点预测，形状 (起点数, horizon)。
+
+    相邻起点只相差一个观测，沿用上一次完整拟合的参数运行卡尔曼滤波即可，
+    每隔 refit_every 个起点才重新做极大似然估计；拟合失败的起点为 NaN。
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    forecasts = np.full((len(origins), horizon), np.nan)
+    params = None
+    since_fit = 0
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for o, origin in enumerate(origins):
+            steps = min(horizon, n - origin)
+            model = ARIMA(values[:origin], order=order)
+            try:
+                if params is None or since_fit >= refit_every:
+                    model_fit = model.fit()
+                    params, since_fit = np.asarray(model_fit.params), 0
+                else:
+                    model_fit = model.filter(params)
+                    since_fit += 1
+                forecasts[o, :steps] = np.asarray(model_fit.forecast(steps=steps))
+            except Exception:
+                params = None
+    return forecasts
+
+
+def ensemble_backtest(
+    actuals: np.ndarray,
+    targets: np.ndarray,
+    origins: Sequence[int],
+    components: List[np.ndarray]
+) -> np.ndarray:
+    """
+    集成模型的滚动起点预测，与线上集成相同：按各组成模型 RMSE 平方的倒数加权。
+
+    第 o 个起点的权重只使用目标年份早于 origins[o] 的历史预测误差，不含该起点之后才能观测到的数据；
+    尚无历史误差或误差为 0 时等权，某个组成模型在该位置失败时使用其余模型。
+    """
+    origins = np.asarray(origins)
+    stacked = np.stack(components)
+    squared = (stacked - actuals[None, :, :]) ** 2
+    known = (targets[None, :, :] < origins[:, None, None])[None, :, :, :] & np.isfinite(squared)[:, None, :, :]
+
+    counts = known.sum(axis=(2, 3))
+    totals = np.where(known, squared[:, None, :, :], 0.0).sum(axis=(2, 3))
+    # 各模型在各起点之前的均方误差的倒数，即 RMSE 平方的倒数
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inverse = counts / totals
+    scored = np.all(np.isfinite(inverse) & (inverse > 0), axis=0)
+    weights = np.where(scored[None, :], inverse, 1.0)
+
+    available = np.isfinite(stacked)
+    cell_weights = np.where(available, weights[:, :, None], 0.0)
+    total = cell_weights.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        combined = (np.where(available, stacked, 0.0) * cell_weights).sum(axis=0) / total
+    return np.where(total > 0, combined, np.nan)
+
+
+def forecast_errors(actuals: np.ndarray, forecasts: np.ndarray) -> Dict[str, Any]:
+    """RMSE 与 MAPE（百分比），总体及按预测步长；MAPE 忽略实际值为 0 的位置"""
+    errors = forecasts - actuals
+    valid = np.isfinite(errors)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scaled = np.where(actuals != 0, np.abs(errors) / np.abs(actuals), np.nan)
+
+    def rmse(e: np.ndarray) -> Optional[float]:
+        e = e[np.isfinite(e)]
+        return round(float(np.sqrt(np.mean(e ** 2))), 6) if len(e) else None
+
+    def mape(s: np.ndarray) -> Optional[float]:
+        s = s[np.isfinite(s)]
+        return round(float(np.mean(s) * 100), 6) if len(s) else None
+
+    return {
+        "rmse": rmse(errors.ravel()),
+        "mape": mape(scaled.ravel()),
+        "rmse_by_horizon": [rmse(errors[:, h]) for h in range(errors.shape[1])],
+        "mape_by_horizon": [mape(scaled[:, h]) for h in range(errors.shape[1])],
+        "forecasts": int(valid.sum())
+    }
+
+
+def backtest_series(
+    years: np.ndarray,
+    values: np.ndarray,
+    models: List[str],
+    horizon: int,
+    min_train: int,
+    order: tuple = (1, 1, 1),
+    refit_every: int = 3
+) -> Dict[str, Dict[str, Any]]:
+    """
+    单条序列的扩展窗口回测：训练集从 min_train 个观测起逐年扩展，每个起点预测 1 至 horizon 步。
+
+    所有模型使用相同的起点，误差可以直接比较；集成模型按线上的逆方差规则组合线性与 ARIMA 预测，权重只来自各起点之前的误差。
+    只依赖传入数组，可在子进程中执行。
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    origins = list(range(min_train, n))
+    targets = np.asarray(origins)[:, None] + np.arange(horizon)[None, :]
+    actuals = np.where(targets < n, values[np.minimum(targets, n - 1)], np.nan)
+
+    forecasts: Dict[str, np.ndarray] = {}
+    if "linear" in models or "ensemble" in models:
+        forecasts["linear"] = linear_backtest(years, values, origins, horizon)
+    if "arima" in models or "ensemble" in models:
+        forecasts["arima"] = arima_backtest(values, origins, horizon, order, refit_every)
+    if "ensemble" in models:
+        forecasts["ensemble"] = ensemble_backtest(actuals, targets, origins, [forecasts["linear"], forecasts["arima"]])
+
+    return {
+        model: {
+            **forecast_errors(actuals, forecasts[model]),
+            "origins": len(origins),
+            "failed_origins": int(np.isnan(forecasts[model][:, 0]).sum())
+        }
+        for model in models
+    }
@@ -0,0 +1,94 @@
+from typing import Tuple
+import numpy as np
+
+CORRELATION_METHODS = ("pearson", "spearman")
+
+
+def _pairwise_pearson(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """x 形状 (..., N, K)，按成对完整观测计算 K × K 皮尔逊相关系数及观测数"""
+    mask = ~np.isnan(x)
+    weights = mask.astype(float)
+
+    # 先按列中心化，减少大数值时平方和相减造成的精度损失
+    with np.errstate(invalid="ignore", divide="ignore"):
+        center = np.where(mask, x, 0.0).sum(axis=-2, keepdims=True) / weights.sum(axis=-2, keepdims=True)
+    x0 = np.where(mask, x - np.nan_to_num(center), 0.0)
+
+    weights_t = np.swapaxes(weights, -1, -2)
+    x0_t = np.swapaxes(x0, -1, -2)
+
+    n = weights_t @ weights
+    sum_x = x0_t @ weights
+    sum_y = np.swapaxes(sum_x, -1, -2)
+    sum_xx = np.swapaxes(x0 ** 2, -1, -2) @ weights
+    sum_yy = np.swapaxes(sum_xx, -1, -2)
+    sum_xy = x0_t @ x0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sum_xy - sum_x * sum_y / n
+        var_x = sum_xx - sum_x ** 2 / n
+        var_y = sum_yy - sum_y ** 2 / n
+        corr = cov / np.sqrt(var_x * var_y)
+
+    return np.clip(corr, -1.0, 1.0), n
+
+
+def _pairwise_spearman(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    from scipy import stats
+
+    mask = ~np.isnan(x)
+    if mask.all():
+        return _pairwise_pearson(stats.rankdata(x, axis=-2))
+
+    # 存在缺失值时，秩需要在每一对指标的共同观测上分别计算
+    batch_shape = x.shape[:-2]
+    k = x.shape[-1]
+    flat = x.reshape((-1,) + x.shape[-2:])
+    corr = np.full((len(flat), k, k), np.nan)
+    n = np.zeros((len(flat), k, k))
+
+    for b, matrix in enumerate(flat):
+        present = ~np.isnan(matrix)
+        for i in range(k):
+            for j in range(i, k):
+                rows = present[:, i] & present[:, j]
+                pair = np.column_stack([
+                    stats.rankdata(matrix[rows, i]),
+                    stats.rankdata(matrix[rows, j])
+                ])
+                pair_corr, pair_n = _pairwise_pearson(pair)
+                corr[b, i, j] = corr[b, j, i] = pair_corr[0, 1]
+                n[b, i, j] = n[b, j, i] = pair_n[0, 1]
+
+    return corr.reshape(batch_shape + (k, k)), n.reshape(batch_shape + (k, k))
+
+
+def correlation_matrix(
+    x: np.ndarray,
+    method: str = "pearson"
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    计算相关系数矩阵、双侧 p 值和成对观测数。
+
+    x 形状为 (N, K) 或批量的 (B, N, K)，行是观测（如 城市-年份），列是指标，NaN 为缺失。
+    每一对指标只使用两者都有值的观测（pairwise-complete）。
+    """
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"不支持的相关性方法: {method}")
+
+    # scipy.stats 导入较慢，推迟到首次计算时
+    from scipy import stats
+
+    x = np.asarray(x, dtype=float)
+    corr, n = _pairwise_pearson(x) if method == "pearson" else _pairwise_spearman(x)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dof = n - 2
+        t_stat = corr * np.sqrt(dof / (1 - corr ** 2))
+        p_values = np.where(np.abs(corr) >= 1, 0.0, 2 * stats.t.sf(np.abs(t_stat), dof))
+
+    insufficient = n < 3
+    corr = np.where(insufficient, np.nan, corr)
+    p_values = np.where(insufficient | np.isnan(corr), np.nan, p_values)
+
+    return corr, p_values, n.astype(int)
@@ -0,0 +1,176 @@
+import hashlib
+import warnings
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.utils.trend_engine import fit_trends
+
+# 模型所需的最少有效观测数
+MIN_LINEAR_POINTS = 5
+MIN_ARIMA_POINTS = 10
+
+# 预测行中按精度取整的字段
+PREDICTION_VALUE_FIELDS = ("predicted_value", "confidence_lower", "confidence_upper")
+
+
+def linear_forecasts(
+    years: np.ndarray,
+    values: np.ndarray,
+    prediction_years: int,
+    confidence_level: float = 0.95
+) -> List[Dict[str, Any]]:
+    """
+    批量线性趋势预测。
+
+    values 形状为 (S, T) 或 (T,)，NaN 为缺失；每条序列从自身最后一个有效年份开始外推。
+    有效观测不足两个的序列对应结果中的数值为 NaN，由调用方负责过滤。
+    预测值与区间不取整，返回前由 round_predictions 处理。
+    """
+    years = np.asarray(years)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    mask = ~np.isnan(values)
+
+    fit = fit_trends(years, values)
+
+    last_index = values.shape[1] - 1 - mask[:, ::-1].argmax(axis=1)
+    last_year = years[last_index]
+    pred_years = last_year[:, None] + np.arange(1, prediction_years + 1)[None, :]
+    pred_values = fit.predict(pred_years)
+    lower, upper = fit.prediction_interval(pred_years, confidence_level)
+
+    results = []
+    for s in range(len(values)):
+        results.append({
+            "predictions": [
+                {
+                    "year": int(pred_years[s, h]),
+                    "predicted_value": float(pred_values[s, h]),
+                    "confidence_lower": float(lower[s, h]),
+                    "confidence_upper": float(upper[s, h])
+                }
+                for h in range(prediction_years)
+            ],
+            "accuracy": {
+                "r_squared": round(float(fit.r_squared[s]), 4),
+                "mse": round(float(fit.mse[s]), 4),
+                "mae": round(float(fit.mae[s]), 4)
+            },
+            "training_years": [int(y) for y in years[mask[s]]],
+            "training_values": [round(float(v), 2) for v in values[s, mask[s]]]
+        })
+
+    return results
+
+
+def arima_fit_forecast(
+    years: np.ndarray,
+    values: np.ndarray,
+    prediction_years: int,
+    confidence_level: float = 0.95,
+    order: tuple = (1, 1, 1),
+    params: Optional[List[float]] = None
+) -> Tuple[Dict[str, Any], List[float]]:
+    """
+    ARIMA 预测，同时返回模型参数。
+
+    传入已有参数时不做极大似然估计，只用这些参数对完整序列运行一次卡尔曼滤波，
+    与 statsmodels 的 results.append(new_obs, refit=False) 等价，耗时约为完整拟合的几十分之一。
+    """
+    # statsmodels 导入需要数秒，只在真正拟合时加载
+    from statsmodels.tsa.arima.model import ARIMA
+
+    model = ARIMA(np.asarray(values, dtype=float), order=order)
+    model_fit = model.fit() if params is None else model.filter(np.asarray(params, dtype=float))
+
+    forecast = model_fit.get_forecast(steps=prediction_years)
+    predicted = np.asarray(forecast.predicted_mean)
+    forecast_confint = np.asarray(forecast.conf_int(alpha=1 - confidence_level))
+
+    last_year = int(years[-1])
+
+    result = {
+        "predictions": [
+            {
+                "year": last_year + i + 1,
+                "predicted_value": float(pred),
+                "confidence_lower": float(forecast_confint[i, 0]),
+                "confidence_upper": float(forecast_confint[i, 1])
+            }
+            for i, pred in enumerate(predicted)
+        ],
+        "accuracy": {
+            "aic": round(float(model_fit.aic), 4),
+            "bic": round(float(model_fit.bic), 4)
+        },
+        "training_years": [int(y) for y in years],
+        "training_values": [round(float(v), 2) for v in values]
+    }
+    return result, [float(p) for p in np.asarray(model_fit.params)]
+
+
+def round_predictions(result: Dict[str, Any], digits: int = 2) -> Dict[str, Any]:
+    """
+    预测值与区间取整后的结果副本。
+
+    模型输出与缓存保留完整精度，只在返回给调用方时取整，集成模型用未取整的组成模型预测加权。
+    """
+    if "predictions" not in result:
+        return result
+    return {
+        **result,
+        "predictions": [
+            {k: round(v, digits) if k in PREDICTION_VALUE_FIELDS else v for k, v in row.items()}
+            for row in result["predictions"]
+        ]
+    }
+
+
+def series_hash(years: np.ndarray, values: np.ndarray) -> str:
+    """序列内容的摘要，数据变化后摘要随之改变"""
+    digest = hashlib.sha1(np.asarray(years, dtype=np.int64).tobytes())
+    digest.update(np.asarray(values, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def differencing_order(values: np.ndarray, max_d: int = 2, alpha: float = 0.05) -> int:
+    """
+    用 KPSS 检验确定差分阶数：序列不能拒绝平稳原假设时停止差分。
+
+    不同差分阶数的似然建立在不同数量的观测上，信息准则不可比较，因此 d 先于 (p, q) 单独确定。
+    """
+    from statsmodels.tsa.stattools import kpss
+
+    series = np.asarray(values, dtype=float)
+    for d in range(max_d):
+        if len(series) < 4 or np.ptp(series) == 0:
+            return d
+        with warnings.catch_warnings():
+            # 统计量超出查表范围时 p 值被截断并告警，截断值用于判断已经足够
+            warnings.simplefilter("ignore")
+            p_value = kpss(series, regression="c", nlags="auto")[1]
+        if p_value >= alpha:
+            return d
+        series = np.diff(series)
+    return max_d
+
+
+def arima_order_grid(d: int, max_p: int = 2, max_q: int = 2) -> List[tuple]:
+    """差分阶数固定为 d 时的全部 (p, d, q) 候选"""
+    return [(p, d, q) for p in range(max_p + 1) for q in range(max_q + 1)]
+
+
+def fit_arima_order(values: np.ndarray, order: tuple) -> Optional[Dict[str, Any]]:
+    """拟合一个候选阶数并返回信息准则；拟合失败、未收敛或准则非有限值时返回 None"""
+    from statsmodels.tsa.arima.model import ARIMA
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            model_fit = ARIMA(np.asarray(values, dtype=float), order=order).fit()
+    except Exception:
+        return None
+
+    if not model_fit.mle_retvals.get("converged", True):
+        return None
+    if not (np.isfinite(model_fit.aic) and np.isfinite(model_fit.bic)):
+        return None
+    return {"order": list(order), "aic": float(model_fit.aic), "bic": float(model_fit.bic)}
@@ -0,0 +1,72 @@
+from typing import Dict, Optional, Sequence
+import numpy as np
+from app.utils.trend_engine import fit_trends
+
+SIMULATION_METHODS = ("bootstrap", "parametric")
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def simulate_trend_paths(
+    years: np.ndarray,
+    values: np.ndarray,
+    horizon_years: np.ndarray,
+    paths: int,
+    method: str = "bootstrap",
+    rng: Optional[np.random.Generator] = None
+) -> np.ndarray:
+    """
+    线性趋势模型的随机预测路径，形状 (paths, H)。
+
+    bootstrap：残差重抽样生成 paths 条伪序列并一次性批量重新拟合，再叠加新的重抽样残差，
+    同时反映参数与扰动的不确定性；parametric：按 OLS 估计的抽样分布抽取截距、斜率与误差方差，再叠加正态扰动。
+    """
+    rng = rng or np.random.default_rng()
+    years = np.asarray(years, dtype=float)
+    values = np.asarray(values, dtype=float)
+    horizon_years = np.asarray(horizon_years, dtype=float)
+    n = len(values)
+
+    fit = fit_trends(years, values)
+    sigma = float(fit.sigma[0])
+
+    if method == "bootstrap":
+        # 残差按自由度放大，抵消最小二乘残差偏小的问题
+        residuals = fit.residuals[0] * np.sqrt(n / (n - 2))
+        fitted = fit.predict(years)[0]
+        pseudo = fitted[None, :] + residuals[rng.integers(0, n, size=(paths, n))]
+        refit = fit_trends(years, pseudo)
+        shocks = residuals[rng.integers(0, n, size=(paths, len(horizon_years)))]
+        return refit.predict(horizon_years) + shocks
+
+    # 以 x̄ 为中心时截距与斜率的估计相互独立
+    sigma_draws = sigma * np.sqrt((n - 2) / rng.chisquare(n - 2, size=paths))
+    level = (fit.intercept[0] + fit.slope[0] * fit.x_mean[0]) + rng.standard_normal(paths) * sigma_draws / np.sqrt(n)
+    slope = fit.slope[0] + rng.standard_normal(paths) * sigma_draws / np.sqrt(fit.sxx[0])
+    shocks = rng.standard_normal((paths, len(horizon_years))) * sigma_draws[:, None]
+    return level[:, None] + slope[:, None] * (horizon_years[None, :] - fit.x_mean[0]) + shocks
+
+
+def scenario_fan(
+    base_paths: np.ndarray,
+    growth_factors: Sequence[float],
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    thresholds: Optional[Sequence[float]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    把基准路径按各情景的调整幅度（百分比）缩放，得到 情景 × 路径 × 年份 的数组并汇总。
+
+    所有情景共用同一组随机路径，情景之间的差异只来自调整幅度本身。
+    返回 percentiles (S, K, H)、mean (S, H) 与 threshold_probabilities (S, M, H)，
+    后者为各年份取值不低于阈值的路径比例。
+    """
+    factors = 1 + np.asarray(growth_factors, dtype=float) / 100
+    simulated = base_paths[None, :, :] * factors[:, None, None]
+
+    result = {
+        "percentiles": np.moveaxis(np.percentile(simulated, percentiles, axis=1), 0, 1),
+        "mean": simulated.mean(axis=1)
+    }
+    if thresholds:
+        limits = np.asarray(thresholds, dtype=float)[None, :, None, None]
+        result["threshold_probabilities"] = (simulated[:, None, :, :] >= limits).mean(axis=2)
+    return result
@@ -0,0 +1,124 @@
+from typing import Tuple
+import numpy as np
+
+
+class TrendFit:
+    """一批序列的线性趋势拟合结果，所有属性均为按序列排列的数组"""
+
+    def __init__(
+        self,
+        slope: np.ndarray,
+        intercept: np.ndarray,
+        residuals: np.ndarray,
+        r_squared: np.ndarray,
+        mse: np.ndarray,
+        mae: np.ndarray,
+        n: np.ndarray,
+        x_mean: np.ndarray,
+        sxx: np.ndarray
+    ):
+        self.slope = slope
+        self.intercept = intercept
+        # 残差矩阵 (序列数 × 观测数)，缺失位置为 NaN
+        self.residuals = residuals
+        self.r_squared = r_squared
+        self.mse = mse
+        self.mae = mae
+        self.n = n
+        self.x_mean = x_mean
+        self.sxx = sxx
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # 回归标准误差，自由度为 n - 2
+            self.sigma = np.sqrt(np.nansum(residuals ** 2, axis=1) / (n - 2))
+
+    def __len__(self) -> int:
+        return len(self.slope)
+
+    @staticmethod
+    def _as_grid(x: np.ndarray) -> np.ndarray:
+        # x 可以是所有序列共用的 (H,)，也可以是逐序列的 (S, H)
+        x = np.asarray(x, dtype=float)
+        return x if x.ndim == 2 else x[None, :]
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        return self.intercept[:, None] + self.slope[:, None] * self._as_grid(x)
+
+    def prediction_interval(
+        self,
+        x: np.ndarray,
+        confidence_level: float = 0.95
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """OLS 预测区间：ŷ ± t(α/2, n-2) · s · sqrt(1 + 1/n + (x0 - x̄)² / Sxx)"""
+        # scipy.stats 导入较慢，推迟到首次计算区间时
+        from scipy import stats
+
+        x = self._as_grid(x)
+        predicted = self.predict(x)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dof = np.where(self.n > 2, self.n - 2, np.nan)
+            t_score = stats.t.ppf(1 - (1 - confidence_level) / 2, dof)
+            leverage = (
+                1
+                + 1 / self.n[:, None]
+                + (x - self.x_mean[:, None]) ** 2 / self.sxx[:, None]
+            )
+            margin = (t_score * self.sigma)[:, None] * np.sqrt(leverage)
+
+        return predicted - margin, predicted + margin
+
+
+def fit_trends(x: np.ndarray, y: np.ndarray) -> TrendFit:
+    """
+    对多条序列同时做闭式最小二乘拟合。
+
+    x 为观测点（年份），形状 (T,)；y 形状为 (S, T) 或 (T,)，NaN 视为缺失并被屏蔽。
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    mask = ~np.isnan(y)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = mask.sum(axis=1)
+        x_mean = np.where(mask, x[None, :], 0.0).sum(axis=1) / n
+        y_mean = np.where(mask, y, 0.0).sum(axis=1) / n
+
+        dx = np.where(mask, x[None, :] - x_mean[:, None], 0.0)
+        dy = np.where(mask, y - y_mean[:, None], 0.0)
+
+        sxx = (dx ** 2).sum(axis=1)
+        sxy = (dx * dy).sum(axis=1)
+        sst = (dy ** 2).sum(axis=1)
+
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+
+        fitted = intercept[:, None] + slope[:, None] * x[None, :]
+        residuals = np.where(mask, y - fitted, np.nan)
+        sse = np.nansum(residuals ** 2, axis=1)
+
+        # 与 sklearn.metrics.r2_score 一致：常数序列完全拟合时为1，否则为0
+        r_squared = np.where(sst > 0, 1 - sse / sst, np.where(sse == 0, 1.0, 0.0))
+        r_squared = np.where(n >= 2, r_squared, np.nan)
+        mse = sse / n
+        mae = np.nansum(np.abs(residuals), axis=1) / n
+
+    return TrendFit(slope, intercept, residuals, r_squared, mse, mae, n, x_mean, sxx)
+
+
+def first_last_valid(y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """每条序列第一个与最后一个非缺失值，没有有效值时为 NaN"""
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    if y.shape[1] == 0:
+        empty = np.full(len(y), np.nan)
+        return empty, empty.copy()
+
+    mask = ~np.isnan(y)
+    has_value = mask.any(axis=1)
+    rows = np.arange(len(y))
+
+    first = y[rows, mask.argmax(axis=1)]
+    last = y[rows, y.shape[1] - 1 - mask[:, ::-1].argmax(axis=1)]
+
+    return np.where(has_value, first, np.nan), np.where(has_value, last, np.nan)
@@ -0,0 +1,104 @@
+"""
+序列化基准：比较 annual_data 行式 JSON 与列式 / 矩阵 orjson 响应的体积和序列化耗时。
+
+用法（在 backend 目录下）: python -m benchmarks.serialization --cities 200 --indicators 50 --years 40
+"""
+import argparse
+import json
+import statistics
+import time
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+
+def synthetic_panel(cities: int, indicators: int, years: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    values = np.round(rng.lognormal(6, 1.5, size=(cities, indicators, years)), 4)
+    values[rng.random(values.shape) < 0.05] = np.nan
+    return np.arange(2000, 2000 + years), values
+
+
+def row_payload(years, values):
+    """当前 /data/annual-data 的行式结构"""
+    rows = []
+    data_id = 0
+    for c in range(values.shape[0]):
+        for i in range(values.shape[1]):
+            for y, year in enumerate(years):
+                data_id += 1
+                v = values[c, i, y]
+                rows.append({
+                    "data_id": data_id,
+                    "city_id": c + 1,
+                    "indicator_id": i + 1,
+                    "year": int(year),
+                    "value": None if np.isnan(v) else float(v),
+                    "data_quality": "normal"
+                })
+    return rows
+
+
+def columnar_payload(rows):
+    return {key: [row[key] for row in rows] for key in rows[0]}
+
+
+def matrix_payload(years, values):
+    return {
+        "city_ids": list(range(1, values.shape[0] + 1)),
+        "indicator_ids": list(range(1, values.shape[1] + 1)),
+        "years": years,
+        "values": values
+    }
+
+
+def measure(render, repeat: int):
+    timings = []
+    body = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = render()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"bytes": len(body), "median_ms": round(statistics.median(timings), 3)}
+
+
+def run(cities: int, indicators: int, years: int, repeat: int):
+    panel_years, values = synthetic_panel(cities, indicators, years)
+    rows = row_payload(panel_years, values)
+    columns = columnar_payload(rows)
+    matrix = matrix_payload(panel_years, values)
+
+    cases = {
+        # 现状：FastAPI 默认路径，先 jsonable_encoder 再用标准库 json 序列化
+        "rows_stdlib_json": lambda: JSONResponse(jsonable_encoder(rows)).body,
+        "rows_orjson": lambda: ORJSONResponse(rows).body,
+        "columnar_orjson": lambda: ORJSONResponse(columns).body,
+        "matrix_orjson": lambda: ORJSONResponse(matrix).body,
+    }
+    return {
+        "scale": {"cities": cities, "indicators": indicators, "years": years, "rows": len(rows)},
+        "results": {name: measure(render, repeat) for name, render in cases.items()}
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="序列化格式基准")
+    parser.add_argument("--cities", type=int, default=11)
+    parser.add_argument("--indicators", type=int, default=8)
+    parser.add_argument("--years", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="结果写入的 JSON 文件")
+    args = parser.parse_args()
+
+    report = run(args.cities, args.indicators, args.years, args.repeat)
+    baseline = report["results"]["rows_stdlib_json"]
+    print(f"行数: {report['scale']['rows']}")
+    for name, result in report["results"].items():
+        print(
+            f"{name:<18} {result['bytes']:>12,} B  {result['median_ms']:>10.3f} ms  "
+            f"体积 {result['bytes'] / baseline['bytes']:.2f}x  耗时 {result['median_ms'] / baseline['median_ms']:.2f}x"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,99 @@
+"""
+启动耗时基准：用 python -X importtime 统计导入 app.main 的耗时，并检查重型依赖是否被提前导入。
+
+用法（在 backend 目录下）: python -m benchmarks.startup --repeat 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+# 这些包应当在首次使用时才导入，出现在启动导入中即视为回退
+LAZY_PACKAGES = ("scipy", "statsmodels", "pandas", "celery", "redis")
+
+STARTUP_SCRIPT = (
+    "from fastapi.testclient import TestClient\n"
+    "import app.main\n"
+    "assert TestClient(app.main.app).get('/health').status_code == 200\n"
+)
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """解析 -X importtime 输出，返回 模块 -> 累计耗时(微秒)"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|")
+        if not cumulative_us.strip().isdigit():
+            continue
+        cumulative[module.strip()] = int(cumulative_us)
+    return cumulative
+
+
+def run_once(env: Dict[str, str]) -> Dict[str, object]:
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+        env=env, capture_output=True, text=True, check=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    cumulative = parse_importtime(process.stderr)
+    top_level: Dict[str, int] = defaultdict(int)
+    for module, us in cumulative.items():
+        if "." not in module:
+            top_level[module] += us
+
+    return {
+        "wall_ms": wall_ms,
+        "app_main_ms": cumulative.get("app.main", 0) / 1000,
+        "top_level": dict(top_level),
+        "eager_heavy": sorted(p for p in LAZY_PACKAGES if p in cumulative)
+    }
+
+
+def run(repeat: int) -> Dict[str, object]:
+    env = dict(os.environ)
+    # 避免读写开发数据库；预热在后台线程进行，关闭以免干扰计时
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}")
+    env["WARMUP_ON_STARTUP"] = "false"
+    env["CACHE_BACKEND"] = "memory"
+
+    runs = [run_once(env) for _ in range(repeat)]
+    slowest: List[tuple] = sorted(runs[-1]["top_level"].items(), key=lambda item: -item[1])[:10]
+
+    return {
+        "python": sys.version.split()[0],
+        "repeat": repeat,
+        "wall_ms_median": round(statistics.median(r["wall_ms"] for r in runs), 1),
+        "import_app_main_ms_median": round(statistics.median(r["app_main_ms"] for r in runs), 1),
+        "eager_heavy_packages": runs[-1]["eager_heavy"],
+        "slowest_top_level_ms": {module: round(us / 1000, 1) for module, us in slowest}
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API 启动耗时基准")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="结果写入的 JSON 文件")
+    parser.add_argument("--max-import-ms", type=float, help="导入 app.main 的耗时上限，超出时返回非零退出码")
+    args = parser.parse_args()
+
+    report = run(args.repeat)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    failed = bool(report["eager_heavy_packages"])
+    if args.max_import_ms is not None and report["import_app_main_ms_median"] > args.max_import_ms:
+        failed = True
+    sys.exit(1 if failed else 0)
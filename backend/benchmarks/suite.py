@@ -0,0 +1,340 @@
+"""
+接口基准套件：在合成面板上通过 ASGI 进程内调用 data / prediction / jobs 路由，记录延迟分位数、SQL 查询数与峰值内存。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.suite --scale small --output baseline.json
+    python -m benchmarks.suite --scale small --compare baseline.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from typing import Any, Callable, Dict, List, Optional
+
+SCALES = {
+    "small": {"cities": 11, "indicators": 8, "years": 25},
+    "medium": {"cities": 200, "indicators": 50, "years": 40},
+    "large": {"cities": 2000, "indicators": 200, "years": 60},
+}
+
+P = "/api/v1"
+
+# 写接口产生的数据带此标记，运行结束后删除，使数据库可在多次运行间复用
+WRITE_TAG = "benchmark"
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def build_cases(scale: Dict[str, int]) -> List[Dict[str, Any]]:
+    """每个用例为一次 HTTP 调用；写操作放在最后，避免影响读接口的数据"""
+    cities = list(range(1, scale["cities"] + 1))
+    indicators = list(range(1, scale["indicators"] + 1))
+    last_year = 2024
+    first_year = last_year - scale["years"] + 1
+    some_cities = cities[:10]
+    some_indicators = indicators[:8]
+
+    cases = [
+        ("cities", "GET", "/data/cities", {}),
+        ("city", "GET", "/data/cities/1", {}),
+        ("indicators", "GET", "/data/indicators", {}),
+        ("indicator", "GET", "/data/indicators/1", {}),
+        ("timeseries", "GET", "/data/timeseries", {"params": {"city_id": 1, "indicator_id": 1}}),
+        ("timeseries_columnar", "GET", "/data/timeseries", {
+            "params": {"city_id": 1, "indicator_id": 1, "format": "columnar"}
+        }),
+        ("series_matrix", "POST", "/data/series-matrix", {
+            "json": {"cities": cities, "indicators": some_indicators}
+        }),
+        ("annual_data_city", "GET", "/data/annual-data", {"params": {"city_id": 1}}),
+        ("annual_data_year", "GET", "/data/annual-data", {"params": {"year": last_year}}),
+        ("annual_data_year_columnar", "GET", "/data/annual-data", {
+            "params": {"year": last_year, "format": "columnar"}
+        }),
+        ("regional_summary", "GET", f"/data/regional-summary/{last_year}", {}),
+        ("regional_summaries", "GET", "/data/regional-summary", {}),
+        ("ranking", "GET", "/data/ranking", {"params": {"indicator_id": 1, "year": last_year}}),
+        ("ranking_history", "GET", "/data/ranking-history", {
+            "params": {"indicator_id": 1, "start_year": first_year, "end_year": last_year}
+        }),
+        ("compare", "POST", "/data/compare", {
+            "json": {"cities": some_cities, "indicators": some_indicators}
+        }),
+        ("correlation", "POST", "/data/correlation", {
+            "json": {"city_ids": cities, "indicator_ids": some_indicators}
+        }),
+        ("correlation_matrix", "POST", "/data/correlation/matrix", {
+            "json": {"city_ids": cities, "indicator_ids": indicators}
+        }),
+        ("trend", "POST", "/data/trend-analysis", {"json": {"city_id": 1, "indicator_id": 1}}),
+        ("trend_bulk", "POST", "/data/trend-analysis/bulk", {"json": {}}),
+        ("growth_rate", "GET", f"/data/growth-rate/1/1/{last_year}", {}),
+        ("predict_linear", "POST", "/prediction/predict/linear", {"json": {"city_id": 1, "indicator_id": 1}}),
+        ("predict_arima", "POST", "/prediction/predict/arima", {"json": {"city_id": 1, "indicator_id": 1}}),
+        ("predict_ensemble", "POST", "/prediction/predict/ensemble", {"json": {"city_id": 1, "indicator_id": 1}}),
+        ("predict_simulation", "POST", "/prediction/predict/simulation", {
+            "params": {"city_id": 1, "indicator_id": 1}, "json": {"乐观": 10, "悲观": -5}
+        }),
+        ("predict_bulk_linear", "POST", "/prediction/predict/bulk", {
+            "json": {"city_ids": cities[:50], "indicator_ids": some_indicators, "model_types": ["linear"]}
+        }),
+        ("predict_bulk_arima", "POST", "/prediction/predict/bulk", {
+            "json": {"city_ids": cities[:3], "indicator_ids": indicators[:2], "model_types": ["arima"]}
+        }),
+        ("compute_status", "GET", "/prediction/compute/status", {}),
+        ("forecast_cache_stats", "GET", "/prediction/cache/stats", {}),
+        ("export_csv", "GET", "/data/export", {"params": {"format": "csv"}}),
+        ("export_csv_wide", "GET", "/data/export", {"params": {"format": "csv", "layout": "wide"}}),
+        ("export_ndjson", "GET", "/data/export", {"params": {"format": "ndjson", "indicator_id": 1}}),
+        ("export_parquet", "GET", "/data/export", {"params": {"format": "parquet", "indicator_id": 1}}),
+        ("job_submit", "POST", "/jobs", {
+            "json": {"job_type": "linear_prediction", "params": {"city_id": 1, "indicator_id": 1}}
+        }),
+    ]
+
+    result = [{"name": n, "method": m, "path": P + p, "kwargs": k} for n, m, p, k in cases]
+
+    # 任务状态与结果：先提交一个任务并等待完成，路径中的 job_id 由 setup 提供
+    for name, path in (("job_status", "/jobs/{job_id}"), ("job_result", "/jobs/{job_id}/result")):
+        result.append({"name": name, "method": "GET", "path": P + path, "kwargs": {}, "setup": finished_job})
+
+    # 回测与 ARIMA 重新拟合写入 prediction_models；首次调用完整计算，之后的迭代沿用已保存的结果
+    result.append({
+        "name": "backtest_run", "method": "POST", "path": P + "/prediction/backtest",
+        "kwargs": {"json": {"city_ids": cities[:3], "indicator_ids": indicators[:2]}}
+    })
+    result.append({"name": "backtest_leaderboard", "method": "GET", "path": P + "/prediction/backtest", "kwargs": {}})
+    result.append({
+        "name": "backtest_leaderboard_series", "method": "GET", "path": P + "/prediction/backtest",
+        "kwargs": {"params": {"city_id": 1, "indicator_id": 1}}
+    })
+    result.append({
+        "name": "arima_refit", "method": "POST", "path": P + "/prediction/arima/refit",
+        "kwargs": {"json": {"city_ids": cities[:3], "indicator_ids": indicators[:2]}}
+    })
+
+    # 写操作：每次迭代写入不同的键
+    result.append({
+        "name": "create_annual_data", "method": "POST", "path": P + "/data/annual-data",
+        "kwargs": lambda i: {"json": {
+            "city_id": 1, "indicator_id": 1, "year": last_year + 1 + i, "value": 1.0, "data_source": WRITE_TAG
+        }}
+    })
+    result.append({
+        "name": "create_city", "method": "POST", "path": P + "/data/cities",
+        "kwargs": lambda i: {"json": {
+            "city_name": f"基准城市{i}", "city_code": f"{WRITE_TAG}-{i}", "city_type": "mainland", "region": "珠三角"
+        }}
+    })
+    return result
+
+
+def finished_job(client, timeout: float = 60.0) -> Dict[str, Any]:
+    """提交一个线性预测任务并等待其完成，返回路径参数"""
+    job = client.post(P + "/jobs", json={
+        "job_type": "linear_prediction", "params": {"city_id": 1, "indicator_id": 1}
+    }).json()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.get(f"{P}/jobs/{job['job_id']}").json()["status"] not in ("pending", "running"):
+            break
+        time.sleep(0.05)
+    return {"job_id": job["job_id"]}
+
+
+def run_case(client, case: Dict[str, Any], iterations: int, query_counter: Dict[str, int]) -> Dict[str, Any]:
+    kwargs_for: Callable[[int], Dict[str, Any]] = (
+        case["kwargs"] if callable(case["kwargs"]) else (lambda i: case["kwargs"])
+    )
+    path = case["path"].format(**case["setup"](client)) if "setup" in case else case["path"]
+
+    def call(i: int):
+        return client.request(case["method"], path, **kwargs_for(i))
+
+    # 单独一次调用测量峰值内存，不计入延迟
+    tracemalloc.start()
+    first_started = time.perf_counter()
+    response = call(0)
+    first_ms = (time.perf_counter() - first_started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies, queries, statuses = [], [], {response.status_code}
+    for i in range(1, iterations + 1):
+        query_counter["count"] = 0
+        started = time.perf_counter()
+        response = call(i)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(query_counter["count"])
+        statuses.add(response.status_code)
+
+    return {
+        "iterations": iterations,
+        "status_codes": sorted(statuses),
+        "first_ms": round(first_ms, 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(max(latencies), 3),
+        "queries_per_request": round(statistics.mean(queries), 2),
+        "response_bytes": len(response.content),
+        "peak_memory_kb": round(peak / 1024, 1)
+    }
+
+
+def remove_written_rows(engine) -> None:
+    from sqlalchemy import delete
+    from app.models.database import City, AnnualData, Job, PredictionModel
+    from app.services.prediction_service import BACKTEST_MODEL_TYPE
+    from app.services.summary_service import RegionalSummaryService
+
+    with engine.begin() as conn:
+        conn.execute(delete(AnnualData).where(AnnualData.data_source == WRITE_TAG))
+        conn.execute(delete(City).where(City.city_code.like(f"{WRITE_TAG}-%")))
+        # 基准数据库中的回测结果与任务都由本套件产生，删除后下次运行的首次调用仍是完整计算
+        conn.execute(delete(PredictionModel).where(PredictionModel.model_type == BACKTEST_MODEL_TYPE))
+        conn.execute(delete(Job))
+        RegionalSummaryService.rebuild(conn)
+
+
+def run_suite(scale: Dict[str, int], iterations: int, database_url: str, regenerate: bool) -> Dict[str, Any]:
+    from benchmarks.synthetic import generate_panel
+
+    database_path = database_url.replace("sqlite:///", "", 1) if database_url.startswith("sqlite:///") else None
+    generation_seconds = None
+    if regenerate or database_path is None or not os.path.exists(database_path):
+        if database_path and os.path.exists(database_path):
+            os.remove(database_path)
+        started = time.perf_counter()
+        generated = generate_panel(database_url, **scale)
+        generation_seconds = round(time.perf_counter() - started, 2)
+    else:
+        generated = dict(scale)
+
+    from sqlalchemy import event
+    from fastapi.testclient import TestClient
+    from app.db.session import engine
+    from app.main import app
+
+    query_counter = {"count": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(*_):
+        query_counter["count"] += 1
+
+    client = TestClient(app)
+    results = {}
+    for case in build_cases(scale):
+        results[case["name"]] = run_case(client, case, iterations, query_counter)
+        r = results[case["name"]]
+        print(
+            f"{case['name']:<28} p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms  "
+            f"查询 {r['queries_per_request']:>6.1f}  内存 {r['peak_memory_kb']:>10.1f} KB  {r['status_codes']}",
+            flush=True
+        )
+
+    remove_written_rows(engine)
+
+    return {
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "scale": {**scale, "annual_data": generated.get("annual_data")},
+        "generation_seconds": generation_seconds,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "cases": results
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """与基线对比，p50/p95 变慢超过阈值或每请求查询数增加即视为回退"""
+    regressions = []
+    for name, current in report["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if previous is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if previous[metric] > 0 and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append(
+                    f"{name}: {metric} {previous[metric]} -> {current[metric]} "
+                    f"(+{(current[metric] / previous[metric] - 1) * 100:.0f}%)"
+                )
+        if current["queries_per_request"] > previous["queries_per_request"]:
+            regressions.append(
+                f"{name}: 查询数 {previous['queries_per_request']} -> {current['queries_per_request']}"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="接口基准套件")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--cities", type=int)
+    parser.add_argument("--indicators", type=int)
+    parser.add_argument("--years", type=int)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--database-url", help="默认在临时目录生成 SQLite 数据库")
+    parser.add_argument("--regenerate", action="store_true", help="数据库已存在时重新生成")
+    parser.add_argument("--with-cache", action="store_true", help="保留结果缓存与预测缓存（默认关闭以测量计算本身）")
+    parser.add_argument("--output", help="结果写入的 JSON 文件")
+    parser.add_argument("--compare", help="作为基线的结果 JSON 文件")
+    parser.add_argument("--threshold", type=float, default=0.25, help="判定回退的相对阈值")
+    args = parser.parse_args(argv)
+
+    scale = dict(SCALES[args.scale])
+    for key in ("cities", "indicators", "years"):
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+
+    database_url = args.database_url or "sqlite:///" + os.path.join(
+        tempfile.gettempdir(), f"gba_bench_{scale['cities']}x{scale['indicators']}x{scale['years']}.db"
+    )
+
+    # 模型拟合的收敛告警会淹没结果输出
+    warnings.simplefilter("ignore")
+
+    # 配置在导入 app 之前通过环境变量生效
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["WARMUP_ON_STARTUP"] = "false"
+    os.environ.setdefault("COMPUTE_POOL_WORKERS", "0")
+    if not args.with_cache:
+        os.environ["CACHE_BACKEND"] = "none"
+        os.environ["FORECAST_CACHE_SIZE"] = "0"
+
+    report = run_suite(scale, args.iterations, database_url, args.regenerate)
+    report["settings"] = {"iterations": args.iterations, "with_cache": args.with_cache}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print("\n发现性能回退:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\n未发现性能回退")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+# 配置在导入 app 之前通过环境变量生效：独立的 SQLite 库、进程内缓存、不启用进程池，
+# 数据版本每次读取都查询数据库，以模拟其他进程的写入
+_DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix="gba-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DATABASE_PATH}"
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["COMPUTE_POOL_WORKERS"] = "0"
+os.environ["WARMUP_ON_STARTUP"] = "false"
+os.environ["JOB_BACKEND"] = "local"
+os.environ["DATA_VERSION_CHECK_INTERVAL"] = "0"
+
+import pytest
+
+# 合成面板的规模：城市 × 指标 × 年份
+PANEL = {"cities": 4, "indicators": 3, "years": 20}
+
+
+@pytest.fixture(scope="session", autouse=True)
+def panel():
+    from benchmarks.synthetic import generate_panel
+
+    return generate_panel(os.environ["DATABASE_URL"], **PANEL)
+
+
+@pytest.fixture
+def db():
+    from app.db.session import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from app.utils.backtesting import arima_backtest, ensemble_backtest, linear_backtest
+
+YEARS = np.arange(2000, 2020, dtype=float)
+VALUES = 100 + 3 * np.arange(20) + np.random.default_rng(7).normal(0, 2, 20)
+ORIGINS = list(range(8, 20))
+HORIZON = 3
+
+
+def _perturbed(k):
+    """从第 k 个起点开始的观测全部改写，该起点及之前的预测不应受影响。"""
+    values = VALUES.copy()
+    values[ORIGINS[k]:] += 1000.0
+    return values
+
+
+def _ensemble(values):
+    n = len(values)
+    targets = np.asarray(ORIGINS)[:, None] + np.arange(HORIZON)[None, :]
+    actuals = np.where(targets < n, values[np.minimum(targets, n - 1)], np.nan)
+    components = [
+        linear_backtest(YEARS, values, ORIGINS, HORIZON),
+        arima_backtest(values, ORIGINS, HORIZON)
+    ]
+    return ensemble_backtest(actuals, targets, ORIGINS, components)
+
+
+@pytest.mark.parametrize("k", [0, 4, 9])
+def test_linear_backtest_has_no_lookahead(k):
+    base = linear_backtest(YEARS, VALUES, ORIGINS, HORIZON)
+    moved = linear_backtest(YEARS, _perturbed(k), ORIGINS, HORIZON)
+
+    np.testing.assert_array_equal(moved[:k + 1], base[:k + 1])
+    assert not np.allclose(moved[k + 1], base[k + 1])
+
+
+@pytest.mark.parametrize("k", [0, 4, 9])
+def test_arima_backtest_has_no_lookahead(k):
+    base = arima_backtest(VALUES, ORIGINS, HORIZON)
+    moved = arima_backtest(_perturbed(k), ORIGINS, HORIZON)
+
+    np.testing.assert_array_equal(moved[:k + 1], base[:k + 1])
+
+
+@pytest.mark.parametrize("k", [2, 6, 9])
+def test_ensemble_weights_have_no_lookahead(k):
+    base = _ensemble(VALUES)
+    moved = _ensemble(_perturbed(k))
+
+    np.testing.assert_array_equal(moved[:k + 1], base[:k + 1])
@@ -0,0 +1,59 @@
+import math
+from datetime import datetime
+from decimal import Decimal
+import numpy as np
+from sqlalchemy import update
+from app.core import cache
+from app.models.database import DataVersion
+from app.models.schemas import AnnualDataCreate
+from app.services.data_service import DataService
+
+
+def namespace_stats(namespace):
+    return dict(cache.stats()["namespaces"][namespace])
+
+
+def test_codec_round_trip():
+    value = {
+        "tuple": (1, 2.5, float("nan")),
+        2020: [{"decimal": Decimal("1.5000"), "at": datetime(2024, 1, 2, 3, 4)}],
+        "matrix": np.array([[1.0, np.nan], [3.0, 4.0]]),
+        "scalar": np.float64(2.0),
+        cache.TYPE_TAG: "not a tag"
+    }
+    decoded = cache.loads(cache.dumps(value))
+
+    assert isinstance(decoded["tuple"], tuple) and math.isnan(decoded["tuple"][2])
+    assert decoded[2020][0] == {"decimal": Decimal("1.5000"), "at": datetime(2024, 1, 2, 3, 4)}
+    np.testing.assert_array_equal(decoded["matrix"], value["matrix"])
+    assert type(decoded["scalar"]) is float
+    assert decoded[cache.TYPE_TAG] == "not a tag"
+
+
+def test_write_through_service_invalidates(db):
+    first = DataService.get_annual_data(db, city_id=1, indicator_id=1)
+    before = namespace_stats("query")
+    assert len(DataService.get_annual_data(db, city_id=1, indicator_id=1)) == len(first)
+    assert namespace_stats("query")["hits"] == before["hits"] + 1
+
+    DataService.create_annual_data(db, AnnualDataCreate(city_id=1, indicator_id=1, year=2051, value=1.0))
+
+    before = namespace_stats("query")
+    after_write = DataService.get_annual_data(db, city_id=1, indicator_id=1)
+    assert namespace_stats("query")["misses"] == before["misses"] + 1
+    assert [row.year for row in after_write][-1] == 2051
+
+
+def test_version_bump_from_another_process_misses(db):
+    DataService.get_ranking_history(db, 1, 2010, 2020)
+    before = namespace_stats("query")
+    DataService.get_ranking_history(db, 1, 2010, 2020)
+    assert namespace_stats("query")["hits"] == before["hits"] + 1
+
+    # 其他进程的写入只体现为数据库中的版本号变化
+    db.execute(update(DataVersion).where(DataVersion.name == "annual_data").values(version=DataVersion.version + 1))
+    db.commit()
+
+    before = namespace_stats("query")
+    DataService.get_ranking_history(db, 1, 2010, 2020)
+    assert namespace_stats("query")["misses"] == before["misses"] + 1
@@ -0,0 +1,28 @@
+from app.models.schemas import AnnualDataCreate
+from app.services.data_service import DataService
+from app.services.forecast_cache import forecast_cache
+from app.services.prediction_service import PredictionService
+
+
+def test_forecast_is_reused_until_the_series_changes(db):
+    first = PredictionService.bulk_prediction(db, [2], [2], ["linear"])
+    again = PredictionService.bulk_prediction(db, [2], [2], ["linear"])
+    assert first["summary"]["cache_hits"] == 0
+    assert again["summary"]["cache_hits"] == 1
+    assert again["results"] == first["results"]
+
+    last_year = first["results"][0]["training_years"][-1]
+    DataService.create_annual_data(db, AnnualDataCreate(city_id=2, indicator_id=2, year=last_year + 1, value=1.0))
+
+    refreshed = PredictionService.bulk_prediction(db, [2], [2], ["linear"])
+    assert refreshed["summary"]["cache_hits"] == 0
+    assert refreshed["results"][0]["training_years"][-1] == last_year + 1
+
+
+def test_other_series_keep_their_cached_forecasts(db):
+    PredictionService.bulk_prediction(db, [3], [1, 3], ["linear"])
+    DataService.create_annual_data(db, AnnualDataCreate(city_id=3, indicator_id=1, year=2052, value=1.0))
+
+    result = PredictionService.bulk_prediction(db, [3], [1, 3], ["linear"])
+    assert result["summary"]["cache_hits"] == 1
+    assert forecast_cache.stats()["size"] >= 2
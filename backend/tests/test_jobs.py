@@ -0,0 +1,106 @@
+import socket
+import subprocess
+import sys
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import get_settings
+from app.models.database import Job
+from app.services import job_service
+from app.services.job_service import JobService, _owner
+
+settings = get_settings()
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """以计数任务替换任务表，分发只记录不执行"""
+    executed, dispatched = [], []
+    lock = threading.Lock()
+
+    def count(db, label="job"):
+        with lock:
+            executed.append(label)
+        return {"label": label}
+
+    monkeypatch.setitem(job_service.JOB_HANDLERS, "count", count)
+    monkeypatch.setattr(JobService, "_dispatch", staticmethod(dispatched.append))
+    return {"executed": executed, "dispatched": dispatched}
+
+
+def _job(db, status="pending", owner=None, heartbeat_at=None):
+    job = Job(
+        job_id=uuid.uuid4().hex, job_type="count", params={"label": "recovered"},
+        status=status, progress=0, owner=owner, heartbeat_at=heartbeat_at
+    )
+    db.add(job)
+    db.commit()
+    return job.job_id
+
+
+def _status(db, job_id):
+    db.expire_all()
+    return db.query(Job).filter(Job.job_id == job_id).one().status
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_claim_succeeds_once(db, calls):
+    job_id = JobService.submit_job(db, "count", {"label": "a"})["job"].job_id
+
+    assert calls["dispatched"] == [job_id]
+    assert JobService.claim_job(db, job_id, "worker-1") is True
+    assert JobService.claim_job(db, job_id, "worker-2") is False
+    assert db.query(Job.owner).filter(Job.job_id == job_id).scalar() == "worker-1"
+
+
+def test_concurrent_runs_execute_the_handler_once(db, calls):
+    job_id = JobService.submit_job(db, "count", {"label": "once"})["job"].job_id
+
+    threads = [threading.Thread(target=JobService.run_job, args=(job_id,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls["executed"] == ["once"]
+    assert _status(db, job_id) == "succeeded"
+    assert JobService.get_result(db, job_id) == {"result": {"label": "once"}}
+
+
+def test_recovery_fails_only_abandoned_jobs(db, calls):
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.JOB_STALE_AFTER + 1)
+    host = socket.gethostname()
+
+    live = _job(db, "running", _owner(), now)
+    dead_pid = _job(db, "running", f"{host}:{_dead_pid()}", now)
+    live_pid_stale = _job(db, "running", _owner(), stale)
+    remote_fresh = _job(db, "running", "other-host:1", now)
+    remote_stale = _job(db, "running", "other-host:1", stale)
+    no_heartbeat = _job(db, "running", "other-host:1", None)
+    pending = _job(db)
+
+    JobService.recover_local_jobs()
+
+    assert _status(db, live) == "running"
+    assert _status(db, remote_fresh) == "running"
+    for job_id in (dead_pid, live_pid_stale, remote_stale, no_heartbeat):
+        assert _status(db, job_id) == "failed"
+    assert pending in calls["dispatched"]
+    assert _status(db, pending) == "pending"
+
+    # 多个 worker 同时恢复时同一任务会被分发多次，只执行一次
+    JobService.recover_local_jobs()
+    assert calls["dispatched"].count(pending) == 2
+    for _ in range(2):
+        JobService.run_job(pending)
+    assert calls["executed"] == ["recovered"]
+    assert _status(db, pending) == "succeeded"
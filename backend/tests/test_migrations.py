@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+
+from app.db.migrations import MIGRATIONS, MIGRATIONS_TABLE, DuplicateRowsError, _dedupe, run_migrations
+from app.models.database import Base
+
+ROWS = [
+    # data_id, city_id, indicator_id, year, value
+    (1, 1, 1, 2020, 10.0),
+    (2, 1, 1, 2020, 11.0),
+    (3, 1, 1, 2020, 12.0),
+    (4, 1, 1, 2021, 13.0),
+    (5, 1, 2, 2020, 20.0),
+    (6, 1, 2, 2020, 21.0),
+]
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    """唯一索引尚未建立、已经写入重复数据的旧库"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX uq_annual_data_city_indicator_year"))
+        conn.execute(text(
+            "INSERT INTO cities (city_id, city_name, city_code, city_type, region) "
+            "VALUES (1, '测试市', 'T01', '地级市', '华东')"
+        ))
+        conn.execute(text(
+            "INSERT INTO indicators (indicator_id, indicator_name, indicator_code) "
+            "VALUES (1, '指标一', 'I1'), (2, '指标二', 'I2')"
+        ))
+        for data_id, city_id, indicator_id, year, value in ROWS:
+            conn.execute(text(
+                "INSERT INTO annual_data (data_id, city_id, indicator_id, year, value) "
+                "VALUES (:data_id, :city_id, :indicator_id, :year, :value)"
+            ), {"data_id": data_id, "city_id": city_id, "indicator_id": indicator_id, "year": year, "value": value})
+    yield engine
+    engine.dispose()
+
+
+def _annual_rows(engine):
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT data_id, city_id, indicator_id, year, value FROM annual_data ORDER BY data_id"
+        )).all()
+
+
+def _applied(engine):
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE}"))}
+
+
+def test_startup_refuses_duplicates_without_deleting(legacy_engine):
+    with pytest.raises(DuplicateRowsError) as excinfo:
+        run_migrations(legacy_engine)
+
+    assert excinfo.value.table == "annual_data"
+    assert excinfo.value.count == 3
+    assert len(_annual_rows(legacy_engine)) == len(ROWS)
+    assert _applied(legacy_engine) == set()
+
+
+def test_dedupe_keeps_latest_row_and_is_idempotent(legacy_engine):
+    applied = run_migrations(legacy_engine, dedupe=True)
+
+    assert applied == [version for version, _ in MIGRATIONS]
+    assert [row[0] for row in _annual_rows(legacy_engine)] == [3, 4, 6]
+
+    rows = _annual_rows(legacy_engine)
+    assert run_migrations(legacy_engine, dedupe=True) == []
+    assert run_migrations(legacy_engine) == []
+    assert _annual_rows(legacy_engine) == rows
+
+    with pytest.raises(IntegrityError):
+        with legacy_engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO annual_data (city_id, indicator_id, year, value) VALUES (1, 1, 2020, 1.0)"
+            ))
+
+
+def test_dedupe_ignores_rows_with_null_keys(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'nulls.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (item_id INTEGER PRIMARY KEY, owner_id INTEGER, code VARCHAR(10))"))
+        conn.execute(text(
+            "INSERT INTO items (item_id, owner_id, code) VALUES "
+            "(1, NULL, 'a'), (2, NULL, 'a'), (3, 1, 'a'), (4, 1, 'a')"
+        ))
+        removed = _dedupe(conn, "items", ["owner_id", "code"], "item_id")
+        remaining = [row[0] for row in conn.execute(text("SELECT item_id FROM items ORDER BY item_id"))]
+
+    assert removed == 1
+    assert remaining == [1, 2, 4]
+    engine.dispose()
@@ -0,0 +1,29 @@
+import numpy as np
+
+from app.services.prediction_service import PredictionService
+from app.utils.forecasting import arima_order_grid, differencing_order
+
+RNG = np.random.default_rng(11)
+
+
+def test_differencing_order_follows_the_unit_roots():
+    noise = RNG.normal(0, 1, 60)
+
+    assert differencing_order(noise) == 0
+    assert differencing_order(np.cumsum(noise)) == 1
+    assert differencing_order(np.cumsum(np.cumsum(noise)) + 0.5 * np.arange(60) ** 2) == 2
+    assert differencing_order(np.full(20, 3.0)) == 0
+
+
+def test_order_grid_holds_d_fixed():
+    grid = arima_order_grid(1, max_p=2, max_q=1)
+
+    assert len(grid) == 6
+    assert {order[1] for order in grid} == {1}
+
+
+def test_search_compares_candidates_with_the_same_d():
+    walk = np.cumsum(RNG.normal(0.5, 1, 40))
+
+    result = PredictionService._search_arima_order(walk, "aic")
+    assert result["order"][1] == differencing_order(walk)
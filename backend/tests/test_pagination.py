@@ -0,0 +1,48 @@
+from app.models.schemas import AnnualDataCreate
+from app.services.data_service import DataService
+
+
+def _walk(db, limit, **filters):
+    rows, cursor, pages = [], None, 0
+    while True:
+        page = DataService.get_annual_data_page(db, limit=limit, cursor=cursor, **filters)
+        rows.extend(page["data"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return rows, pages
+
+
+def _key(row):
+    return (row["year"], row["city_id"], row["indicator_id"], row["data_id"])
+
+
+def test_cursor_round_trip_covers_every_row_once(db):
+    full = DataService.get_annual_data_page(db, start_year=2010, end_year=2014)["data"]
+    rows, pages = _walk(db, 7, start_year=2010, end_year=2014)
+
+    assert [_key(r) for r in rows] == sorted(_key(r) for r in full)
+    assert len({r["data_id"] for r in rows}) == len(full)
+    assert pages == -(-len(full) // 7)
+
+
+def test_ties_on_year_are_split_by_the_remaining_keys(db):
+    full = DataService.get_annual_data_page(db, year=2020)["data"]
+    rows, _ = _walk(db, 2, year=2020)
+
+    assert len(full) > 2
+    assert [r["data_id"] for r in rows] == [r["data_id"] for r in full]
+
+
+def test_insert_before_cursor_does_not_shift_later_pages(db):
+    first = DataService.get_annual_data_page(db, city_id=4, indicator_id=3, limit=5)
+    before = DataService.get_annual_data_page(db, city_id=4, indicator_id=3, cursor=first["next_cursor"])["data"]
+
+    DataService.create_annual_data(db, AnnualDataCreate(city_id=4, indicator_id=3, year=1990, value=1.0))
+    after = DataService.get_annual_data_page(db, city_id=4, indicator_id=3, cursor=first["next_cursor"])["data"]
+
+    assert after == before
+
+
+def test_invalid_cursor_is_rejected(db):
+    assert "error" in DataService.get_annual_data_page(db, limit=5, cursor="not-a-cursor")
@@ -60,6 +60,13 @@ export const dataApi = {
     return response.data;
   },
 
+  getRegionalSummaries: async (startYear?: number, endYear?: number): Promise<Record<number, RegionalSummary>> => {
+    const response = await api.get<Record<number, RegionalSummary>>('/data/regional-summary', {
+      params: { start_year: startYear, end_year: endYear },
+    });
+    return response.data;
+  },
+
   getCityRanking: async (indicatorId: number, year: number): Promise<CityRanking[]> => {
     const response = await api.get<CityRanking[]>('/data/ranking', {
       params: { indicator_id: indicatorId, year },
@@ -95,15 +95,21 @@ export interface PredictionData {
   training_values: number[];
 }
 
-export interface RegionalSummary {
+export interface RegionTotals {
   total_gdp: number;
   total_population: number;
   total_trade: number;
 }
 
+export interface RegionalSummary extends RegionTotals {
+  regions: Record<string, RegionTotals>;
+}
+
 export interface CityRanking {
   rank: number;
   city_id: number;
   city_name: string;
   value: number;
+  previous_rank: number | null;
+  rank_change: number | null;
 }